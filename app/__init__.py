@@ -4,19 +4,27 @@ from flask_restx import Api
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_talisman import Talisman
+from werkzeug.middleware.proxy_fix import ProxyFix
 import flask
 # Import your config(s)
 from app.config import DevelopmentConfig
 
 # Import the MongoDB initialization functions
 from app.db.db import init_db
-from app.db import job_seekers as job_seekers_db
-from app.db import companies as companies_db
+from app.db import migrations
+from app.db.cache import current_user_cache, DEFAULT_MAX_SIZE, DEFAULT_TTL
+from app.db import passwords, abtest
+from app.db.instrumentation import query_profiler, PROFILE_HEADER
 
 # Import your Flask-RESTX namespaces
 from app.apis.job_seekers import api as job_seekers_ns
 from app.apis.companies import api as companies_ns
 from app.apis.job_listings import api as job_listings_ns
+from app.apis.abtest import api as abtest_ns
+from app.apis.health import api as health_ns
+from app.apis.job_seekers import ai_job_runner
+from app.apis.ai_jobs import DEFAULT_MAX_WORKERS, DEFAULT_MAX_PENDING
+from app.apis.auth import register_jwt_callbacks
 
 import os
 
@@ -52,6 +60,31 @@ def create_app(config_class=DevelopmentConfig):
         if any(f"/{item}" in flask.request.path for item in forbidden):
             return flask.abort(403)
 
+    @app.before_request
+    def start_query_profile():
+        if (app.config.get("QUERY_PROFILE_HEADER", False) or app.debug) and \
+                flask.request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes", "on"):
+            flask.g.query_profile = query_profiler.start_request()
+
+    @app.after_request
+    def report_query_profile(response):
+        profile = query_profiler.request_summary() if "query_profile" in flask.g else None
+        if profile is not None:
+            response.headers["Server-Timing"] = f'db;dur={profile["total_ms"]};desc="{profile["count"]} queries"'
+            response.headers["X-Query-Count"] = str(profile["count"])
+            print(f"Query profile of {flask.request.method} {flask.request.path}: "
+                  f"{profile['count']} queries, {profile['total_ms']} ms")
+            for query in profile["queries"]:
+                print(f"  {query['ms']} ms {query['command']} on {query['collection']} from {query['caller']}")
+        return response
+
+    @app.teardown_request
+    def finish_query_profile(error=None):
+        # in teardown, which also runs when the request failed, so the profile never leaks into the next one
+        token = flask.g.pop("query_profile", None)
+        if token is not None:
+            query_profiler.finish_request(token)
+
     if is_dev:
         CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://127.0.0.1:3000"]}}, supports_credentials=True)
     else:
@@ -60,11 +93,26 @@ def create_app(config_class=DevelopmentConfig):
     # Load configuration
     app.config.from_object(config_class)
 
+    # Behind nginx every request comes from the proxy: take the client address (and scheme)
+    # from the X-Forwarded-* headers the trusted proxies append, so remote_addr is the client's
+    trusted_proxies = app.config.get("TRUSTED_PROXIES", 1)
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
     # Initialize the MongoDB (this calls init_db(app.config))
     init_db(app.config)
 
     # Initialize JWT if you're using Flask-JWT-Extended
     jwt = JWTManager(app)
+    current_user_cache.configure(app.config.get("USER_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE),
+                                 app.config.get("USER_CACHE_TTL", DEFAULT_TTL))
+    ai_job_runner.configure(app.config.get("AI_JOB_WORKERS", DEFAULT_MAX_WORKERS),
+                            app.config.get("AI_JOB_MAX_PENDING", DEFAULT_MAX_PENDING))
+    abtest.configure(app.config.get("AB_TEST_LOGS_DIR"))
+    passwords.hasher.configure(app.config.get("PASSWORD_HASH_ROUNDS", passwords.DEFAULT_ROUNDS),
+                               app.config.get("PASSWORD_HASH_WORKERS", passwords.DEFAULT_WORKERS),
+                               app.config.get("PASSWORD_HASH_MAX_PENDING", passwords.DEFAULT_MAX_PENDING),
+                               app.config.get("PASSWORD_HASH_TIMEOUT", passwords.DEFAULT_TIMEOUT))
 
     # Create a Flask-RESTX API instance
     api = Api(
@@ -78,18 +126,29 @@ def create_app(config_class=DevelopmentConfig):
     api.add_namespace(job_seekers_ns, path="/api/job_seekers")
     api.add_namespace(companies_ns, path="/api/companies")
     api.add_namespace(job_listings_ns, path="/api/job_listings")
+    api.add_namespace(abtest_ns, path="/api/abtest")
+    api.add_namespace(health_ns, path="/api/health")
+
+    @api.errorhandler(passwords.PasswordHasherBusy)
+    def password_hasher_busy(error):
+        # shed the login or signup instead of queueing it behind the others
+        return {"error": "Too many logins in progress, please try again shortly"}, 503, {"Retry-After": "1"}
     
-    # TODO: Find a way to move those within the api codebase
-    @jwt.user_identity_loader
-    def user_identity_lookup(identity):
-        return identity["email"]
-
-    @jwt.user_lookup_loader
-    def user_lookup_callback(_jwt_header, jwt_data):
-        identity = jwt_data["sub"]      # uses the email address of a user object
-        
-        # Need a logic to differentiate between if the call to the function
-        # is looking for a job_seeker or a company        
-        return job_seekers_db.find_job_seeker(identity) or companies_db.find_company(identity)
+    @app.cli.command("normalize-emails")
+    def normalize_emails_command():
+        """Backfill normalized emails and create the unique email indexes."""
+        report = migrations.normalize_emails()
+        for collection_name, result in report.items():
+            print(f"{collection_name}: {result['updated']} updated, {len(result['conflicts'])} conflicts")
+            for email in result["conflicts"]:
+                print(f"  conflicting email left as is: {email}")
+
+    @app.cli.command("migrate-applications")
+    def migrate_applications_command():
+        """Move the applicant arrays of listings and job seekers into the applications collection."""
+        report = migrations.migrate_applications()
+        print(f"{report['applications']} applications migrated, {report['skipped']} dangling entries skipped")
+
+    register_jwt_callbacks(jwt)
 
     return app
@@ -0,0 +1,27 @@
+from flask_restx import Namespace, Resource
+from app.db import abtest_report
+from http import HTTPStatus
+from flask import request
+from flask_jwt_extended import jwt_required
+
+authorizations = {
+    "apikey": {
+        'type': 'apiKey',
+        'in': 'header',
+        'name': 'Authorization'
+    }
+}
+
+api = Namespace("abtest", description="Endpoint for A/B testing results", authorizations=authorizations)
+
+
+@api.route("/report")
+@api.response(HTTPStatus.OK, "Success")
+class ExperimentReport(Resource):
+    @api.doc("Per-variant conversion rates, event counts and survey answer distributions")
+    @api.doc(security='apikey')
+    @api.param("refresh", "Fold the newest events into the rollup first (default true)")
+    @jwt_required()
+    def get(self):
+        refresh = request.args.get("refresh", "true").lower() != "false"
+        return abtest_report.get_experiment_report(refresh), HTTPStatus.OK
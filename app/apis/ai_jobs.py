@@ -0,0 +1,119 @@
+from app.db import ai_jobs
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+DEFAULT_MAX_WORKERS = 4     # model calls running at the same time in one worker process
+DEFAULT_MAX_PENDING = 32    # jobs queued or running in one worker process, more are refused
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF = 2         # seconds before the first retry, doubled for every further one
+
+
+class AIJobRunner:
+    """
+    Runs AI jobs (suggestions, applicant scoring) on a thread pool of the current worker process, so the request
+    that submits one returns straight away. Status and result are stored in the ai_jobs
+    collection, any worker can answer the polls.
+
+    A failed model call is retried with exponential backoff, at most max_workers calls run at
+    once and submit() refuses new jobs while max_pending are outstanding.
+    """
+
+    def __init__(self, service, max_workers=DEFAULT_MAX_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF, sleep=time.sleep):
+        self.service = service
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._outstanding = set()  # ids of the jobs queued or running in this process
+        self._outstanding_lock = threading.Lock()  # not _lock, shutdown(wait=True) holds it while jobs finish
+        self.configure(max_workers, max_pending)
+
+    def configure(self, max_workers=None, max_pending=None):
+        with self._lock:
+            if max_workers is not None:
+                self.max_workers = max_workers
+                self._shutdown_executor()  # the next job starts a pool of the new size
+            if max_pending is not None:
+                self.max_pending = max_pending
+                self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, owner, job, applicant):
+        """Returns the id of the new job, or None when too many jobs are outstanding."""
+        return self.submit_task(owner, {"job": job, "applicant": applicant},
+                                lambda: self.service.fetch_suggestions(job, applicant))
+
+    def submit_task(self, owner, request, task):
+        """
+        Queue any AI work: task() is called (and retried) on the pool, its result stored with
+        the job. Returns the id of the new job, or None when too many jobs are outstanding.
+        """
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            return None
+
+        try:
+            job_id = ai_jobs.create_job(owner, request)
+            with self._outstanding_lock:
+                self._outstanding.add(job_id)
+            self._get_executor().submit(self._run, slots, job_id, task)
+        except Exception:
+            slots.release()
+            raise
+        return job_id
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown_executor(wait)
+
+    def abandon(self):
+        """
+        Called when the worker process exits: its queued jobs will never run and its running
+        ones never finish, mark them failed so the pollers stop waiting. Returns how many.
+        """
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        with self._outstanding_lock:
+            outstanding, self._outstanding = list(self._outstanding), set()
+        return ai_jobs.abandon_jobs(outstanding, "The server stopped before the job finished")
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # started lazily in each worker process, a pool does not survive a fork
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="ai-jobs")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _shutdown_executor(self, wait=False):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+        self._executor = None
+
+    def _run(self, slots, job_id, task):
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                ai_jobs.mark_running(job_id, attempt)
+                try:
+                    result = task()
+                except Exception as e:
+                    print(f"AI job {job_id} attempt {attempt} failed: {e}")
+                    if attempt == self.max_attempts:
+                        ai_jobs.fail_job(job_id, str(e))
+                        return
+                    self._sleep(self.backoff * 2 ** (attempt - 1))
+                else:
+                    ai_jobs.complete_job(job_id, result)
+                    return
+        except Exception as e:
+            print(f"AI job {job_id} could not be recorded: {e}")
+        finally:
+            with self._outstanding_lock:
+                self._outstanding.discard(job_id)
+            slots.release()
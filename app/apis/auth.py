@@ -0,0 +1,144 @@
+from collections.abc import Mapping
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, current_user
+from flask_jwt_extended.exceptions import UserLookupError
+from bson.errors import InvalidId
+from app.db import job_seekers, companies
+from app.db.cache import current_user_cache
+from app.db import login_throttle
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+import math
+
+# Custom claims carried by every access token issued at login
+ROLE_CLAIM = "role"
+USER_ID_CLAIM = "uid"
+
+ROLE_JOB_SEEKER = "seeker"
+ROLE_COMPANY = "company"
+
+
+def create_user_token(user, role, expires_delta):
+    """
+    Issue an access token for a job seeker or company document. The subject is
+    the email; the role and the object id ride along so that requests never have
+    to guess which collection the user lives in.
+    """
+    return create_access_token(
+        identity=user,
+        additional_claims={ROLE_CLAIM: role, USER_ID_CLAIM: str(user["_id"])},
+        expires_delta=expires_delta,
+    )
+
+
+def check_login_throttle(role, email):
+    # Refuse a login to an account, or from an address, with too many recent failures
+    # before any password is hashed
+    wait = login_throttle.retry_after(role, email, request.remote_addr)
+    if wait:
+        raise TooManyRequests("Too many failed logins, please try again later", retry_after=math.ceil(wait))
+
+def record_login(role, email, user):
+    if user:
+        login_throttle.record_success(role, email)
+    else:
+        login_throttle.record_failure(role, email, request.remote_addr)
+
+
+def get_current_role():
+    role = get_jwt().get(ROLE_CLAIM)
+    if role is None:
+        # tokens issued before the role claim existed
+        role = ROLE_JOB_SEEKER if "first" in current_user else ROLE_COMPANY
+    return role
+
+
+def get_current_email():
+    return get_jwt_identity()
+
+
+def get_current_account_email():
+    """
+    Email of the account behind the token, for writes made on its behalf. Unlike
+    get_current_email it loads the (cached) account, so a token that outlived a deleted
+    account is refused with 401 instead of creating data for it.
+    """
+    return current_user["email"]
+
+
+def is_job_seeker():
+    return get_current_role() == ROLE_JOB_SEEKER
+
+
+def is_company():
+    return get_current_role() == ROLE_COMPANY
+
+
+def load_user(jwt_data):
+    """
+    Fetch the user document behind a verified token: a single _id lookup in the
+    collection named by the role claim, or the email lookup in both collections
+    for tokens without one. Results are cached per token.
+    """
+    identity = jwt_data["sub"]      # uses the email address of a user object
+    cache_key = jwt_data.get("jti", identity)
+
+    user = current_user_cache.get(cache_key)
+    if user is None:
+        role = jwt_data.get(ROLE_CLAIM)
+        try:
+            if role == ROLE_JOB_SEEKER:
+                user = job_seekers.find_job_seeker_by_id(jwt_data[USER_ID_CLAIM])
+            elif role == ROLE_COMPANY:
+                user = companies.find_company_by_id(jwt_data[USER_ID_CLAIM])
+            else:
+                user = job_seekers.find_job_seeker(identity) or companies.find_company(identity)
+        except (KeyError, InvalidId):
+            user = None
+
+        if user is None:
+            return None
+        # tagged with the email so update/delete of the user drops it
+        current_user_cache.set(cache_key, user, tags=(identity,))
+
+    return dict(user)  # callers get their own copy
+
+
+class LazyUser(Mapping):
+    """
+    current_user for a verified token. The document is only fetched the first
+    time a field is read, so endpoints that only need the role and the email
+    (see get_current_role and get_current_email) cost no database round trip.
+    """
+
+    def __init__(self, jwt_header, jwt_data):
+        self._jwt_header = jwt_header
+        self._jwt_data = jwt_data
+        self._user = None
+
+    def _load(self):
+        if self._user is None:
+            user = load_user(self._jwt_data)
+            if user is None:
+                raise UserLookupError(f"user_lookup returned None for {self._jwt_data['sub']}",
+                                      self._jwt_header, self._jwt_data)
+            self._user = user
+        return self._user
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+def register_jwt_callbacks(jwt):
+    @jwt.user_identity_loader
+    def user_identity_lookup(identity):
+        return identity["email"]
+
+    @jwt.user_lookup_loader
+    def user_lookup_callback(_jwt_header, jwt_data):
+        return LazyUser(_jwt_header, jwt_data)
@@ -3,10 +3,11 @@ from ..db import companies
 from http import HTTPStatus
 from flask import request
 from bson.json_util import dumps
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, current_user
+from flask_jwt_extended import get_jwt_identity, jwt_required, current_user
 
 from datetime import timedelta
 from .utils import validate_email, is_valid_password  # validate emails and passwords
+from .auth import create_user_token, is_company, ROLE_COMPANY, check_login_throttle, record_login
 
 authorizations = {
     "apikey": {
@@ -73,6 +74,8 @@ class CompanyList(Resource):
 
         # Create the new company
         company_id = companies.create_company(name, email, country, description, password)
+        if company_id is None:
+            return {"error": "The email address already exists"}, HTTPStatus.CONFLICT
         print(f"Created company with id: {company_id}")
         # Return a dict so Flask-RESTX can handle JSON
         return {"message": "Company created"}, HTTPStatus.OK
@@ -112,6 +115,8 @@ class Company(Resource):
         updated_company = companies.update_company(email, name, new_email, country, description)
         if updated_company is None:
             return "Company email not found", HTTPStatus.NOT_FOUND
+        elif updated_company == "Email exists":
+            return "The email address already exists", HTTPStatus.CONFLICT
 
         return "Company updated", HTTPStatus.OK
 
@@ -130,6 +135,7 @@ class Company(Resource):
 @api.route("/login")
 @api.response(HTTPStatus.OK, "Success")
 @api.response(HTTPStatus.NOT_ACCEPTABLE, "Not acceptable")
+@api.response(429, "Too many failed logins")
 class Company(Resource):
     @api.expect(COMPANY_LOGIN_FLDS)
     @api.doc("Login a company")
@@ -140,11 +146,11 @@ class Company(Resource):
         if not validate_email(email):
             return {"error": "Not appropriate email format"}, 400
 
-        userEntry = companies.find_company(email)
-        if userEntry and companies.check_login_credentials(email, password):
-            access_token = create_access_token(
-                identity=userEntry, expires_delta=timedelta(hours=0.5)
-            )
+        check_login_throttle(ROLE_COMPANY, email)
+        userEntry = companies.check_login_credentials(email, password)
+        record_login(ROLE_COMPANY, email, userEntry)
+        if userEntry:
+            access_token = create_user_token(userEntry, ROLE_COMPANY, timedelta(hours=0.5))
             return {
                 "message": "Logged in Successfully",
                 "access_token": access_token
@@ -185,6 +191,8 @@ class Company(Resource):
 
         # Create the company
         company_id = companies.create_company(name, email, country, description, password)
+        if company_id is None:
+            return {"error": "The email address already exists"}, HTTPStatus.CONFLICT
         print(f"Created company with id: {company_id}")
         return {"message": "Company Registered Successfully"}, HTTPStatus.OK
 
@@ -196,7 +204,6 @@ class Company(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def get(self):
-        print("current_user", current_user)
-        if "name" not in current_user:
+        if not is_company():
             return {"error":"Only companies are allowed to do this action"}, 401
         return {"message": f"Logged in as {current_user['name']}"},200
@@ -0,0 +1,47 @@
+from flask_restx import Namespace, Resource
+from app.db import db, passwords, abtest
+from app.db.cache import current_user_cache
+from http import HTTPStatus
+from flask_jwt_extended import jwt_required
+from pymongo.errors import PyMongoError
+import os
+
+authorizations = {
+    "apikey": {
+        'type': 'apiKey',
+        'in': 'header',
+        'name': 'Authorization'
+    }
+}
+
+api = Namespace("health", description="Endpoint for liveness and worker statistics", authorizations=authorizations)
+
+
+@api.route("/")
+@api.response(HTTPStatus.OK, "Database reachable")
+@api.response(HTTPStatus.SERVICE_UNAVAILABLE, "Database unreachable")
+class Health(Resource):
+    @api.doc("Liveness check for load balancers: pings the database")
+    def get(self):
+        try:
+            return {"status": "ok", "db_ping_ms": db.ping()}, HTTPStatus.OK
+        except PyMongoError as e:
+            print(f"Health check failed: {e}")
+            return {"status": "unavailable"}, HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@api.route("/stats")
+@api.response(HTTPStatus.OK, "Success")
+class WorkerStats(Resource):
+    @api.doc("Connection pool, password hashing, user cache, A/B event queue and query statistics of the worker answering the request")
+    @api.doc(security='apikey')
+    @jwt_required()
+    def get(self):
+        return {
+            "pid": os.getpid(),
+            "db_pool": db.get_pool_stats(),
+            "password_hashing": passwords.hasher.stats(),
+            "user_cache": current_user_cache.stats(),
+            "ab_test_events": abtest.event_writer.stats(),
+            "queries": db.get_query_stats(),
+        }, HTTPStatus.OK
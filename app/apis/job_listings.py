@@ -1,11 +1,18 @@
 from flask_restx import Namespace, Resource, fields
 from ..db import job_listings
 from app.db import abtest
+from app.db.utils import encode_cursor, decode_cursor
 from http import HTTPStatus
-from flask import request, session
+from flask import request, session, Response, stream_with_context
 from flask_jwt_extended import jwt_required, current_user
 from datetime import datetime, timedelta
 from .utils import validate_email, is_valid_password  # validate emails and passwords
+from .auth import is_company, is_job_seeker, get_current_email, get_current_account_email
+from .llm import AIService
+from .scoring import score_applicants
+from .job_seekers import ai_job_runner, check_ai_suggestions_quota
+from app.db import ai_scores, ai_jobs
+import json
 import uuid
 
 authorizations = {
@@ -23,6 +30,13 @@ def get_session_id():
 
 api = Namespace("job_listings", description="Endpoint for job listings API", authorizations=authorizations)
 
+ai_service = AIService()
+
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 100  # a plain GET never reads the whole collection, only ndjson streams it
+NDJSON_MIMETYPE = "application/x-ndjson"
+LISTING_PUBLIC_PROJECTION = {"applicants": 0, "selected": 0}  # applicants data is not public
+
 JOB_LISTING_CREATE_FLDS = api.model(
     "AddJoblistingEntry",
     {
@@ -65,7 +79,12 @@ class JobListingList(Resource):
                  "title": "Filter by job title",
                  "location": "Filter by job location",
                  "industry": "Filter by industry",
-                 "seniority": "Filter by seniority level"
+                 "seniority": "Filter by seniority level",
+                 "match": "How filters are matched: prefix (default), exact or regex",
+                 "limit": f"Page size (default {DEFAULT_PAGE_SIZE}, at most {MAX_PAGE_SIZE}), the next page cursor is returned in the X-Next-Cursor header",
+                 "after": "Cursor of the page to continue from",
+                 "format": "Set to ndjson to stream one listing per line",
+                 "q": f"Full-text search over title, industry and location; returns the best matches (up to limit, default {job_listings.DEFAULT_TOP_K}) ranked by relevance"
              })
     
     def get(self):
@@ -74,13 +93,47 @@ class JobListingList(Resource):
         location = request.args.get(job_listings.LOCATION)
         industry = request.args.get(job_listings.INDUSTRY)
         seniority = request.args.get(job_listings.SENIORITY)
+        match = request.args.get("match", job_listings.MATCH_PREFIX)
+        after = request.args.get("after")
+        limit = request.args.get("limit")
+        stream = request.args.get("format") == "ndjson" or request.accept_mimetypes.best == NDJSON_MIMETYPE
+        text_query = request.args.get("q")
+
+        if match not in job_listings.MATCH_MODES:
+            return {"error": f"match must be one of {', '.join(job_listings.MATCH_MODES)}"}, 400
+
+        if limit is not None:
+            if not limit.isdigit() or int(limit) < 1:
+                return {"error": "limit must be a positive integer"}, 400
+            limit = min(int(limit), MAX_PAGE_SIZE)
+        elif not stream and not text_query:
+            limit = DEFAULT_PAGE_SIZE
+
+        if after is not None:
+            try:
+                decode_cursor(after)
+            except ValueError:
+                return {"error": "Invalid cursor"}, 400
+
+        if text_query:
+            job_listings_list = job_listings.search_job_text(text_query, limit or job_listings.DEFAULT_TOP_K,
+                                                             LISTING_PUBLIC_PROJECTION)
+            if job_listings_list:
+                return job_listings_list, HTTPStatus.OK
+            return {"error":"Not found any"}, HTTPStatus.NOT_FOUND
+
+        filters = (title, company, location, industry, seniority, match, after, limit, LISTING_PUBLIC_PROJECTION)
+
+        if stream:
+            return Response(stream_with_context(_stream_listings(filters, limit)), mimetype=NDJSON_MIMETYPE)
 
-        job_listings_list = job_listings.search_job_with_filters(title, company, location, industry, seniority)
+        job_listings_list = job_listings.search_job_with_filters(*filters)
 
         if job_listings_list:
-            [job.pop("applicants", None) for job in job_listings_list]  # Remove applicants data
-            [job.pop("selected", None) for job in job_listings_list]
-            return job_listings_list, HTTPStatus.OK
+            headers = {}
+            if limit is not None and len(job_listings_list) == limit:
+                headers["X-Next-Cursor"] = encode_cursor(job_listings_list[-1]["_id"])
+            return job_listings_list, HTTPStatus.OK, headers
         else:
             return {"error":"Not found any"}, HTTPStatus.NOT_FOUND
         
@@ -89,7 +142,7 @@ class JobListingList(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def post(self):
-        if "name" not in current_user:
+        if not is_company():
             return "Only companies can create a job posting", 401
         
         company = current_user["name"]
@@ -107,7 +160,7 @@ class JobListingList(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def put(self):
-        if "name" not in current_user:
+        if not is_company():
             return "Only companies can update a job posting", 401
         
         company = current_user["name"]
@@ -127,6 +180,21 @@ class JobListingList(Resource):
         else:
             return "Cannot find the job you looking for", HTTPStatus.NOT_FOUND
 
+def _stream_listings(filters, limit):
+    """
+    Yield one JSON line per listing as the cursor returns them. A full page
+    ends with a {"next": cursor} line to continue from.
+    """
+    count = 0
+    last_id = None
+    for job in job_listings.iter_job_listings(*filters):
+        count += 1
+        last_id = job["_id"]
+        yield json.dumps(job) + "\n"
+
+    if limit is not None and count == limit:
+        yield json.dumps({"next": encode_cursor(last_id)}) + "\n"
+
 @api.route("/<id>")
 @api.response(HTTPStatus.OK, "Success")
 @api.response(HTTPStatus.NOT_FOUND, "Job Listing Not Found")
@@ -145,7 +213,7 @@ class JobListingResource(Resource):
     @api.doc(security='apikey')
     @jwt_required()        
     def delete(self, id):
-        if "name" not in current_user:
+        if not is_company():
             return "Only companies can delete a job posting", 401
         company = current_user["name"]
         delete_job = job_listings.delete_job_listing(id, company)
@@ -164,7 +232,7 @@ class JobListingApplicants(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def get(self, id):
-        if "name" not in current_user:
+        if not is_company():
             return "Only companies can view applicants", 401
         company = current_user["name"]
         applicants = job_listings.view_applicants(id, company)
@@ -175,6 +243,76 @@ class JobListingApplicants(Resource):
         else:
             return "Cannot find the job you looking for", HTTPStatus.NOT_FOUND
         
+@api.route("/<id>/applicants/scores")
+@api.response(HTTPStatus.OK, "Success")
+@api.response(HTTPStatus.ACCEPTED, "Scoring queued")
+@api.response(HTTPStatus.NOT_FOUND, "Job Listing Not Found")
+@api.response(429, "Too many requests")
+@api.response(503, "Too many jobs in progress")
+class JobListingApplicantScores(Resource):
+    @api.doc("Ranking of the applicants by their stored AI match score")
+    @api.doc(security='apikey')
+    @jwt_required()
+    def get(self, id):
+        if not is_company():
+            return "Only companies can view applicants", 401
+        applicants = job_listings.view_applicants(id, current_user["name"])
+        if applicants == "Not allowed":
+            return "You are not allowed to view applicants from other company's job posting", 401
+        elif applicants is None:
+            return "Cannot find the job you looking for", HTTPStatus.NOT_FOUND
+
+        # a score stays stored after the application is accepted or rejected, rank open ones only
+        applicants = set(applicants)
+        return [score for score in ai_scores.get_ranking(id) if score["email"] in applicants], HTTPStatus.OK
+
+    @api.doc("Queue AI scoring of all applicants for the current job posting, poll the returned job for the counts",
+             params={"force": "Set to true to rescore applicants whose profile has not changed"})
+    @api.doc(security='apikey')
+    @jwt_required()
+    def post(self, id):
+        if not is_company():
+            return "Only companies can score applicants", 401
+        applicants = job_listings.view_applicants(id, current_user["name"])
+        if applicants == "Not allowed":
+            return "You are not allowed to view applicants from other company's job posting", 401
+        elif applicants is None:
+            return "Cannot find the job you looking for", HTTPStatus.NOT_FOUND
+
+        check_ai_suggestions_quota()
+        force = request.args.get("force", "").lower() == "true"
+        job = job_listings.get_job_listing_by_id(id)
+        # hundreds of applicants take longer than a request may, score them on the AI job pool
+        job_id = ai_job_runner.submit_task(
+            get_current_email(),
+            {"listing_id": id, "applicants": len(applicants), "force": force},
+            lambda: score_applicants(ai_service, job, applicants, force)
+        )
+        if job_id is None:
+            return {"error": "Too many AI jobs in progress, please try again later"}, HTTPStatus.SERVICE_UNAVAILABLE
+
+        return {"job_id": job_id, "status": ai_jobs.JOB_PENDING}, HTTPStatus.ACCEPTED, \
+            {"Location": f"{request.base_url}/jobs/{job_id}"}
+
+@api.route("/<id>/applicants/scores/jobs/<job_id>")
+@api.response(HTTPStatus.OK, "Success")
+@api.response(HTTPStatus.NOT_FOUND, "Job not found")
+class JobListingScoringJob(Resource):
+    @api.doc("Status of a queued applicant scoring job, with the scored, skipped and failed counts once it is done")
+    @api.doc(security='apikey')
+    @jwt_required()
+    def get(self, id, job_id):
+        record = ai_jobs.find_job(job_id, get_current_email())
+        if record is None:
+            return {"error": "Scoring job not found"}, HTTPStatus.NOT_FOUND
+
+        response = {"job_id": job_id, "status": record["status"]}
+        if record["status"] == ai_jobs.JOB_DONE:
+            response["result"] = record["result"]
+        elif record["status"] == ai_jobs.JOB_FAILED:
+            response["error"] = "AI service error, please try again later"
+        return response, HTTPStatus.OK
+
 @api.route("/show_details") #show all details of all job listings of the current company
 @api.response(HTTPStatus.OK, "Success")
 @api.response(HTTPStatus.NOT_FOUND, "Job Listing Not Found")
@@ -183,11 +321,12 @@ class CompanyShowListings(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def get(self):
-        if "name" not in current_user:
+        if not is_company():
             return "Only companies can view their job postings", 401
         company = current_user["name"]
         print("company", company)
-        job_listings_list = job_listings.search_job_with_filters(None, company, None, None, None)
+        job_listings_list = job_listings.attach_applications(
+            job_listings.search_job_with_filters(None, company, None, None, None, job_listings.MATCH_EXACT))
         applicants = []
         for job in job_listings_list:
             for applicant in job["applicants"]:
@@ -206,9 +345,9 @@ class JobSeekerManagement(Resource):
     @api.doc(security='apikey')
     @jwt_required()        
     def put(self, id):
-        if "first" not in current_user:
+        if not is_job_seeker():
             return {"error":"Only signed-in job seekers can apply for job postings"}, 401
-        email = current_user['email']
+        email = get_current_account_email()
         candidate = job_listings.update_applicant(id, email)
         if candidate == "applied":
             return {"error":"You had applied for this position already!"}, 400
@@ -236,7 +375,7 @@ class JobSeekerSelection(Resource):
     @api.doc(security='apikey')
     @jwt_required()        
     def put(self, action):
-        if "name" not in current_user:
+        if not is_company():
             return "Only companies can select applicants", 401
         company = current_user["name"]
         job_id = request.json.get("id") #job id
@@ -269,8 +408,8 @@ class JobSeekerApplications(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def get(self):
-        if "first" not in current_user:
+        if not is_job_seeker():
             return "Only job seekers can view their applications", 401
-        email = current_user["email"]
+        email = get_current_email()
         applications = job_listings.get_all_jobs_for_a_job_seeker(email)
         return applications, HTTPStatus.OK
\ No newline at end of file
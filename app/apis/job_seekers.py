@@ -2,13 +2,20 @@ from flask_restx import Namespace, Resource, fields
 from ..db import job_seekers
 from app.db import abtest
 from http import HTTPStatus
-from flask import jsonify, request, session
+from flask import jsonify, request, session, Response
 from bson.json_util import dumps
-from flask_jwt_extended import create_access_token, set_access_cookies, get_jwt_identity, jwt_required, current_user
+from flask_jwt_extended import set_access_cookies, get_jwt_identity, jwt_required, current_user
 from datetime import datetime, timedelta
 from .utils import validate_email, is_valid_password #validate emails and passwords
 from .llm import AIService
-import time
+from .matching import MatchEngine, RecommendationIndex, describe_score
+from .auth import create_user_token, is_job_seeker, get_current_email, ROLE_JOB_SEEKER, check_login_throttle, record_login
+from .ratelimit import ai_suggestions_retry_after
+from .ai_jobs import AIJobRunner
+from app.db import ai_jobs, job_listings
+from werkzeug.exceptions import TooManyRequests
+import json
+import math
 import uuid
 
 # TODO: Check if we can use email address as username
@@ -117,6 +124,8 @@ class JobSeekersList(Resource):
             return {"error": "The email address already exists"}, HTTPStatus.CONFLICT
         else:
             job_seeker_id = job_seekers.create_job_seeker(first_name, last_name, email, expertise, years, password)
+            if job_seeker_id is None:
+                return {"error": "The email address already exists"}, HTTPStatus.CONFLICT
             print(f"Created job seeker with id: {job_seeker_id}")
             return {"message": "Job seeker created", "id": str(job_seeker_id)}, HTTPStatus.OK
 
@@ -158,6 +167,8 @@ class JobSeekers(Resource):
 
         if updated_job_seeker is None:
             return "Job seeker email not found", HTTPStatus.NOT_FOUND
+        elif updated_job_seeker == "Email exists":
+            return "The email address already exists", HTTPStatus.CONFLICT
 
         return "Job seeker updated", HTTPStatus.OK
 
@@ -179,6 +190,7 @@ class JobSeekers(Resource):
 @api.response(HTTPStatus.OK, "Success")
 @api.response(404, "Job Seeker not found")
 @api.response(400, "Wrong email format")
+@api.response(429, "Too many failed logins")
 @api.expect(JOB_SEEKER_LOGIN_FLDS)
 @api.doc("Log In users")
 class JobSeekers(Resource):
@@ -190,13 +202,11 @@ class JobSeekers(Resource):
         if not validate_email(email): #check if "" and None also
             return {"error":"Not approriate email format"}, 400
         
-        userEntry = job_seekers.find_job_seeker(email)
-        
-        # TODO: Refine the login checking logic
-        if (userEntry and job_seekers.check_login_credentials(email, password)):
-            access_token = create_access_token(
-                identity=userEntry, expires_delta=timedelta(hours=0.5)
-            )
+        check_login_throttle(ROLE_JOB_SEEKER, email)
+        userEntry = job_seekers.check_login_credentials(email, password)
+        record_login(ROLE_JOB_SEEKER, email, userEntry)
+        if userEntry:
+            access_token = create_user_token(userEntry, ROLE_JOB_SEEKER, timedelta(hours=0.5))
             
             response = jsonify({
                 "message": "Logged in Successfully",
@@ -237,6 +247,8 @@ class JobSeekers(Resource):
             return {"error":"The email address already exists"}, HTTPStatus.CONFLICT
         else:
             job_seeker_id = job_seekers.create_job_seeker(first_name, last_name, email, expertise, years, password)
+            if job_seeker_id is None:
+                return {"error":"The email address already exists"}, HTTPStatus.CONFLICT
             print(f"Created job seeker with id: {job_seeker_id}")
             return {"message": "Job seeker Registered Successfully"}, HTTPStatus.OK
         
@@ -252,6 +264,37 @@ class JobSeekers(Resource):
         return {"message":f"Hello {current_user['first']}"}, HTTPStatus.OK
     
 
+MAX_RECOMMENDATIONS = 100
+recommendation_index = RecommendationIndex()
+job_listings.add_listing_listener(recommendation_index.on_listing_change)
+
+@api.route("/recommendations")
+@api.response(HTTPStatus.OK, "Success")
+class JobRecommendations(Resource):
+    @api.doc("Job listings recommended for the current job seeker, best match first",
+             params={
+                 "limit": f"Number of listings (at most {MAX_RECOMMENDATIONS}, default 20)",
+                 "location": "Favour listings in this location"
+             })
+    @api.doc(security='apikey')
+    @jwt_required()
+    def get(self):
+        if not is_job_seeker():
+            return {"error":"Only signed-in job seekers can get job recommendations"}, 401
+
+        limit = request.args.get("limit", "20")
+        if not limit.isdigit() or int(limit) < 1:
+            return {"error": "limit must be a positive integer"}, 400
+
+        ranked = recommendation_index.recommend(current_user, min(int(limit), MAX_RECOMMENDATIONS),
+                                                request.args.get("location"))
+        details = job_listings.find_job_details([id for id, _ in ranked])
+        return [
+            {"_id": id, **dict(zip(job_listings.JOB_DETAIL_FIELDS, details[id])), "score": score}
+            for id, score in ranked if id in details
+        ], HTTPStatus.OK
+
+
 @api.route("/inquire")
 @api.response(HTTPStatus.OK, "Success")
 class JobSeekers(Resource):
@@ -259,16 +302,18 @@ class JobSeekers(Resource):
     @api.doc(security='apikey')
     @jwt_required()
     def get(self):
-        if not "first" in current_user: #job seekers
+        if not is_job_seeker(): #job seekers
             return {"error":"Only signed-in job seekers can see their own application status"}, 401
         
-        email = current_user['email']
+        email = get_current_email()
         apply_data = job_seekers.inquire_status(email)
 
         return {"data":apply_data}, HTTPStatus.OK
 
 
-ai_service = AIService()
+match_engine = MatchEngine()
+ai_service = AIService(scorer=match_engine)
+ai_job_runner = AIJobRunner(ai_service)
 AI_SUGGESTION_RESPONSE = api.model(
     "AISuggestionResponse",
     {
@@ -300,6 +345,74 @@ AI_SUGGESTION_FLDS = api.model(
         }))
     }
 )
+def read_suggestion_request():
+    # Get and validate input data
+    data = request.get_json(force=True)
+    if not data:
+        api.abort(400, "Request body must be JSON")
+    
+    job = data.get("job")
+    applicant = data.get("applicant")
+    
+    if (not job or not applicant):
+        api.abort(400, "Both job and applicant data are required")
+
+    # Validate required fields
+    required_job_fields = {
+        'title': str,
+        'company': str,
+        'location': str,
+        'industry': str,
+        'seniority': int
+    }
+    
+    required_applicant_fields = {
+        'first': str,
+        'last': str,
+        'email': str,
+        'expertise': str,
+        'years': int
+    }
+
+    # Validate job fields
+    for field, field_type in required_job_fields.items():
+        if field not in job:
+            api.abort(400, f"Missing required job field: {field}")
+
+    # Validate applicant fields
+    for field, field_type in required_applicant_fields.items():
+        if field not in applicant:
+            api.abort(400, f"Missing required applicant field: {field}")
+
+    return job, applicant
+
+def log_suggestion_view(job):
+    # Log the A/B test view event of a suggestion request that is going ahead
+    session_id = get_session_id()
+
+    # Try to get the variant from cookies first
+    varient = request.cookies.get("AB_testing_varient")
+    # If not in cookies, try to get it from the request body as fallback
+    data = request.get_json(force=True)
+    if not varient and data.get("ABTestingVarient"):
+        varient = data.get("ABTestingVarient")
+
+    abtest.log_ab_test_event(session_id, varient,  f"view AI suggestions for {job['title']}")
+
+def format_suggestions(suggestions):
+    return {
+        "matchAnalysis": suggestions.get("analysis", "No analysis available"),
+        "tips": suggestions.get("suggestions", []),
+        "score": float(suggestions.get("matchScore", 0)),
+        "strengths": suggestions.get("strengths", [])
+    }
+
+def check_ai_suggestions_quota():
+    # Per user and global token buckets, shared by all workers
+    retry_after = ai_suggestions_retry_after(get_current_email())
+    if retry_after:
+        raise TooManyRequests("Too many AI suggestion requests, please try again later", retry_after=math.ceil(retry_after))
+
 @api.route("/ai/suggestions")
 @api.response(HTTPStatus.OK, "Success")
 @api.response(400, "Invalid request")
@@ -309,7 +422,7 @@ AI_SUGGESTION_FLDS = api.model(
 class AISuggestions(Resource):
     @api.expect(AI_SUGGESTION_FLDS)
     @api.marshal_with(AI_SUGGESTION_RESPONSE)
-    @api.doc(security='apikey')
+    @api.doc(security='apikey', params={"narrative": "Set to false for the instant match score only, without calling the AI model"})
     @jwt_required()
     def post(self):
         print(1)
@@ -319,73 +432,26 @@ class AISuggestions(Resource):
         Returns AI-generated suggestions for improving job application match
         including match score, analysis, tips, and strengths to highlight.
         """
+        if request.args.get("narrative", "").lower() == "false":
+            # the score is computed locally, no model call and no quota taken
+            job, applicant = read_suggestion_request()
+            log_suggestion_view(job)
+            score = match_engine.score(job, applicant)
+            return format_suggestions({"matchScore": score["matchScore"], "analysis": describe_score(score)}), HTTPStatus.OK
+
+        job, applicant = read_suggestion_request()
+        # taken once the request is valid, a malformed body costs no token
+        check_ai_suggestions_quota()
+
+        log_suggestion_view(job)
+
         try:
-            # Get and validate input data
-            data = request.get_json(force=True)
-            if not data:
-                api.abort(400, "Request body must be JSON")
-            
-            job = data.get("job")
-            applicant = data.get("applicant")
-            
-            if (not job or not applicant):
-                api.abort(400, "Both job and applicant data are required")
-
-            # Validate required fields
-            required_job_fields = {
-                'title': str,
-                'company': str,
-                'location': str,
-                'industry': str,
-                'seniority': int
-            }
-            
-            required_applicant_fields = {
-                'first': str,
-                'last': str,
-                'email': str,
-                'expertise': str,
-                'years': int
-            }
-
-            # Validate job fields
-            print("job: ",job)
-            print("applicant: ",applicant)
-            for field, field_type in required_job_fields.items():
-                if field not in job:
-                    api.abort(400, f"Missing required job field: {field}")
-
-            # Validate applicant fields
-            for field, field_type in required_applicant_fields.items():
-                if field not in applicant:
-                    api.abort(400, f"Missing required applicant field: {field}")
-
-            session_id = get_session_id()
-
-             # Try to get the variant from cookies first
-            varient = request.cookies.get("AB_testing_varient")
-            # If not in cookies, try to get it from the request body as fallback
-            if not varient and data.get("ABTestingVarient"):
-                varient = data.get("ABTestingVarient")
-
-            abtest.log_ab_test_event(session_id, varient,  f"view AI suggestions for {job['title']}")
-
-            # Rate limiting (1 request per 30 seconds)
-            time.sleep(31)
             # Get AI suggestions
             suggestions = ai_service.generate_suggestions(job, applicant)
             if not suggestions:
                 api.abort(500, "AI service returned empty response")
-        
-           
 
-            # Format response
-            return {
-                "matchAnalysis": suggestions.get("analysis", "No analysis available"),
-                "tips": suggestions.get("suggestions", []),
-                "score": float(suggestions.get("matchScore", 0)),
-                "strengths": suggestions.get("strengths", [])
-            }, HTTPStatus.OK
+            return format_suggestions(suggestions), HTTPStatus.OK
 
         except ValueError as e:
             api.abort(400, str(e))
@@ -393,6 +459,90 @@ class AISuggestions(Resource):
             api.abort(500, "Internal server error while generating AI suggestions")
 
 
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+@api.route("/ai/suggestions/stream")
+@api.response(HTTPStatus.OK, "Success")
+@api.response(400, "Invalid request")
+@api.response(429, "Too many requests")
+class AISuggestionsStream(Resource):
+    @api.expect(AI_SUGGESTION_FLDS)
+    @api.doc(security='apikey')
+    @jwt_required()
+    def post(self):
+        """
+        AI-powered suggestions streamed as JSON lines: {"analysis": text} while the model
+        writes the analysis, then {"result": suggestions}, or {"error": message} if it fails
+        """
+        job, applicant = read_suggestion_request()
+        check_ai_suggestions_quota()
+        log_suggestion_view(job)
+        return Response(_stream_suggestions(job, applicant), mimetype=NDJSON_MIMETYPE)
+
+def _stream_suggestions(job, applicant):
+    try:
+        for event in ai_service.stream_suggestions(job, applicant):
+            if "result" in event:
+                event = {"result": format_suggestions(event["result"])}
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        print(f"Error streaming from Gemini API: {str(e)}")
+        yield json.dumps({"error": "Could not generate analysis"}) + "\n"
+
+
+AI_JOB_MAX_WAIT = 2  # seconds, longest long poll: a waiting client holds one of the few sync workers
+
+@api.route("/ai/suggestions/jobs")
+@api.response(HTTPStatus.ACCEPTED, "Job queued")
+@api.response(400, "Invalid request")
+@api.response(429, "Too many requests")
+@api.response(503, "Too many jobs in progress")
+class AISuggestionJobs(Resource):
+    @api.expect(AI_SUGGESTION_FLDS)
+    @api.doc(security='apikey')
+    @jwt_required()
+    def post(self):
+        """
+        Queue AI-powered suggestions for a job application, poll the returned job for the result
+        """
+        job, applicant = read_suggestion_request()
+        check_ai_suggestions_quota()
+        log_suggestion_view(job)
+
+        job_id = ai_job_runner.submit(get_current_email(), job, applicant)
+        if job_id is None:
+            return {"error": "Too many AI suggestion jobs in progress, please try again later"}, HTTPStatus.SERVICE_UNAVAILABLE
+
+        return {"job_id": job_id, "status": ai_jobs.JOB_PENDING}, HTTPStatus.ACCEPTED, {"Location": f"{request.base_url}/{job_id}"}
+
+@api.route("/ai/suggestions/jobs/<job_id>")
+@api.response(HTTPStatus.OK, "Success")
+@api.response(404, "Job not found")
+class AISuggestionJob(Resource):
+    @api.doc(security='apikey')
+    @api.param("wait", f"Seconds to wait for the job to finish (long poll), at most {AI_JOB_MAX_WAIT}")
+    @jwt_required()
+    def get(self, job_id):
+        """
+        Status of a queued AI suggestions job, with the suggestions once it is done
+        """
+        try:
+            wait = min(max(float(request.args.get("wait", 0)), 0), AI_JOB_MAX_WAIT)
+        except ValueError:
+            return {"error": "wait must be a number of seconds"}, 400
+
+        record = ai_jobs.wait_for_job(job_id, get_current_email(), wait)
+        if record is None:
+            return {"error": "AI suggestion job not found"}, HTTPStatus.NOT_FOUND
+
+        response = {"job_id": job_id, "status": record["status"]}
+        if record["status"] == ai_jobs.JOB_DONE:
+            response["result"] = format_suggestions(record["result"])
+        elif record["status"] == ai_jobs.JOB_FAILED:
+            response["error"] = "AI service error, please try again later"
+        return response, HTTPStatus.OK
+
+
 @api.route("/ab_survey")
 @api.response(HTTPStatus.OK, "Success")
 @api.response(400, "Invalid request")
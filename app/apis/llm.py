@@ -1,18 +1,81 @@
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import time
+from app.db import suggestions as suggestion_cache
+from .llm_json import parse_suggestions, parse_candidate_scores, StreamingFieldReader
 
 load_dotenv(dotenv_path='../../.env')
 
 class AIService:
-    def __init__(self):
-        self.api_key = os.getenv('GOOGLE_API_KEY')
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+    def __init__(self, model=None, use_cache=True, scorer=None):
+        # model: anything with generate_content(prompt) returning an object with .text (a stub in tests)
+        # scorer: a local MatchEngine, its score replaces the model's so the model only writes the text
+        if model is None:
+            self.api_key = os.getenv('GOOGLE_API_KEY')
+            genai.configure(api_key=self.api_key)
+            model = genai.GenerativeModel("gemini-1.5-flash")
+        self.model = model
+        self.use_cache = use_cache
+        self.scorer = scorer
         
     def generate_suggestions(self, job, applicant):
-        prompt = f"""
+        try:
+            return self.fetch_suggestions(job, applicant)
+        except Exception as e:
+            print(f"Error calling Gemini API: {str(e)}")
+            return {
+                "matchScore": self.scorer.score(job, applicant)["matchScore"] if self.scorer else 0,
+                "analysis": "Could not generate analysis",
+                "suggestions": [],
+                "strengths": []
+            }
+
+    def fetch_suggestions(self, job, applicant):
+        # Like generate_suggestions, but a failed model call raises (for callers that retry)
+        suggestions = self._fetch_narrative(job, applicant)
+        if self.scorer:
+            suggestions["matchScore"] = self.scorer.score(job, applicant)["matchScore"]
+        return suggestions
+
+    def _fetch_narrative(self, job, applicant):
+        # Same job and applicant profile as a recent call: reuse its answer
+        key = suggestion_cache.suggestion_key(job, applicant)
+        if self.use_cache:
+            cached = suggestion_cache.get_cached_suggestions(key)
+            if cached is not None:
+                return cached
+
+        response = self.model.generate_content(self._suggestion_prompt(job, applicant))
+        suggestions = parse_suggestions(response.text)
+
+        if self.use_cache:  # only real answers, a failed call is retried next time
+            suggestion_cache.cache_suggestions(key, suggestions, job.get("_id"), applicant.get("email"))
+        return suggestions
+
+    def stream_suggestions(self, job, applicant):
+        """
+        Like fetch_suggestions, but yields {"analysis": text} as the analysis arrives from
+        the model and ends with {"result": suggestions} once the whole answer is parsed.
+        """
+        key = suggestion_cache.suggestion_key(job, applicant)
+        suggestions = suggestion_cache.get_cached_suggestions(key) if self.use_cache else None
+
+        if suggestions is None:
+            reader = StreamingFieldReader("analysis")
+            for chunk in self.model.generate_content(self._suggestion_prompt(job, applicant), stream=True):
+                text = reader.feed(chunk.text)
+                if text:
+                    yield {"analysis": text}
+            suggestions = parse_suggestions(reader.buffer)
+            if self.use_cache:
+                suggestion_cache.cache_suggestions(key, suggestions, job.get("_id"), applicant.get("email"))
+
+        if self.scorer:
+            suggestions["matchScore"] = self.scorer.score(job, applicant)["matchScore"]
+        yield {"result": suggestions}
+
+    def _suggestion_prompt(self, job, applicant):
+        return f"""
         Analyze this job application match and provide tailored suggestions:
         
         Job Details:
@@ -40,23 +103,47 @@ class AIService:
             "strengths": [string]
         }}
         """
+
+    def score_candidates(self, job, candidates):
+        """
+        Score several applicants for one job with a single model call.
+
+        Returns a dict of applicant email -> {"matchScore", "analysis"}; candidates the model
+        left out are missing from it. A failed model call raises.
+        """
+        lines = "\n".join(
+            f"        - Email: {candidate['email']}; Name: {candidate['first']} {candidate['last']}; "
+            f"Expertise: {candidate['expertise']}; Experience: {candidate['years']} years"
+            for candidate in candidates
+        )
+        prompt = f"""
+        Rate how well each of these applicants matches the job.
         
-        try:
-            response = self.model.generate_content(prompt)
-            # Parse the response text into JSON
-            return self._parse_response(response.text)
-        except Exception as e:
-            print(f"Error calling Gemini API: {str(e)}")
-            return {
-                "matchScore": 0,
-                "analysis": "Could not generate analysis",
-                "suggestions": [],
-                "strengths": []
-            }
-    
-    def _parse_response(self, response_text):
-        # Gemini returns markdown with ```json ``` wrappers
-        if '```json' in response_text:
-            json_part = response_text.split('```json')[1].split('```')[0]
-            return eval(json_part)
-        return eval(response_text)
\ No newline at end of file
+        Job Details:
+        - Title: {job['title']}
+        - Company: {job['company']}
+        - Location: {job['location']}
+        - Industry: {job['industry']}
+        - Required Experience: {job['seniority']} years
+        
+        Applicants:
+{lines}
+        
+        Format your response as a JSON list with one entry per applicant:
+        [
+            {{
+                "email": string,
+                "matchScore": number (0-100),
+                "analysis": string (one sentence)
+            }}
+        ]
+        """
+
+        response = self.model.generate_content(prompt)
+        results = parse_candidate_scores(response.text)
+
+        emails = {candidate["email"] for candidate in candidates}
+        return {
+            result["email"]: {"matchScore": result["matchScore"], "analysis": result["analysis"]}
+            for result in results if result["email"] in emails
+        }
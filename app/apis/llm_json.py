@@ -0,0 +1,177 @@
+import json
+import re
+
+FENCE_REGEX = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_REGEX = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+PYTHON_LITERAL_REGEX = re.compile(r'"(?:\\.|[^"\\])*"|\b(True|False|None)\b')
+
+# Fields of the AI suggestions answer and of one entry of a batch scoring answer
+SUGGESTION_FIELDS = {"matchScore": "score", "analysis": "text", "suggestions": "texts", "strengths": "texts"}
+CANDIDATE_FIELDS = {"email": "text", "matchScore": "score", "analysis": "text"}
+
+
+class LLMResponseError(ValueError):
+    """The model answer is not the JSON that was asked for."""
+
+
+def _unfence(text):
+    # Gemini wraps its JSON in ```json ``` markdown, the closing fence is missing when the answer was cut off
+    match = FENCE_REGEX.search(text)
+    return match.group(1) if match else text
+
+def _decode(text):
+    # the first JSON object or list in the text, whatever surrounds it
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise LLMResponseError("No JSON in the model response")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, min(starts))
+    except json.JSONDecodeError as e:
+        raise LLMResponseError(f"Invalid JSON in the model response: {e}") from e
+    return value
+
+def repair_json(text):
+    """
+    Best-effort fix of the usual mistakes in model output: Python literals, trailing
+    commas and an answer cut off in the middle of a string, list or object.
+    """
+    text = PYTHON_LITERAL_REGEX.sub(lambda m: PYTHON_LITERALS[m.group(1)] if m.group(1) else m.group(0), text)
+    text = TRAILING_COMMA_REGEX.sub(r"\1", text)
+
+    closers = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+
+    if in_string:
+        text += '"'
+    text = re.sub(r"[,:]\s*$", "", text.rstrip())
+    return TRAILING_COMMA_REGEX.sub(r"\1", text + "".join(reversed(closers)))
+
+def parse_json(text, repair=False):
+    """
+    Parse the JSON in a model response. Strict by default; with repair, an answer
+    that does not parse is fixed up with repair_json and parsed again.
+    """
+    text = _unfence(text or "")
+    try:
+        return _decode(text)
+    except LLMResponseError:
+        if not repair:
+            raise
+        return _decode(repair_json(text))
+
+
+def _check(value, kind, field):
+    if kind == "score":
+        if isinstance(value, str):
+            value = value.strip().rstrip("%")
+        try:
+            score = float(value)
+        except (TypeError, ValueError):
+            raise LLMResponseError(f"{field} is not a number")
+        return min(max(score, 0), 100)
+    if kind == "text":
+        if not isinstance(value, str):
+            raise LLMResponseError(f"{field} is not a string")
+        return value
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise LLMResponseError(f"{field} is not a list of strings")
+    return value
+
+def validate(data, fields):
+    """
+    Check a parsed answer against fields (name -> "score", "text" or "texts") and
+    return only those fields, the score clamped to 0-100.
+    """
+    if not isinstance(data, dict):
+        raise LLMResponseError("The model response is not a JSON object")
+    missing = [field for field in fields if field not in data]
+    if missing:
+        raise LLMResponseError(f"Missing fields in the model response: {', '.join(missing)}")
+    return {field: _check(data[field], kind, field) for field, kind in fields.items()}
+
+def parse_suggestions(text, repair=True):
+    return validate(parse_json(text, repair), SUGGESTION_FIELDS)
+
+def parse_candidate_scores(text, repair=True):
+    """A list of batch scoring entries, malformed entries are left out."""
+    data = parse_json(text, repair)
+    if not isinstance(data, list):
+        raise LLMResponseError("The model response is not a JSON list")
+    results = []
+    for entry in data:
+        try:
+            results.append(validate(entry, CANDIDATE_FIELDS))
+        except LLMResponseError as e:
+            print(f"Skipping a candidate score: {e}")
+    return results
+
+
+class StreamingFieldReader:
+    """
+    Follows the text of one string field while a JSON answer arrives in chunks, so it
+    can be shown before the answer is complete. feed() returns the newly decoded part.
+    """
+
+    KEY_REGEX_TEMPLATE = r'"{}"\s*:\s*"'
+    ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field):
+        self._key = re.compile(self.KEY_REGEX_TEMPLATE.format(re.escape(field)))
+        self.buffer = ""
+        self._position = None  # where the undecoded part of the value starts
+        self.done = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        if self.done:
+            return ""
+        if self._position is None:
+            match = self._key.search(self.buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        i = self._position
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char == "\\":
+                if i + 1 >= len(self.buffer):
+                    break  # the rest of the escape is in the next chunk
+                if self.buffer[i + 1] == "u":
+                    if i + 6 > len(self.buffer):
+                        break
+                    try:
+                        decoded.append(chr(int(self.buffer[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                decoded.append(self.ESCAPES.get(self.buffer[i + 1], self.buffer[i + 1]))
+                i += 2
+                continue
+            decoded.append(char)
+            i += 1
+        self._position = i
+        return "".join(decoded)
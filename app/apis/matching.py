@@ -0,0 +1,362 @@
+from app.db import job_listings
+from app.db.constants import TITLE, INDUSTRY, LOCATION, SENIORITY
+from app.db.search import tokenize
+import math
+import re
+import threading
+import time
+import numpy as np
+
+# Weight of each part in the match score, they add up to 1
+SKILLS_WEIGHT = 0.6
+EXPERIENCE_WEIGHT = 0.4
+
+# The listing fields a job seeker's expertise is compared with
+SKILL_FIELDS = (TITLE, INDUSTRY)
+
+# Years of experience a seniority slug stands for, when it does not hold a number
+SENIORITY_YEARS = {"intern": 0, "entry": 0, "junior": 1, "mid": 3, "senior": 5, "lead": 7, "principal": 10}
+YEARS_REGEX = re.compile(r"\d+")
+
+DEFAULT_MAX_AGE = 300  # seconds the term weights are used before they are recomputed from the listings
+
+
+def required_years(seniority):
+    """Years of experience asked for by a listing, from a number or a slug such as 'mid-level'."""
+    if isinstance(seniority, (int, float)):
+        return max(float(seniority), 0)
+    match = YEARS_REGEX.search(str(seniority or ""))
+    if match:
+        return float(match.group())
+    for term in tokenize(seniority):
+        if term in SENIORITY_YEARS:
+            return float(SENIORITY_YEARS[term])
+    return 0.0
+
+def experience_fit(years, required):
+    # 1 when the applicant has the years asked for, falling off linearly below that
+    if required <= 0:
+        return 1.0
+    return min(max(float(years or 0), 0) / required, 1.0)
+
+
+class _Rebuilt:
+    """
+    Data computed from all job listings and rebuilt once it is max_age seconds old.
+
+    The first build is waited for. Later ones run in a background thread while the old
+    data keeps being served, and _swap puts the result in place under the lock, along with
+    the listing writes made in this process during the build (see _record_change).
+    """
+
+    def __init__(self, max_age, clock):
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # one build at a time
+        self._built_at = None
+        self._changes = None                 # writes made during a build, to replay on its result
+        self._rebuild_thread = None
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_fresh(self):
+        # called without the lock held
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif self._clock() - self._built_at >= self.max_age and self._build_lock.acquire(blocking=False):
+            self._rebuild_thread = threading.Thread(target=self._rebuild_in_background, daemon=True)
+            self._rebuild_thread.start()
+
+    def _rebuild_in_background(self):
+        try:
+            self._rebuild()
+        except Exception as e:
+            print(f"Rebuilding {type(self).__name__} failed: {e}")
+        finally:
+            self._build_lock.release()
+
+    def _rebuild(self):
+        started_at = self._clock()
+        with self._lock:
+            self._changes = []
+        try:
+            built = self._build()
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            self._swap(built, self._changes)
+            self._changes = None
+            self._built_at = started_at
+
+    def _record_change(self, *change):
+        # called with the lock held, the change may be missing from a build in progress
+        if self._changes is not None:
+            self._changes.append(change)
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _swap(self, built, changes):
+        raise NotImplementedError
+
+
+class MatchEngine(_Rebuilt):
+    """
+    Deterministic match score of an applicant for a job, computed in process.
+
+    The skills part is the cosine similarity of the TF-IDF vectors of the applicant's
+    expertise and the job's title and industry. The IDF weights come from all listings,
+    counted with NumPy, and are recomputed in the background once they are max_age seconds old.
+    """
+
+    def __init__(self, load_listings=None, max_age=DEFAULT_MAX_AGE, clock=time.monotonic):
+        super().__init__(max_age, clock)
+        self._load_listings = load_listings or (lambda: job_listings.iter_job_listings(
+            projection={field: 1 for field in SKILL_FIELDS}))
+        self._term_weights = ({}, np.zeros(0), 1.0)  # term -> column in the IDF array, IDF array, unseen term IDF
+
+    def _weights(self):
+        self._ensure_fresh()
+        return self._term_weights
+
+    def _swap(self, built, changes):
+        self._term_weights = built
+
+    def _build(self):
+        vocabulary = {}
+        columns = []
+        count = 0
+        for listing in self._load_listings():
+            count += 1
+            terms = {term for field in SKILL_FIELDS for term in tokenize(listing.get(field))}
+            columns.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+
+        frequencies = np.bincount(np.asarray(columns, dtype=np.int64), minlength=len(vocabulary))
+        # smoothed IDF, a term missing from every listing weighs as much as the rarest one
+        return vocabulary, np.log((1 + count) / (1 + frequencies)) + 1, math.log(1 + count) + 1
+
+    def _vector(self, terms, vocabulary, idf, default_idf, positions):
+        vector = np.zeros(len(positions))
+        for term in terms:
+            column = vocabulary.get(term)
+            vector[positions[term]] += idf[column] if column is not None else default_idf
+        return vector
+
+    def skills_similarity(self, job, applicant):
+        job_terms = [term for field in SKILL_FIELDS for term in tokenize(job.get(field))]
+        applicant_terms = tokenize(applicant.get("expertise"))
+        if not job_terms or not applicant_terms:
+            return 0.0
+
+        vocabulary, idf, default_idf = self._weights()
+        positions = {term: i for i, term in enumerate(dict.fromkeys(job_terms + applicant_terms))}
+        job_vector = self._vector(job_terms, vocabulary, idf, default_idf, positions)
+        applicant_vector = self._vector(applicant_terms, vocabulary, idf, default_idf, positions)
+        return float(job_vector @ applicant_vector / (np.linalg.norm(job_vector) * np.linalg.norm(applicant_vector)))
+
+    def score(self, job, applicant):
+        """
+        Returns:
+            dict: "matchScore" (0-100) with its "skills" and "experience" parts (0-1).
+        """
+        skills = self.skills_similarity(job, applicant)
+        experience = experience_fit(applicant.get("years"), required_years(job.get("seniority")))
+        return {
+            "matchScore": round(100 * (SKILLS_WEIGHT * skills + EXPERIENCE_WEIGHT * experience)),
+            "skills": round(skills, 3),
+            "experience": round(experience, 3),
+        }
+
+
+def describe_score(score):
+    return (f"{round(100 * score['skills'])}% of the expertise matches the job, "
+            f"{round(100 * score['experience'])}% of the experience asked for")
+
+
+# Listing fields in the recommendation vectors and the weight of a term found in each,
+# the seniority is compared as years of experience instead
+RECOMMEND_FIELD_WEIGHTS = {TITLE: 2, INDUSTRY: 1, LOCATION: 1}
+DEFAULT_TOP_K = 20
+
+
+class RecommendationIndex(_Rebuilt):
+    """
+    Sparse TF vectors of all job listings, one row per listing, to rank every listing
+    against a job seeker's profile with one sparse matrix-vector product.
+
+    The matrix is kept as (row, column, value) arrays; rows are L2 normalized and the
+    profile side is IDF weighted, so a write only touches the rows of its listing. Writes
+    made in this process are applied as they happen (see job_listings.add_listing_listener),
+    the whole matrix is rebuilt from the collection in the background once it is max_age
+    seconds old to pick up the writes of the other workers. Deleted rows are dropped once
+    they are half the matrix.
+    """
+
+    # attributes holding the matrix, replaced together by a rebuild
+    _MATRIX = ("_vocabulary", "_frequencies", "_ids", "_rows", "_required", "_entries",
+               "_required_array", "_row_index", "_column_index", "_values", "_dead")
+
+    def __init__(self, load_listings=None, max_age=DEFAULT_MAX_AGE, clock=time.monotonic):
+        super().__init__(max_age, clock)
+        self._load_listings = load_listings or (lambda: job_listings.iter_job_listings(
+            projection={field: 1 for field in (*RECOMMEND_FIELD_WEIGHTS, SENIORITY)}))
+        self._reset()
+
+    def _reset(self):
+        self._vocabulary = {}                            # "field:term" -> column
+        self._frequencies = np.zeros(0, dtype=np.int64)  # listings holding each column
+        self._ids = []                                   # row -> listing id, None once deleted
+        self._rows = {}                                  # listing id -> row
+        self._required = []                              # row -> years of experience asked for
+        self._entries = ([], [], [])                     # rows, columns, values not yet in the arrays
+        self._required_array = np.zeros(0)
+        self._row_index = np.zeros(0, dtype=np.int64)
+        self._column_index = np.zeros(0, dtype=np.int64)
+        self._values = np.zeros(0)
+        self._dead = 0
+
+    def __len__(self):
+        self._ensure_fresh()
+        with self._lock:
+            return len(self._rows)
+
+    def on_listing_change(self, id, listing=None):
+        with self._lock:
+            self._record_change(id, listing)
+            if self._built_at is not None:  # otherwise built from the collection on first use
+                self._apply(id, listing)
+
+    def _build(self):
+        index = RecommendationIndex(self._load_listings)
+        for listing in self._load_listings():
+            index._add(str(listing["_id"]), listing)
+        return index
+
+    def _swap(self, index, changes):
+        for id, listing in changes:
+            index._apply(id, listing)
+        for name in self._MATRIX:
+            setattr(self, name, getattr(index, name))
+
+    def _apply(self, id, listing):
+        self._remove(id)
+        if listing is not None:
+            self._add(id, listing)
+
+    def _features(self, listing):
+        weights = {}
+        for field, weight in RECOMMEND_FIELD_WEIGHTS.items():
+            for term in tokenize(listing.get(field)):
+                feature = f"{field}:{term}"
+                weights[feature] = weights.get(feature, 0) + weight
+        return weights
+
+    def _add(self, id, listing):
+        weights = self._features(listing)
+        row = len(self._ids)
+        self._ids.append(id)
+        self._rows[id] = row
+        self._required.append(required_years(listing.get(SENIORITY)))
+        if not weights:
+            return
+
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        rows, columns, values = self._entries
+        for feature, weight in weights.items():
+            column = self._vocabulary.setdefault(feature, len(self._vocabulary))
+            rows.append(row)
+            columns.append(column)
+            values.append(weight / norm)
+
+        if len(self._vocabulary) > len(self._frequencies):
+            self._frequencies = np.concatenate(
+                [self._frequencies, np.zeros(len(self._vocabulary) - len(self._frequencies), dtype=np.int64)])
+        self._frequencies[[self._vocabulary[feature] for feature in weights]] += 1
+
+    def _remove(self, id):
+        row = self._rows.pop(id, None)
+        if row is None:
+            return
+        self._ids[row] = None
+        self._dead += 1
+        self._flush()
+        entries = self._row_index == row
+        self._frequencies[self._column_index[entries]] -= 1
+        self._values[entries] = 0  # the row no longer scores
+        if self._dead * 2 > len(self._ids):
+            self._compact()
+
+    def _flush(self):
+        # appends are batched in Python lists, moved into the arrays before a read
+        rows, columns, values = self._entries
+        if rows:
+            self._row_index = np.concatenate([self._row_index, np.asarray(rows, dtype=np.int64)])
+            self._column_index = np.concatenate([self._column_index, np.asarray(columns, dtype=np.int64)])
+            self._values = np.concatenate([self._values, np.asarray(values)])
+            self._entries = ([], [], [])
+        if len(self._required) > len(self._required_array):
+            self._required_array = np.concatenate(
+                [self._required_array, np.asarray(self._required[len(self._required_array):], dtype=float)])
+
+    def _compact(self):
+        alive = np.array([id is not None for id in self._ids], dtype=bool)
+        new_rows = np.cumsum(alive) - 1
+        keep = alive[self._row_index]
+        self._row_index = new_rows[self._row_index[keep]]
+        self._column_index = self._column_index[keep]
+        self._values = self._values[keep]
+        self._ids = [id for id in self._ids if id is not None]
+        self._required = [required for required, live in zip(self._required, alive) if live]
+        self._required_array = np.asarray(self._required, dtype=float)
+        self._rows = {id: row for row, id in enumerate(self._ids)}
+        self._dead = 0
+
+    def recommend(self, profile, k=DEFAULT_TOP_K, location=None):
+        """
+        Best matching listings for a job seeker profile ("expertise" and "years"), optionally
+        favouring a location.
+
+        Returns:
+            list: up to k (listing id, score 0-100) pairs, best first. Only listings that share
+            a term with the profile are ranked.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            self._flush()
+            # rows added once the lock is released are past n, rows removed read None
+            ids = self._ids
+            n = len(ids)
+            query = np.zeros(len(self._vocabulary))
+            listing_count = max(len(self._rows), 1)
+            for field, text in ((TITLE, profile.get("expertise")), (INDUSTRY, profile.get("expertise")),
+                                (LOCATION, location)):
+                for term in tokenize(text):
+                    column = self._vocabulary.get(f"{field}:{term}")
+                    if column is not None and self._frequencies[column]:
+                        query[column] += math.log((1 + listing_count) / (1 + self._frequencies[column])) + 1
+
+            if not query.any() or not n:
+                return []
+            query /= np.linalg.norm(query)
+            similarity = np.bincount(self._row_index, weights=self._values * query[self._column_index],
+                                     minlength=n)
+            required = self._required_array[:n]
+
+        years = max(float(profile.get("years") or 0), 0)
+        experience = np.ones(n)
+        asked = required > 0
+        experience[asked] = np.minimum(years / required[asked], 1)
+        scores = np.where(similarity > 0, SKILLS_WEIGHT * similarity + EXPERIENCE_WEIGHT * experience, 0)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(ids[row], round(100 * float(scores[row]), 1)) for row in candidates if ids[row] is not None]
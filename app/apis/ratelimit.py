@@ -0,0 +1,89 @@
+from contextlib import closing
+from flask import current_app
+import os
+import sqlite3
+import tempfile
+import time
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "job_board_ratelimit.sqlite3")
+
+# AI suggestions quotas, requests per minute and burst size, overridable in the Flask config
+AI_SUGGESTIONS_USER_RATE = 2
+AI_SUGGESTIONS_USER_BURST = 1
+AI_SUGGESTIONS_GLOBAL_RATE = 15
+AI_SUGGESTIONS_GLOBAL_BURST = 5
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets kept in a SQLite file, so every gunicorn worker on the host draws
+    from the same buckets. A bucket holds up to `capacity` tokens and refills at
+    `rate` tokens per second; each request takes one token from every bucket it uses.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, clock=time.time):
+        self.path = path
+        self._clock = clock
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connect(self):
+        # one short-lived connection per call, connections cannot be shared across forked workers
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def acquire(self, buckets, cost=1):
+        """
+        Take `cost` tokens from every bucket in `buckets`, a list of (key, rate, capacity),
+        or from none of them.
+
+        Returns:
+            float: 0 when the tokens were taken, otherwise the seconds until they will be available.
+        """
+        now = self._clock()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")  # serializes the read-modify-write across processes
+            levels = []
+            retry_after = 0.0
+            for key, rate, capacity in buckets:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                levels.append((key, tokens))
+                if tokens < cost:
+                    retry_after = max(retry_after, (cost - tokens) / rate)
+
+            if not retry_after:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    [(key, tokens - cost, now) for key, tokens in levels]
+                )
+            conn.execute("COMMIT")
+        return retry_after
+
+    def reset(self, key=None):
+        with closing(self._connect()) as conn:
+            if key is None:
+                conn.execute("DELETE FROM buckets")
+            else:
+                conn.execute("DELETE FROM buckets WHERE key = ?", (key,))
+
+
+_limiters = {}
+
+def get_limiter(path=DEFAULT_DB_PATH):
+    if path not in _limiters:
+        _limiters[path] = TokenBucketLimiter(path)
+    return _limiters[path]
+
+
+def ai_suggestions_retry_after(user):
+    """
+    Take one AI suggestions request from the user's bucket and the global one.
+    Returns 0 when the request may go ahead, otherwise the seconds to wait.
+    """
+    config = current_app.config
+    user_rate = config.get("AI_SUGGESTIONS_USER_RATE", AI_SUGGESTIONS_USER_RATE)
+    global_rate = config.get("AI_SUGGESTIONS_GLOBAL_RATE", AI_SUGGESTIONS_GLOBAL_RATE)
+    return get_limiter(config.get("RATE_LIMIT_DB", DEFAULT_DB_PATH)).acquire([
+        (f"ai_suggestions:user:{user}", user_rate / 60, config.get("AI_SUGGESTIONS_USER_BURST", AI_SUGGESTIONS_USER_BURST)),
+        ("ai_suggestions:global", global_rate / 60, config.get("AI_SUGGESTIONS_GLOBAL_BURST", AI_SUGGESTIONS_GLOBAL_BURST)),
+    ])
@@ -0,0 +1,59 @@
+from app.db import ai_scores, job_seekers
+from app.db.suggestions import suggestion_key
+from concurrent.futures import ThreadPoolExecutor
+
+CANDIDATES_PER_PROMPT = 10   # applicants packed into one model call
+MAX_CONCURRENT_PROMPTS = 3   # model calls in flight for one scoring run
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def score_applicants(service, job, emails, force=False,
+                     batch_size=CANDIDATES_PER_PROMPT, max_workers=MAX_CONCURRENT_PROMPTS):
+    """
+    Score every applicant of a job listing and store the results for the ranking view.
+
+    The profiles are read in one query, applicants are scored batch_size per model call with
+    at most max_workers calls at once. An applicant whose profile and the listing are unchanged
+    since the stored score is skipped, unless force is set.
+
+    Returns:
+        dict: counts of "scored", "skipped" and "failed" applicants.
+    """
+    listing_id = job["_id"]
+    stored = {} if force else ai_scores.get_input_keys(listing_id)
+
+    candidates = []
+    skipped = 0
+    for profile in job_seekers.find_job_seeker_profiles(emails):
+        input_key = suggestion_key(job, profile)
+        if stored.get(profile["email"]) == input_key:
+            skipped += 1
+        else:
+            candidates.append((profile, input_key))
+
+    def score_batch(batch):
+        try:
+            results = service.score_candidates(job, [profile for profile, _ in batch])
+        except Exception as e:
+            print(f"Error scoring applicants of job {listing_id}: {e}")
+            return {}
+        return {
+            profile["email"]: {
+                "score": results[profile["email"]]["matchScore"],
+                "analysis": results[profile["email"]]["analysis"],
+                "input_key": input_key,
+            }
+            for profile, input_key in batch if profile["email"] in results
+        }
+
+    scores = {}
+    if candidates:
+        with ThreadPoolExecutor(min(max_workers, len(candidates)), thread_name_prefix="ai-scoring") as executor:
+            for batch_scores in executor.map(score_batch, _batches(candidates, batch_size)):
+                scores.update(batch_scores)
+
+    ai_scores.save_scores(listing_id, scores)
+    return {"scored": len(scores), "skipped": skipped, "failed": len(candidates) - len(scores)}
@@ -4,19 +4,69 @@ from dotenv import load_dotenv
 import mongomock
 import pymongo
 import os
+import tempfile
 from pymongo import MongoClient
 
 
 # Load environment variables from .env file
 load_dotenv()
 
+def _optional(name, convert=str):
+    # None when the variable is not set, so the driver default applies
+    value = environ.get(name)
+    return convert(value) if value not in (None, "") else None
+
 class BaseConfig(ABC):
     DEBUG = False
     TESTING = False
     DB_CLIENT = lambda uri: pymongo.MongoClient(uri)
+    # In-process cache of the user behind a JWT (current_user)
+    USER_CACHE_MAX_SIZE = int(environ.get('USER_CACHE_MAX_SIZE', 1024))
+    USER_CACHE_TTL = int(environ.get('USER_CACHE_TTL', 60))  # seconds
+    # Token buckets of POST /api/job_seekers/ai/suggestions, requests per minute and burst size
+    AI_SUGGESTIONS_USER_RATE = float(environ.get('AI_SUGGESTIONS_USER_RATE', 2))
+    AI_SUGGESTIONS_USER_BURST = int(environ.get('AI_SUGGESTIONS_USER_BURST', 1))
+    AI_SUGGESTIONS_GLOBAL_RATE = float(environ.get('AI_SUGGESTIONS_GLOBAL_RATE', 15))
+    AI_SUGGESTIONS_GLOBAL_BURST = int(environ.get('AI_SUGGESTIONS_GLOBAL_BURST', 5))
+    # SQLite file holding the buckets, must be on a disk shared by all workers of the host
+    RATE_LIMIT_DB = environ.get('RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), "job_board_ratelimit.sqlite3"))
+    # Background AI suggestion jobs, per worker process: model calls at once and jobs outstanding
+    AI_JOB_WORKERS = int(environ.get('AI_JOB_WORKERS', 4))
+    AI_JOB_MAX_PENDING = int(environ.get('AI_JOB_MAX_PENDING', 32))
+    # bcrypt cost factor of new password hashes, and the hashing pool of each worker process:
+    # processes (0 hashes in the request thread), hashes waiting at most, seconds to wait for one
+    PASSWORD_HASH_ROUNDS = int(environ.get('PASSWORD_HASH_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT = float(environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    # MongoClient of each worker process, see app.db.db.CLIENT_OPTIONS. Unset keeps the driver default
+    MONGO_MAX_POOL_SIZE = int(environ.get('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = _optional('MONGO_MAX_IDLE_TIME_MS', int)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = _optional('MONGO_WAIT_QUEUE_TIMEOUT_MS', int)  # give up waiting for a free connection
+    MONGO_CONNECT_TIMEOUT_MS = int(environ.get('MONGO_CONNECT_TIMEOUT_MS', 20000))
+    MONGO_SOCKET_TIMEOUT_MS = _optional('MONGO_SOCKET_TIMEOUT_MS', int)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000))
+    MONGO_READ_PREFERENCE = environ.get('MONGO_READ_PREFERENCE', 'primary')
+    MONGO_WRITE_CONCERN = _optional('MONGO_WRITE_CONCERN')  # a number of nodes or "majority"
+    MONGO_JOURNAL = _optional('MONGO_JOURNAL', lambda value: value.lower() == 'true')
+    MONGO_COMPRESSORS = _optional('MONGO_COMPRESSORS')  # e.g. "zstd,zlib"
+    # Directory of the A/B test event and survey logs, the repository's logs/ when unset
+    AB_TEST_LOGS_DIR = _optional('AB_TEST_LOGS_DIR')
+    # Reverse proxies in front of the app (nginx/default.conf), 0 when clients connect directly
+    TRUSTED_PROXIES = int(environ.get('TRUSTED_PROXIES', 1))
+    # Command timings of app.db.instrumentation.QueryProfiler. Commands slower than QUERY_SLOW_MS
+    # are logged with their filter shape and, when QUERY_EXPLAIN_SLOW is on, the plan MongoDB
+    # picked. QUERY_PROFILE_HEADER lets any client ask for the query count and time of its
+    # request with an X-Query-Profile header (always allowed in debug mode)
+    QUERY_PROFILING = environ.get('QUERY_PROFILING', 'true').lower() == 'true'
+    QUERY_PROFILE_HEADER = environ.get('QUERY_PROFILE_HEADER', 'false').lower() == 'true'
+    QUERY_SLOW_MS = float(environ.get('QUERY_SLOW_MS', 100))
+    QUERY_EXPLAIN_SLOW = environ.get('QUERY_EXPLAIN_SLOW', 'true').lower() == 'true'
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
+    MONGO_MAX_POOL_SIZE = int(environ.get('MONGO_MAX_POOL_SIZE', 10))
     MONGO_URI = environ.get('DEV_MONGODB_URI')
     DB_NAME = environ.get('DEV_DB_NAME')
     MONGO_DB_USERNAME = environ.get('MONGO_DB_USERNAME')
@@ -30,6 +80,11 @@ class ProductionConfig(BaseConfig):
     MONGO_DB_USERNAME = environ.get('MONGO_DB_USERNAME')
     MONGO_DB_PASSWORD = environ.get('MONGO_DB_PASSWORD')
     IS_PROD = environ.get('IS_PROD')
+    # fail fast instead of piling requests up behind an exhausted pool or an unreachable server
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_WRITE_CONCERN = environ.get('MONGO_WRITE_CONCERN', 'majority')
+    MONGO_COMPRESSORS = environ.get('MONGO_COMPRESSORS', 'zlib')
 
 class UnitTestConfig(BaseConfig):
     """
@@ -42,6 +97,7 @@ class UnitTestConfig(BaseConfig):
     MONGO_DB_PASSWORD = environ.get('MONGO_DB_PASSWORD')
     IS_PROD = environ.get('IS_PROD')
     DB_CLIENT = lambda uri: mongomock.MongoClient(uri)
+    PASSWORD_HASH_ROUNDS = 4  # the cheapest bcrypt allows, keeps the tests fast
 
 # app/config.py
 
@@ -1,62 +1,59 @@
-from datetime import datetime, timezone
 from app.db.db import get_db
-import json
+from app.db.eventlog import JsonLinesLog, TIMESTAMP
+from app.db.batching import BatchWriter
+from datetime import datetime, timezone
 import os
 
+LOGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../logs'))  # default, see configure
 
-def log_ab_test_event(session_id, varient, event_type):
-    db = get_db()
-    
-    # Create logs directory if it doesn't exist
-    logs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../logs'))
-    os.makedirs(logs_dir, exist_ok=True)
-    
-    filename = os.path.join(logs_dir, "event.json")
-    
-    db.ab_test_logs.insert_one({
-        "session_id": session_id,
-        "variant": varient,
-        "event_type": event_type
-    })
+# logs/event.<pid>.<n>.jsonl and logs/survey.<pid>.<n>.jsonl, one set of segments per worker
+event_log = JsonLinesLog(LOGS_DIR, "event")
+survey_log = JsonLinesLog(LOGS_DIR, "survey")
+
+
+def configure(logs_dir=None):
+    """Write the event and survey logs to logs_dir (AB_TEST_LOGS_DIR) from now on."""
+    global event_log, survey_log
+    logs_dir = logs_dir or LOGS_DIR
+    if logs_dir == event_log.directory:
+        return
+    event_log.flush()
+    survey_log.flush()
+    event_log = JsonLinesLog(logs_dir, "event")
+    survey_log = JsonLinesLog(logs_dir, "survey")
+
+
+def _write_events(entries):
+    # insert_many adds an _id to the documents it is given, the file gets the entries as logged
+    get_db().ab_test_logs.insert_many([dict(entry) for entry in entries], ordered=False)
+    for entry in entries:
+        event_log.append(entry)
 
+# Events are written in the background, off the request path (see gunicorn.conf.py for the drain on exit)
+event_writer = BatchWriter(_write_events, name="ab-test-events")
+
+
+def log_ab_test_event(session_id, varient, event_type):
     new_entry = {
         "session_id": session_id,
         "variant": varient,
-        "event_type": event_type
+        "event_type": event_type,
+        TIMESTAMP: datetime.now(timezone.utc).isoformat()
     }
 
-    if os.path.exists(filename):
-        with open(filename, "r") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = []
-    else:
-        data = []
-
-    data.append(new_entry)
-
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
+    return event_writer.put(new_entry)
 
 
 def log_ab_test_survey(session_id, clickedButton, experience, impactedDecision, variant):
     db = get_db()
-    
-    # Create logs directory if it doesn't exist
-    logs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../logs'))
-    os.makedirs(logs_dir, exist_ok=True)
-    
-    filename = os.path.join(logs_dir, "survey.json")
-    print(f"Writing to: {filename}")
-    
+
     db.ab_test_survey.insert_one({
         "session_id": session_id,
         "clickedButton": clickedButton,
         "experience": experience,
         "impactedDecision": impactedDecision,
         "variant": variant,
-    }) 
+    })
 
     new_entry = {
         "session_id": session_id,
@@ -66,22 +63,13 @@ def log_ab_test_survey(session_id, clickedButton, experience, impactedDecision,
         "variant": variant,
     }
 
-    if os.path.exists(filename):
-        print(f"File exists at {filename}")
-        with open(filename, "r") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = []
-    else:
-        print(f"Creating new file at {filename}")
-        data = []
-
-    data.append(new_entry)
-
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
-    
-    print(f"Successfully wrote to {filename}")
+    survey_log.append(new_entry)
     return True
-    
\ No newline at end of file
+
+
+def read_ab_test_events():
+    return event_log.read()
+
+
+def read_ab_test_surveys():
+    return survey_log.read()
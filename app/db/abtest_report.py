@@ -0,0 +1,161 @@
+from app.db.db import get_db, run_in_transaction
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+EVENTS_COLLECTION = "ab_test_logs"
+SURVEY_COLLECTION = "ab_test_survey"
+
+# One document per (variant, event kind, session) with the number of events,
+# far fewer rows than ab_test_logs and enough for every figure of the report
+ROLLUP_COLLECTION = "ab_test_rollup"
+
+# Event kinds, matched against the start of the logged event_type
+EVENT_APPLIED = "applied"
+EVENT_VIEWED_SUGGESTIONS = "viewed_suggestions"
+EVENT_OTHER = "other"
+EVENT_KINDS = {
+    EVENT_APPLIED: "^applied to ",
+    EVENT_VIEWED_SUGGESTIONS: "^view AI suggestions",
+}
+CONVERSION_EVENT = EVENT_APPLIED
+
+UNKNOWN_VARIANT = "unknown"
+SURVEY_FIELDS = ("clickedButton", "experience", "impactedDecision")
+BATCH_SIZE = 500
+# Seconds after which the claim of a refresh that never finished may be taken over. The
+# claim is an ObjectId, its timestamp says when it was made
+CLAIM_TIMEOUT = 10 * 60
+
+
+def _get_collection(name):
+    db = get_db()
+    return db[name]
+
+def ensure_indexes():
+    try:
+        _get_collection(ROLLUP_COLLECTION).create_index(
+            [("variant", ASCENDING), ("event", ASCENDING), ("session_id", ASCENDING)], unique=True)
+    except PyMongoError as e:
+        print(f"Could not create indexes on {ROLLUP_COLLECTION}: {e}")
+    try:
+        # the unfolded events are the few whose folded field is missing or a claim id
+        _get_collection(EVENTS_COLLECTION).create_index([("folded", ASCENDING)])
+    except PyMongoError as e:
+        print(f"Could not create indexes on {EVENTS_COLLECTION}: {e}")
+
+
+def refresh_rollup():
+    """
+    Fold the events not folded yet into the rollup collection.
+
+    A refresh claims the unfolded events by stamping them with its own claim id, which only
+    one of several concurrent refreshes can do to a given event, folds the events carrying
+    its claim and then marks them folded. Unlike a watermark on _id this does not depend on
+    the order the workers' batches were inserted in (the _ids are generated before a batch
+    is flushed).
+
+    Claim, counts and marks are written in one transaction when the server supports it.
+    On a standalone server they are separate writes: events whose refresh failed after
+    claiming them are claimed again once the claim is CLAIM_TIMEOUT old, and the events of
+    a refresh that died between writing the counts and marking them are counted twice.
+
+    Returns:
+        int: The number of events folded in.
+    """
+    events = _get_collection(EVENTS_COLLECTION)
+
+    def fold(session):
+        claim = ObjectId()
+        stale = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=CLAIM_TIMEOUT))
+        claimed = events.update_many(
+            {"$or": [{"folded": {"$exists": False}}, {"folded": {"$lt": stale}}]},  # only claim ids compare to an ObjectId
+            {"$set": {"folded": claim}},
+            session=session
+        )
+        if not claimed.modified_count:
+            return 0
+
+        pipeline = [
+            {"$match": {"folded": claim}},
+            {"$project": {
+                "variant": {"$ifNull": ["$variant", UNKNOWN_VARIANT]},
+                "session_id": 1,
+                "event": {"$switch": {
+                    "branches": [
+                        {"case": {"$regexMatch": {"input": "$event_type", "regex": regex}}, "then": kind}
+                        for kind, regex in EVENT_KINDS.items()
+                    ],
+                    "default": EVENT_OTHER,
+                }},
+            }},
+            {"$group": {"_id": {"variant": "$variant", "event": "$event", "session_id": "$session_id"}, "count": {"$sum": 1}}},
+        ]
+        groups = list(events.aggregate(pipeline, session=session))
+        updates = [UpdateOne(group["_id"], {"$inc": {"count": group["count"]}}, upsert=True) for group in groups]
+        for start in range(0, len(updates), BATCH_SIZE):
+            _get_collection(ROLLUP_COLLECTION).bulk_write(updates[start:start + BATCH_SIZE], ordered=False, session=session)
+        events.update_many({"folded": claim}, {"$set": {"folded": True}}, session=session)
+        return sum(group["count"] for group in groups)
+
+    return run_in_transaction(fold)
+
+
+def get_experiment_report(refresh=True):
+    """
+    Per variant: sessions, converted sessions and conversion rate, event counts by kind,
+    and the distribution of every survey answer.
+
+    A session converts when it applied to at least one job listing.
+    """
+    if refresh:
+        refresh_rollup()
+
+    rollup = next(_get_collection(ROLLUP_COLLECTION).aggregate([
+        {"$facet": {
+            "events": [
+                {"$group": {"_id": {"variant": "$variant", "event": "$event"}, "count": {"$sum": "$count"}}},
+            ],
+            "sessions": [
+                {"$group": {"_id": {"variant": "$variant", "session_id": "$session_id"}}},
+                {"$group": {"_id": "$_id.variant", "count": {"$sum": 1}}},
+            ],
+            "converted": [
+                {"$match": {"event": CONVERSION_EVENT}},
+                {"$group": {"_id": "$variant", "count": {"$sum": 1}}},
+            ],
+        }},
+    ]), {"events": [], "sessions": [], "converted": []})
+
+    variants = {}
+    for group in rollup["sessions"]:
+        variants[group["_id"]] = {"sessions": group["count"], "converted_sessions": 0, "conversion_rate": 0.0, "events": {}}
+    for group in rollup["converted"]:
+        variant = variants[group["_id"]]
+        variant["converted_sessions"] = group["count"]
+        variant["conversion_rate"] = group["count"] / variant["sessions"]
+    for group in rollup["events"]:
+        variants[group["_id"]["variant"]]["events"][group["_id"]["event"]] = group["count"]
+
+    return {"variants": variants, "surveys": get_survey_distributions()}
+
+
+def get_survey_distributions():
+    # Per variant: number of responses and, for every survey field, answer -> count
+    facets = {"responses": [{"$group": {"_id": {"$ifNull": ["$variant", UNKNOWN_VARIANT]}, "count": {"$sum": 1}}}]}
+    for field in SURVEY_FIELDS:
+        facets[field] = [
+            {"$match": {field: {"$ne": None}}},
+            {"$group": {"_id": {"variant": {"$ifNull": ["$variant", UNKNOWN_VARIANT]}, "value": f"${field}"}, "count": {"$sum": 1}}},
+        ]
+
+    result = next(_get_collection(SURVEY_COLLECTION).aggregate([{"$facet": facets}]), {})
+
+    surveys = {}
+    for group in result.get("responses", []):
+        surveys[group["_id"]] = {"responses": group["count"], **{field: {} for field in SURVEY_FIELDS}}
+    for field in SURVEY_FIELDS:
+        for group in result.get(field, []):
+            surveys[group["_id"]["variant"]][field][str(group["_id"]["value"])] = group["count"]
+    return surveys
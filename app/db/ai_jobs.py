@@ -0,0 +1,87 @@
+from .db import get_db
+from datetime import datetime, timezone
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+import time
+
+AI_JOB_COLLECTION = "ai_jobs"
+AI_JOB_TTL = 24 * 60 * 60  # seconds a job and its result are kept
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+FINISHED = (JOB_DONE, JOB_FAILED)
+
+POLL_INTERVAL = 0.5  # seconds between two reads while waiting for a job
+
+
+def _get_ai_job_collection():
+    db = get_db()
+    return db[AI_JOB_COLLECTION]
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def ensure_indexes():
+    try:
+        _get_ai_job_collection().create_index([("created_at", ASCENDING)], expireAfterSeconds=AI_JOB_TTL)
+    except PyMongoError as e:
+        print(f"Could not create indexes on {AI_JOB_COLLECTION}: {e}")
+
+
+def create_job(owner: str, request: dict):
+    now = _now()
+    result = _get_ai_job_collection().insert_one({
+        "owner": owner,
+        "status": JOB_PENDING,
+        "request": request,
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now
+    })
+    return str(result.inserted_id)
+
+def mark_running(id: str, attempt: int):
+    return _set_status(id, JOB_RUNNING, attempts=attempt)
+
+def complete_job(id: str, result: dict):
+    return _set_status(id, JOB_DONE, result=result)
+
+def fail_job(id: str, error: str):
+    return _set_status(id, JOB_FAILED, error=error)
+
+def abandon_jobs(ids, error: str):
+    # Fail the jobs that have not finished yet, a result written in the meantime is kept
+    if not ids:
+        return 0
+    return _get_ai_job_collection().update_many(
+        {"_id": {"$in": [ObjectId(id) for id in ids]}, "status": {"$nin": list(FINISHED)}},
+        {"$set": {"status": JOB_FAILED, "error": error, "updated_at": _now()}}
+    ).modified_count
+
+def _set_status(id, status, **fields):
+    return _get_ai_job_collection().update_one(
+        {"_id": ObjectId(id)},
+        {"$set": {"status": status, "updated_at": _now(), **fields}}
+    )
+
+
+def find_job(id: str, owner: str):
+    # Jobs are only visible to the user who submitted them
+    if not ObjectId.is_valid(id):
+        return None
+    return _get_ai_job_collection().find_one({"_id": ObjectId(id), "owner": owner}, {"request": 0})
+
+def wait_for_job(id: str, owner: str, timeout: float = 0):
+    """
+    Long poll: read the job until it is finished or `timeout` seconds have passed.
+    Returns the job as last read, None when there is no such job.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = find_job(id, owner)
+        if job is None or job["status"] in FINISHED or time.monotonic() >= deadline:
+            return job
+        time.sleep(min(POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
@@ -0,0 +1,70 @@
+from app.db.utils import normalize_email
+from .db import get_db
+from datetime import datetime, timezone
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+AI_SCORE_COLLECTION = "ai_scores"
+
+# One document per (job listing, applicant), the second index serves the ranking
+AI_SCORE_INDEXES = [
+    ([("listing_id", ASCENDING), ("seeker_email", ASCENDING)], {"unique": True}),
+    ([("listing_id", ASCENDING), ("score", DESCENDING)], {}),
+]
+
+def _get_ai_score_collection():
+    db = get_db()
+    return db[AI_SCORE_COLLECTION]
+
+def ensure_indexes():
+    try:
+        for keys, options in AI_SCORE_INDEXES:
+            _get_ai_score_collection().create_index(keys, **options)
+    except PyMongoError as e:
+        print(f"Could not create indexes on {AI_SCORE_COLLECTION}: {e}")
+
+
+def get_input_keys(listing_id: str):
+    # Maps applicant email -> hash of the inputs the stored score was computed from
+    scores = _get_ai_score_collection().find({"listing_id": ObjectId(listing_id)}, {"seeker_email": 1, "input_key": 1})
+    return {score["seeker_email"]: score.get("input_key") for score in scores}
+
+def save_scores(listing_id: str, scores: dict):
+    """
+    scores: applicant email -> {"score", "analysis", "input_key"}, written in one bulk write.
+    """
+    if not scores:
+        return None
+
+    now = datetime.now(timezone.utc)
+    return _get_ai_score_collection().bulk_write([
+        UpdateOne(
+            {"listing_id": ObjectId(listing_id), "seeker_email": email},
+            {"$set": {**score, "scored_at": now}},
+            upsert=True
+        )
+        for email, score in scores.items()
+    ], ordered=False)
+
+def get_ranking(listing_id: str):
+    scores = _get_ai_score_collection().find(
+        {"listing_id": ObjectId(listing_id)},
+        {"_id": 0, "seeker_email": 1, "score": 1, "analysis": 1, "scored_at": 1}
+    ).sort("score", DESCENDING)
+    return [{
+        "email": score["seeker_email"],
+        "score": score["score"],
+        "analysis": score.get("analysis"),
+        "scored_at": score["scored_at"].isoformat(),
+    } for score in scores]
+
+
+def delete_listing_scores(listing_ids, session=None):
+    object_ids = [ObjectId(id) for id in listing_ids if ObjectId.is_valid(id)]
+    if not object_ids:
+        return None
+    return _get_ai_score_collection().delete_many({"listing_id": {"$in": object_ids}}, session=session)
+
+def delete_seeker_scores(email: str, session=None):
+    return _get_ai_score_collection().delete_many({"seeker_email": normalize_email(email)}, session=session)
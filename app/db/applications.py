@@ -0,0 +1,115 @@
+from app.db.constants import APPLICATION_COLLECTION, LISTING_ID, SEEKER_EMAIL, STATUS, CREATED_AT, UPDATED_AT, STATUS_APPLIED
+from .db import get_db
+from datetime import datetime, timezone
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError, DuplicateKeyError
+
+# One document per (job listing, job seeker) pair, so neither side grows with the number of applications.
+# The unique index serves the per-listing queries, the second one the per-seeker queries.
+APPLICATION_INDEXES = [
+    ([(LISTING_ID, ASCENDING), (SEEKER_EMAIL, ASCENDING)], {"unique": True}),
+    ([(SEEKER_EMAIL, ASCENDING), (STATUS, ASCENDING)], {}),
+]
+
+def _get_application_collection():
+    db = get_db()
+    return db[APPLICATION_COLLECTION]
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _object_ids(ids):
+    return [ObjectId(id) for id in ids if ObjectId.is_valid(id)]
+
+def ensure_indexes():
+    try:
+        for keys, options in APPLICATION_INDEXES:
+            _get_application_collection().create_index(keys, **options)
+    except PyMongoError as e:
+        print(f"Could not create indexes on {APPLICATION_COLLECTION}: {e}")
+
+
+def create_application(listing_id: str, email: str, session=None):
+    now = _now()
+    application = {
+        LISTING_ID: ObjectId(listing_id),
+        SEEKER_EMAIL: email,
+        STATUS: STATUS_APPLIED,
+        CREATED_AT: now,
+        UPDATED_AT: now
+    }
+
+    try:
+        result = _get_application_collection().insert_one(application, session=session)
+    except DuplicateKeyError:
+        return None  # already applied
+    return result
+
+def change_status(listing_id: str, email: str, status: str, session=None):
+    # Only a waiting application can move, the precondition is part of the filter
+    result = _get_application_collection().update_one(
+        {LISTING_ID: ObjectId(listing_id), SEEKER_EMAIL: email, STATUS: STATUS_APPLIED},
+        {"$set": {STATUS: status, UPDATED_AT: _now()}},
+        session=session
+    )
+    return result
+
+def find_application(listing_id: str, email: str):
+    return _get_application_collection().find_one({LISTING_ID: ObjectId(listing_id), SEEKER_EMAIL: email})
+
+
+def get_listing_applicants(listing_id: str, status: str = STATUS_APPLIED):
+    # Emails of the applicants of one listing with the given status, in the order they applied
+    applications = _get_application_collection().find(
+        {LISTING_ID: ObjectId(listing_id), STATUS: status},
+        {SEEKER_EMAIL: 1}
+    ).sort("_id", ASCENDING)
+    return [application[SEEKER_EMAIL] for application in applications]
+
+def get_applicants_by_listing(listing_ids):
+    """
+    Batch fetch the applicants of several job listings in one query.
+
+    Returns a dict of listing id -> {status: [emails in the order they applied]}.
+    """
+    object_ids = _object_ids(listing_ids)
+    if not object_ids:
+        return {}
+
+    applicants = {}
+    applications = _get_application_collection().find(
+        {LISTING_ID: {"$in": object_ids}},
+        {LISTING_ID: 1, SEEKER_EMAIL: 1, STATUS: 1}
+    ).sort("_id", ASCENDING)
+    for application in applications:
+        by_status = applicants.setdefault(str(application[LISTING_ID]), {})
+        by_status.setdefault(application[STATUS], []).append(application[SEEKER_EMAIL])
+    return applicants
+
+def get_seeker_applications(email: str, status: str = None):
+    # Maps listing id -> status for every application of one job seeker
+    query = {SEEKER_EMAIL: email}
+    if status is not None:
+        query[STATUS] = status
+
+    applications = _get_application_collection().find(query, {LISTING_ID: 1, STATUS: 1})
+    return {str(application[LISTING_ID]): application[STATUS] for application in applications}
+
+
+def delete_listing_applications(listing_ids, session=None):
+    object_ids = _object_ids(listing_ids)
+    if not object_ids:
+        return None
+    return _get_application_collection().delete_many({LISTING_ID: {"$in": object_ids}}, session=session)
+
+def delete_seeker_applications(email: str, session=None):
+    return _get_application_collection().delete_many({SEEKER_EMAIL: email}, session=session)
+
+def rename_seeker(old_email: str, new_email: str, session=None):
+    # Applications follow the job seeker when the email changes
+    return _get_application_collection().update_many(
+        {SEEKER_EMAIL: old_email},
+        {"$set": {SEEKER_EMAIL: new_email, UPDATED_AT: _now()}},
+        session=session
+    )
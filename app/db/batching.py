@@ -0,0 +1,143 @@
+import atexit
+import os
+import queue
+import threading
+import time
+import weakref
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_LATENCY = 0.25   # seconds an item may wait for its batch to fill up
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_DRAIN_TIMEOUT = 5    # seconds
+
+_writers = weakref.WeakSet()
+
+
+class BatchWriter:
+    """
+    Bounded in-process queue drained by a background thread, which hands the queued
+    items to sink(batch) once batch_size of them are waiting or the oldest one has
+    waited max_latency seconds.
+
+    put() never waits on the sink. When the queue is full it waits up to block_timeout
+    seconds for room (0: not at all) and then drops the item, the counters in stats()
+    keep track of what was dropped or failed to write.
+
+    The thread is started on first use in each process, call drain() (or drain_all())
+    before the process exits so that the queued items are written.
+    """
+
+    def __init__(self, sink, batch_size=DEFAULT_BATCH_SIZE, max_latency=DEFAULT_MAX_LATENCY,
+                 max_queue=DEFAULT_MAX_QUEUE, block_timeout=0, name="batch-writer"):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self.block_timeout = block_timeout
+        self.name = name
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        _writers.add(self)
+
+    def put(self, item):
+        self._ensure_started()
+        try:
+            if self.block_timeout > 0:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def drain(self, timeout=DEFAULT_DRAIN_TIMEOUT):
+        """Write everything queued so far and stop the background thread."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is None:
+            return
+
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)  # forked, the parent writes its own items
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stopping,), name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self, stopping):
+        while True:
+            batch = self._next_batch(stopping)
+            if batch:
+                self._write(batch)
+            elif stopping.is_set():
+                return
+
+    def _next_batch(self, stopping):
+        batch = []
+        wait = 0 if stopping.is_set() else self.max_latency
+        try:
+            batch.append(self._queue.get(timeout=wait) if wait else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = 0 if stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.sink(batch)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            print(f"{self.name}: could not write a batch of {len(batch)}: {e}")
+            return
+
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+
+
+def drain_all(timeout=DEFAULT_DRAIN_TIMEOUT):
+    for writer in list(_writers):
+        writer.drain(timeout)
+
+
+atexit.register(drain_all)
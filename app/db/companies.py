@@ -1,16 +1,26 @@
 from app.db.constants import COMPANY_COLLECTION, NAME, COMPANY_EMAIL, COUNTRY, DESCRIPTION, PASSWORD
-from app.db.utils import serialize_item, serialize_items
+from app.db.utils import serialize_item, serialize_items, normalize_email
 import app.db.job_listings as job_listings
-from .db import get_db
+from .db import get_db, run_in_transaction
+from .cache import current_user_cache
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError, DuplicateKeyError
 
-# HASHING PASSWORDS
-import bcrypt  
+# HASHING PASSWORDS, on the process pool of app.db.passwords
+from .passwords import hash_password, authenticate
 
 
 def _get_company_collection():
     db = get_db()
     return db[COMPANY_COLLECTION]
 
+def ensure_indexes():
+    try:
+        _get_company_collection().create_index([(COMPANY_EMAIL, ASCENDING)], unique=True)
+    except PyMongoError as e:
+        print(f"Could not create unique email index on {COMPANY_COLLECTION}, run the normalize-emails command: {e}")
+
 def get_companies():
     companies = _get_company_collection().find({})
     return serialize_items(list(companies))
@@ -18,11 +28,15 @@ def get_companies():
 def find_company(email: str = None):
     query = {}
     if email is not None:
-        query[COMPANY_EMAIL] = {'$regex': email}
+        query[COMPANY_EMAIL] = normalize_email(email)  # emails are stored normalized, equality uses the unique index
 
     company = _get_company_collection().find_one(query)
     return serialize_item(company) 
 
+def find_company_by_id(id: str):
+    company = _get_company_collection().find_one({"_id": ObjectId(id)})
+    return serialize_item(company)
+
 def find_company_by_name(name: str):
     query = {NAME: {'$regex': f'^{name}$', '$options': 'i'}}  # Case-insensitive match
     company = _get_company_collection().find_one(query)
@@ -34,17 +48,20 @@ def create_company(name: str, email: str, country: str, description: str, passwo
     name = name.strip().lower()
 
     #Deliverable 4 - Hash the password here, where 'password' is defined
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = hash_password(password)
     
     new_company = {
         NAME: name,
-        COMPANY_EMAIL: email,
+        COMPANY_EMAIL: normalize_email(email),
         COUNTRY: country,
         DESCRIPTION: description,
-        PASSWORD: hashed_password.decode('utf-8')  # store as string
+        PASSWORD: hashed_password  # stored as string
     }
     
-    result = _get_company_collection().insert_one(new_company)
+    try:
+        result = _get_company_collection().insert_one(new_company)
+    except DuplicateKeyError:
+        return None  # email already registered
     return result.inserted_id
 
 def update_company(lookupemail: str, name: str, email: str, country: str, description: str):
@@ -53,8 +70,12 @@ def update_company(lookupemail: str, name: str, email: str, country: str, descri
     if company_record is None:
         return None
 
-    new_company = {NAME: name, COMPANY_EMAIL: email, COUNTRY: country, DESCRIPTION: description}
-    result = _get_company_collection().update_one({COMPANY_EMAIL: lookupemail}, {"$set": new_company})
+    new_company = {NAME: name, COMPANY_EMAIL: normalize_email(email), COUNTRY: country, DESCRIPTION: description}
+    try:
+        result = _get_company_collection().update_one({COMPANY_EMAIL: company_record[COMPANY_EMAIL]}, {"$set": new_company})
+    except DuplicateKeyError:
+        return "Email exists"
+    current_user_cache.invalidate_tag(company_record[COMPANY_EMAIL])
 
     return result
 
@@ -64,24 +85,23 @@ def delete_company(email: str):
     if company_record is None:
         return None
     
-    # Delete all job listings for the company
-    job_listing_posted = job_listings.search_job_with_filters(company=company_record[NAME])
-    for job_listing in job_listing_posted:
-        job_listings.delete_job_listing(job_listing["_id"], company_record[NAME])
+    deleted_listings = []
+
+    def cascade(session):
+        # Delete all job listings for the company, a retried transaction collects them again
+        deleted_listings.clear()
+        job_listings.delete_company_job_listings(company_record[NAME], session, deleted_listings)
+        return _get_company_collection().delete_one({COMPANY_EMAIL: company_record[COMPANY_EMAIL]}, session=session)
 
-    result = _get_company_collection().delete_one({COMPANY_EMAIL: email})
+    result = run_in_transaction(cascade)
+    job_listings.listings_deleted(deleted_listings)
+    current_user_cache.invalidate_tag(company_record[COMPANY_EMAIL])
     return result
 
 def check_login_credentials(email: str, password: str):
     if email is None or password is None:
         return None
 
-    company = _get_company_collection().find_one({COMPANY_EMAIL: email})
-    if not company:
-        return None
-
-    stored_hashed_pw = company.get(PASSWORD)
-    if stored_hashed_pw and bcrypt.checkpw(password.encode('utf-8'), stored_hashed_pw.encode('utf-8')):
-        return company  # password matches
-
-    return None  # invalid password
+    # _id and email only, one query on the unique email index
+    company = authenticate(_get_company_collection(), {COMPANY_EMAIL: normalize_email(email)}, password, (COMPANY_EMAIL,))
+    return serialize_item(company)
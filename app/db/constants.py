@@ -36,3 +36,18 @@ SENIORITY = "seniority"
 APPLICANTS = "applicants"
 SELECTED = "selected"
 REJECTED = "rejected"
+
+# application collection name
+APPLICATION_COLLECTION = "applications"
+
+# application fields
+LISTING_ID = "listing_id" # ObjectId of the job listing
+SEEKER_EMAIL = "seeker_email"
+STATUS = "status"
+CREATED_AT = "created_at"
+UPDATED_AT = "updated_at"
+
+# application statuses
+STATUS_APPLIED = "applied"
+STATUS_ACCEPTED = "accepted"
+STATUS_REJECTED = "rejected"
@@ -1,24 +1,79 @@
 # app/db/db.py (revised)
 
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from .instrumentation import PoolStatsListener, query_profiler, DEFAULT_SLOW_MS
+import os
+import threading
+import time
 
-class DatabaseClient:
-    def __init__(self, mongo_uri, db_name, db_username, db_password, is_prod):
-        # Just call MongoClient directly
+# Flask config key -> MongoClient option, a key missing or set to None keeps the driver default
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_READ_PREFERENCE": "readPreference",
+    "MONGO_WRITE_CONCERN": "w",
+    "MONGO_JOURNAL": "journal",
+    "MONGO_COMPRESSORS": "compressors",
+}
+
+def client_options(flask_config):
+    options = {}
+    for key, option in CLIENT_OPTIONS.items():
+        value = flask_config.get(key)
+        if value is None or value == "":
+            continue
+        if option == "w" and str(value).isdigit():
+            value = int(value)  # a number of nodes, otherwise a tag such as "majority"
+        options[option] = value
+    return options
 
+class DatabaseClient:
+    def __init__(self, mongo_uri, db_name, db_username, db_password, is_prod, options=None, listeners=None):
+        self.mongo_uri = mongo_uri
+        self.options = dict(options or {})
+        self.listeners = list(listeners or [])
         if is_prod == "TRUE":
-            self.client = MongoClient(mongo_uri,
-                                username=db_username,
-                                password=db_password,
-                                authSource=db_name)
-        else:
-            self.client = MongoClient(mongo_uri)
+            self.options.update(username=db_username, password=db_password, authSource=db_name)
 
         self.db_name = db_name
+        self._supports_transactions = None
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pool_stats = None
+
+    @property
+    def client(self):
+        # Created on first use in each process: a MongoClient must not be used on both sides
+        # of a fork, so every gunicorn worker gets its own pools (and pool statistics)
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self.pool_stats = PoolStatsListener()
+                    self._client = MongoClient(self.mongo_uri, event_listeners=[self.pool_stats, *self.listeners],
+                                               **self.options)
+                    self._pid = os.getpid()
+        return self._client
 
     def get_db(self, db_name=None):
         return self.client[db_name or self.db_name]
 
+    def supports_transactions(self):
+        # Transactions need a replica set or a sharded cluster, a standalone server refuses them
+        if self._supports_transactions is None:
+            try:
+                hello = self.client.admin.command("hello")
+                self._supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+            except (PyMongoError, NotImplementedError):
+                self._supports_transactions = False
+        return self._supports_transactions
+
 db_client = None
 
 def init_db(flask_config):
@@ -34,13 +89,70 @@ def init_db(flask_config):
     db_password = flask_config["MONGO_DB_PASSWORD"]
     is_prod = flask_config["IS_PROD"]
 
-    db_client = DatabaseClient(mongo_uri, db_name, db_username, db_password, is_prod)
+    query_profiler.configure(flask_config.get("QUERY_PROFILING", True),
+                             flask_config.get("QUERY_SLOW_MS", DEFAULT_SLOW_MS),
+                             _explain if flask_config.get("QUERY_EXPLAIN_SLOW", True) else None)
+    db_client = DatabaseClient(mongo_uri, db_name, db_username, db_password, is_prod, client_options(flask_config),
+                               [query_profiler])
+    ensure_indexes()
+
+def ensure_indexes():
+    """
+    Creates the indexes declared by the collection modules.
+    create_index is a no-op when the index already exists, so this is safe on every startup.
+    """
+    # imported here, the collection modules import this one
+    from app.db import job_listings, job_seekers, companies, applications, abtest_report, suggestions, ai_jobs, ai_scores, login_throttle
+    job_listings.ensure_indexes()
+    applications.ensure_indexes()
+    abtest_report.ensure_indexes()
+    suggestions.ensure_indexes()
+    ai_jobs.ensure_indexes()
+    ai_scores.ensure_indexes()
+    login_throttle.ensure_indexes()
+    job_seekers.ensure_indexes()
+    companies.ensure_indexes()
 
 def get_db():
     if db_client is None:
         raise Exception("Database client is not initialized. Call init_db(...) first.")
     return db_client.get_db()
 
+def run_in_transaction(callback):
+    """
+    Runs callback(session) inside a transaction when the deployment supports them,
+    otherwise calls callback(None) and the writes are applied one after another.
+    The callback may be retried on transient errors, so it should only issue writes.
+    """
+    if db_client is None:
+        raise Exception("Database client is not initialized. Call init_db(...) first.")
+    if not db_client.supports_transactions():
+        return callback(None)
+    with db_client.client.start_session() as session:
+        return session.with_transaction(callback)
+
+def get_pool_stats():
+    """Connection pool statistics of this worker process, None before the first query."""
+    if db_client is None or db_client.pool_stats is None:
+        return None
+    return db_client.pool_stats.stats()
+
+def ping():
+    """Round trip time to the database in milliseconds, raises when it cannot be reached."""
+    if db_client is None:
+        raise Exception("Database client is not initialized. Call init_db(...) first.")
+    start = time.perf_counter()
+    db_client.client.admin.command("ping")
+    return round(1000 * (time.perf_counter() - start), 3)
+
+def _explain(db_name, command):
+    # queryPlanner only plans the query, it does not run it again
+    return db_client.client[db_name].command({"explain": command, "verbosity": "queryPlanner"})
+
+def get_query_stats():
+    """Latency histograms per command, collection and calling function, and the last slow queries."""
+    return query_profiler.stats()
+
 def get_collection(collection_name):
     db = get_db()
     return db[collection_name]
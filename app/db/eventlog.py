@@ -0,0 +1,176 @@
+from datetime import datetime, timezone
+import atexit
+import glob
+import heapq
+import json
+import os
+import threading
+import time
+import weakref
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # rotate a segment once it reaches this size
+DEFAULT_BUFFER_SIZE = 64              # entries kept in memory before they are written
+DEFAULT_FLUSH_INTERVAL = 5            # seconds, an older buffer is written by the flusher thread
+FLUSHER_TICK = 1                      # seconds between two checks of the flusher thread
+
+TIMESTAMP = "timestamp"
+
+_logs = weakref.WeakSet()
+_flusher = None
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+class JsonLinesLog:
+    """
+    Append-only JSON Lines log written by several worker processes.
+
+    Every process appends to its own segment files (<name>.<pid>.<n>.jsonl), so writers
+    never share a file and need no locking. A segment is closed and the next one started
+    once it reaches max_bytes. Entries are buffered and written in a single append when
+    the buffer is full, when flush_interval has passed (checked by a background thread, so
+    an idle worker does not sit on them), or when the process exits.
+
+    read() merges every segment, plus the <name>.json array written by older versions,
+    back into one stream ordered by timestamp.
+    """
+
+    def __init__(self, directory, name, max_bytes=DEFAULT_MAX_BYTES, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, clock=time.monotonic):
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reset()
+        _logs.add(self)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._buffer = []
+        self._sequence = 0
+        self._size = None  # bytes in the current segment, read from disk on the first flush
+        self._last_flush = self._clock()
+
+    def append(self, entry):
+        entry = dict(entry)
+        entry.setdefault(TIMESTAMP, datetime.now(timezone.utc).isoformat())
+        line = json.dumps(entry, default=str)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # forked, the parent's buffer is not ours to write
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_size or self._flush_due():
+                self._flush()
+        _ensure_flusher()
+
+    def flush(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._flush()
+
+    def flush_if_due(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._buffer and self._flush_due():
+                self._flush()
+
+    def _flush_due(self):
+        return self._clock() - self._last_flush >= self.flush_interval
+
+    def _flush(self):
+        self._last_flush = self._clock()
+        if not self._buffer:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._segment_path()
+        if self._size is None:
+            # a restarted worker may reuse the pid of an earlier one, carry on after its segments
+            while os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+                self._sequence += 1
+                path = self._segment_path()
+            self._size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        data = ("\n".join(self._buffer) + "\n").encode("utf-8")
+        with open(path, "ab") as f:
+            f.write(data)
+        self._buffer = []
+
+        self._size += len(data)
+        if self._size >= self.max_bytes:
+            self._sequence += 1
+            self._size = 0
+
+    def _segment_path(self):
+        return os.path.join(self.directory, f"{self.name}.{self._pid}.{self._sequence}.jsonl")
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), f"{self.name}.*.jsonl")))
+
+    def read(self):
+        """
+        Yield every entry of every process, oldest first. Only this process' buffer is
+        flushed first, the other workers' unflushed entries show up once they flush.
+        """
+        self.flush()
+        streams = [_read_segment(path) for path in self.segments()]
+        legacy = os.path.join(self.directory, f"{self.name}.json")
+        if os.path.exists(legacy):
+            streams.insert(0, _read_legacy(legacy))
+        return heapq.merge(*streams, key=lambda entry: entry.get(TIMESTAMP, ""))
+
+
+def _read_segment(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+
+
+def _read_legacy(path):
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            data = []
+    yield from data
+
+
+def flush_all():
+    for log in list(_logs):
+        log.flush()
+
+
+def flush_due():
+    # write the buffers older than their flush_interval, run by the flusher thread
+    for log in list(_logs):
+        try:
+            log.flush_if_due()
+        except OSError as e:
+            print(f"Could not flush the {log.name} log: {e}")
+
+
+def _ensure_flusher():
+    # one daemon thread per process, started with the first append (threads do not survive a fork)
+    global _flusher, _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            _flusher = threading.Thread(target=_run_flusher, name="eventlog-flusher", daemon=True)
+            _flusher.start()
+            _flusher_pid = os.getpid()
+
+
+def _run_flusher():
+    while True:
+        time.sleep(FLUSHER_TICK)
+        flush_due()
+
+
+atexit.register(flush_all)
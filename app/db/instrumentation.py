@@ -0,0 +1,336 @@
+from bson.regex import Regex
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import monitoring
+import bisect
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Counts what the connection pools of one MongoClient do: connections open and checked
+    out right now, check outs and how long they waited for a connection, failed check
+    outs and pool clears (the driver drops a pool when a server goes away).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {
+            "open": 0, "checked_out": 0, "max_checked_out": 0,
+            "created": 0, "closed": 0, "checkouts": 0, "checkout_failures": 0, "pool_clears": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            waits = stats["checkouts"] + stats["checkout_failures"]
+            stats["wait_avg_ms"] = round(1000 * self._wait_total / waits, 3) if waits else 0
+            stats["wait_max_ms"] = round(1000 * self._wait_max, 3)
+        return stats
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counts[name] += delta
+            self._counts["max_checked_out"] = max(self._counts["max_checked_out"], self._counts["checked_out"])
+
+    def _waited(self, event):
+        seconds = getattr(event, "duration", None) or 0  # pymongo 4.7+ times the check out
+        with self._lock:
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def connection_created(self, event):
+        self._add(open=1, created=1)
+
+    def connection_closed(self, event):
+        self._add(open=-1, closed=1)
+
+    def connection_checked_out(self, event):
+        self._waited(event)
+        self._add(checked_out=1, checkouts=1)
+
+    def connection_check_out_failed(self, event):
+        self._waited(event)
+        self._add(checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def pool_cleared(self, event):
+        self._add(pool_clears=1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+# Upper bounds in milliseconds of the latency histogram buckets, slower commands go to "+Inf"
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+DEFAULT_SLOW_MS = 100
+PROFILE_HEADER = "X-Query-Profile"  # request header asking to profile the commands of that request
+EXPLAIN_INTERVAL = 10 * 60      # seconds before the plan of the same query shape is explained again
+MAX_SLOW_QUERIES = 50           # slow queries kept for the stats endpoint
+MAX_PENDING_EXPLAINS = 8
+
+# handshakes, sessions and the profiler's own explains are not worth a histogram
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "saslStart", "saslContinue",
+    "endSessions", "killCursors", "explain",
+}
+# command -> field holding its filter (or pipeline), the first statement for bulk writes
+FILTER_FIELDS = {
+    "find": "filter", "count": "query", "distinct": "query", "findAndModify": "query",
+    "aggregate": "pipeline", "update": "updates", "delete": "deletes",
+}
+# session and transport fields an explain must not carry over
+_NOT_EXPLAINED = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+_DB_PACKAGE = os.path.dirname(os.path.abspath(__file__))
+_APP_PACKAGE = os.path.dirname(_DB_PACKAGE)
+_SKIPPED_FILES = {os.path.join(_DB_PACKAGE, "db.py"), os.path.join(_DB_PACKAGE, "instrumentation.py")}
+
+_request_profile = contextvars.ContextVar("query_profile", default=None)
+
+
+def filter_shape(value):
+    """The filter with its values replaced by "?", so queries differing only in values group together."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, dict) for item in value):
+            return [filter_shape(item) for item in value]
+        return "?"  # the values of an $in, $all, ...
+    if isinstance(value, (re.Pattern, Regex)):
+        return "/?/"
+    return "?"
+
+def query_filter(command_name, command):
+    value = command.get(FILTER_FIELDS.get(command_name))
+    if command_name in ("update", "delete"):
+        value = value[0].get("q") if value else None
+    return value
+
+def collection_name(command_name, command):
+    if command_name == "getMore":
+        return command.get("collection")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else None  # aggregate: 1 runs against the database
+
+def calling_function(frame):
+    """
+    The app.db function that issued the command, found by walking up the stack (the driver
+    publishes events in the calling thread). Falls back to the first frame of the app.
+    """
+    fallback = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_DB_PACKAGE) and filename not in _SKIPPED_FILES:
+            return f"{os.path.splitext(os.path.basename(filename))[0]}.{frame.f_code.co_name}"
+        if fallback is None and filename.startswith(_APP_PACKAGE) and filename not in _SKIPPED_FILES:
+            fallback = f"{os.path.splitext(os.path.basename(filename))[0]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "unknown"
+
+def plan_summary(explain):
+    """The stages of the winning plan, outermost first, e.g. "FETCH > IXSCAN email_1" or "COLLSCAN"."""
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # aggregate: the query part of the pipeline is planned in its $cursor stage
+        for stage in explain.get("stages", []):
+            if "$cursor" in stage:
+                planner = stage["$cursor"].get("queryPlanner")
+                break
+    if planner is None:
+        return "unknown plan"
+    plan = planner.get("winningPlan", {})
+    plan = plan.get("queryPlan", plan)  # slot based execution nests the classic plan
+    stages = []
+    while plan:
+        if "shards" in plan:
+            plan = plan["shards"][0].get("winningPlan", {}) if plan["shards"] else {}
+            continue
+        stage = plan.get("stage", "?")
+        stages.append(f"{stage} {plan['indexName']}" if "indexName" in plan else stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(stages) or "unknown plan"
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    Times the commands sent to MongoDB, grouped by command, collection and the app.db function
+    that sent them, in a latency histogram per group. Records every command unless `enabled`
+    is turned off, then only those of the requests that asked for it (see start_request).
+    Commands slower than `slow_ms` are printed with the shape of their filter, and when an
+    `explain` callable is set (database name, command -> explain output) the plan MongoDB picked
+    is printed too; it runs on a background thread so the slow request is not made slower.
+    """
+
+    def __init__(self, enabled=True, slow_ms=DEFAULT_SLOW_MS, explain=None):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._histograms = {}
+        self._slow = deque(maxlen=MAX_SLOW_QUERIES)
+        self._explained = {}
+        self._explains_pending = 0
+        self._executor = None
+        self._pid = None
+
+    def configure(self, enabled=True, slow_ms=DEFAULT_SLOW_MS, explain=None):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain = explain
+
+    def start_request(self):
+        """Profile the commands of the current request (or context), returns a token for finish_request."""
+        return _request_profile.set([])
+
+    def request_summary(self):
+        """Count and total time of the commands of the current request, None when it is not profiled."""
+        queries = _request_profile.get()
+        if queries is None:
+            return None
+        return {
+            "count": len(queries),
+            "total_ms": round(sum(query["ms"] for query in queries), 3),
+            "queries": list(queries),
+        }
+
+    def finish_request(self, token):
+        _request_profile.reset(token)
+
+    def stats(self):
+        with self._lock:
+            commands = [
+                {
+                    "command": command, "collection": collection, "caller": caller,
+                    "count": entry["count"], "failures": entry["failures"],
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 3),
+                    "max_ms": round(entry["max_ms"], 3),
+                    "histogram": dict(zip([str(bound) for bound in HISTOGRAM_BOUNDS_MS] + ["+Inf"], entry["buckets"])),
+                }
+                for (command, collection, caller), entry in self._histograms.items()
+            ]
+            slow = [dict(query) for query in self._slow]
+        commands.sort(key=lambda entry: entry["avg_ms"] * entry["count"], reverse=True)
+        return {"enabled": self.enabled, "slow_ms": self.slow_ms, "commands": commands, "slow": slow}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._slow.clear()
+            self._explained.clear()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS or not (self.enabled or _request_profile.get() is not None):
+            return
+        command = event.command
+        if len(self._pending) > 10000:
+            self._pending.clear()  # commands whose outcome was never published
+        self._pending[(event.request_id, event.connection_id)] = {
+            "command": event.command_name,
+            "collection": collection_name(event.command_name, command),
+            "caller": calling_function(sys._getframe(1)),
+            "database": event.database_name,
+            "document": command,
+        }
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed):
+        started = self._pending.pop((event.request_id, event.connection_id), None)
+        if started is None:
+            return
+        ms = event.duration_micros / 1000
+        key = (started["command"], started["collection"], started["caller"])
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = {
+                    "count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "buckets": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+                }
+            entry["count"] += 1
+            entry["failures"] += failed
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["buckets"][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+
+        queries = _request_profile.get()
+        if queries is not None:
+            queries.append({"command": started["command"], "collection": started["collection"],
+                            "caller": started["caller"], "ms": round(ms, 3)})
+        if ms >= self.slow_ms:
+            self._slow_query(started, ms)
+
+    def _slow_query(self, started, ms):
+        shape = filter_shape(query_filter(started["command"], started["document"]))
+        query = {"command": started["command"], "collection": started["collection"],
+                 "caller": started["caller"], "ms": round(ms, 3), "filter": shape, "plan": None}
+        with self._lock:
+            self._slow.append(query)
+        print(f"Slow query: {started['command']} on {started['collection']} from {started['caller']} "
+              f"took {ms:.1f} ms, filter {shape}")
+
+        if self.explain is None or started["command"] not in FILTER_FIELDS:
+            return
+        shape_key = (started["command"], started["collection"], repr(shape))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(shape_key, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+                return
+            if self._explains_pending >= MAX_PENDING_EXPLAINS:
+                return
+            if len(self._explained) > 1000:
+                self._explained.clear()
+            self._explained[shape_key] = now
+            self._explains_pending += 1
+        command = {key: value for key, value in started["document"].items()
+                   if key not in _NOT_EXPLAINED and not key.startswith("$")}
+        self._get_executor().submit(self._explain_query, query, started["database"], command)
+
+    def _explain_query(self, query, database, command):
+        try:
+            query["plan"] = plan_summary(self.explain(database, command))
+            print(f"Plan of slow {query['command']} on {query['collection']} from {query['caller']}: {query['plan']}")
+        except Exception as e:
+            print(f"Could not explain slow {query['command']} on {query['collection']}: {e}")
+        finally:
+            with self._lock:
+                self._explains_pending -= 1
+
+    def _get_executor(self):
+        # one per process, threads do not survive a fork
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-explain")
+                self._pid = os.getpid()
+            return self._executor
+
+
+query_profiler = QueryProfiler()
@@ -1,41 +1,254 @@
 from app.db.constants import JOB_LISTING_COLLECTION, TITLE, COMPANY, LOCATION, INDUSTRY, SENIORITY, APPLICANTS, SELECTED, REJECTED
-from app.db.utils import serialize_item, serialize_items, generate_slug
-from .db import get_db
+from app.db.constants import STATUS, STATUS_APPLIED, STATUS_ACCEPTED, STATUS_REJECTED
+from app.db.utils import serialize_item, serialize_items, generate_slug, decode_cursor, normalize_email
+from .db import get_db, run_in_transaction
+from .search import InvertedIndex
 import re
+import threading
 from bson.objectid import ObjectId
-import app.db.job_seekers as job_seekers
+from pymongo import ASCENDING, TEXT
+from pymongo.errors import PyMongoError, OperationFailure
+import app.db.applications as applications
+import app.db.suggestions as suggestions
+import app.db.ai_scores as ai_scores
+
+# How a filter value is matched against the stored slug
+MATCH_EXACT = "exact"    # equality on the slug
+MATCH_PREFIX = "prefix"  # anchored regex, can walk the index
+MATCH_REGEX = "regex"    # unanchored regex, full scan - only when asked for
+MATCH_MODES = (MATCH_EXACT, MATCH_PREFIX, MATCH_REGEX)
+
+# Compound indexes on the slug fields, declared here and created by init_db.
+# Every filter field is the leading key of at least one of them.
+JOB_LISTING_INDEXES = [
+    [(COMPANY, ASCENDING), (TITLE, ASCENDING)],
+    [(TITLE, ASCENDING), (LOCATION, ASCENDING)],
+    [(LOCATION, ASCENDING), (SENIORITY, ASCENDING)],
+    [(INDUSTRY, ASCENDING), (SENIORITY, ASCENDING)],
+    [(SENIORITY, ASCENDING), (INDUSTRY, ASCENDING)],
+]
+
+# Listing fields filled in from the applications collection, see attach_applications
+APPLICATION_FIELDS = {APPLICANTS: STATUS_APPLIED, SELECTED: STATUS_ACCEPTED, REJECTED: STATUS_REJECTED}
+
+# Fields shown to a job seeker for each application
+JOB_DETAIL_FIELDS = (TITLE, COMPANY, LOCATION, INDUSTRY, SENIORITY)
+
+# Full-text search over these fields, the weights rank title matches first
+TEXT_SEARCH_WEIGHTS = {TITLE: 3, INDUSTRY: 2, LOCATION: 1}
+TEXT_INDEX_NAME = "job_listings_text"
+DEFAULT_TOP_K = 20
+
+# In-process fallback when the server cannot run $text (mongomock), built on first use
+_text_index = None
+_text_index_lock = threading.Lock()
+_text_search_supported = None
+
+# Callbacks run after a listing is written in this process, see add_listing_listener
+_listing_listeners = []
 
 
 def _get_job_listing_collection():
     db = get_db()
     return db[JOB_LISTING_COLLECTION]
 
-# to make sure the job search works, we have to make the entries into slug-like
-def search_job_with_filters(title: str = None, company: str = None, location: str= None, industry: str = None, seniority: str = None): #search for either email or name # update to filter    
+def ensure_indexes():
+    collection = _get_job_listing_collection()
+    for keys in JOB_LISTING_INDEXES:
+        try:
+            collection.create_index(keys)
+        except PyMongoError as e:
+            print(f"Could not create index {keys} on {JOB_LISTING_COLLECTION}: {e}")
+    try:
+        collection.create_index([(field, TEXT) for field in TEXT_SEARCH_WEIGHTS],
+                                name=TEXT_INDEX_NAME, weights=TEXT_SEARCH_WEIGHTS)
+    except PyMongoError as e:
+        print(f"Could not create text index on {JOB_LISTING_COLLECTION}: {e}")
+
+def _match_predicate(value: str, match: str):
+    slug = generate_slug(value)
+    if match == MATCH_EXACT:
+        return slug
+    if match == MATCH_PREFIX:
+        return {'$regex': '^' + re.escape(slug)}
+    if match == MATCH_REGEX:
+        return {'$regex': re.escape(slug)}
+    raise ValueError(f"Unknown match mode: {match}")
+
+def _build_filter_query(title, company, location, industry, seniority, match):
     query = {}
     if company:
-        query[COMPANY] = {'$regex': generate_slug(company)} #so that it can match regardless
-    if title :
-        query[TITLE] = {'$regex': generate_slug(title)}
+        query[COMPANY] = _match_predicate(company, match)
+    if title:
+        query[TITLE] = _match_predicate(title, match)
     if location:
-        query[LOCATION] = {'$regex': generate_slug(location)}
+        query[LOCATION] = _match_predicate(location, match)
     if industry:
-        query[INDUSTRY] = {'$regex': generate_slug(industry)}
+        query[INDUSTRY] = _match_predicate(industry, match)
     if seniority:
-        query[SENIORITY] = {'$regex': generate_slug(seniority)} #seniority have to be string instead of interger
+        query[SENIORITY] = _match_predicate(seniority, match) #seniority have to be string instead of interger
+    return query
+
+def iter_job_listings(title: str = None, company: str = None, location: str = None, industry: str = None, seniority: str = None,
+                      match: str = MATCH_PREFIX, after: str = None, limit: int = None, projection: dict = None):
+    """
+    Lazily yield serialized job listings matching the filters.
+
+    Listings are yielded as the MongoDB cursor returns them, so callers can
+    stream large result sets without holding them in memory. When paginating
+    (after and/or limit given) results are ordered by _id and 'after' is an
+    opaque cursor from encode_cursor; a malformed cursor raises ValueError.
+    """
+    query = _build_filter_query(title, company, location, industry, seniority, match)
+    if after is not None:
+        query["_id"] = {"$gt": decode_cursor(after)}
+
+    cursor = _get_job_listing_collection().find(query, projection)
+    if after is not None or limit is not None:
+        cursor = cursor.sort("_id", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+
+    for listing in cursor:
+        yield serialize_item(listing)
 
-    listing = _get_job_listing_collection().find(query) #how to make sure there only one?
-    return serialize_items(listing)
+# to make sure the job search works, we have to make the entries into slug-like
+def search_job_with_filters(title: str = None, company: str = None, location: str= None, industry: str = None, seniority: str = None,
+                            match: str = MATCH_PREFIX, after: str = None, limit: int = None, projection: dict = None):
+    """
+    Search job listings, every given filter has to match.
+
+    Filters are compared against the slugified fields. By default a filter is a
+    prefix match (anchored, so MongoDB can use the slug indexes); pass
+    match="exact" for equality or match="regex" for the old substring search,
+    which scans the whole collection. See iter_job_listings for pagination.
+    """
+    return list(iter_job_listings(title, company, location, industry, seniority, match, after, limit, projection))
+
+
+def search_job_text(query: str, limit: int = DEFAULT_TOP_K, projection: dict = None):
+    """
+    Full-text search over title, industry and location, ranked by relevance.
+
+    Returns at most 'limit' serialized listings, best match first, each with a
+    'score'. Uses the MongoDB text index and falls back to an in-process
+    inverted index when the server cannot run $text.
+    """
+    if not _server_text_search():
+        return _search_job_text_fallback(query, limit, projection)
+
+    projection = dict(projection or {}, score={"$meta": "textScore"})
+    cursor = (_get_job_listing_collection()
+              .find({"$text": {"$search": query}}, projection)
+              .sort([("score", {"$meta": "textScore"})])
+              .limit(limit))
+    return serialize_items(cursor)
+
+def _server_text_search():
+    # Probed once per process: can the server answer $text queries on this collection?
+    global _text_search_supported
+    if _text_search_supported is None:
+        try:
+            next(_get_job_listing_collection().find({"$text": {"$search": "probe"}}).limit(1), None)
+            _text_search_supported = True
+        except (OperationFailure, NotImplementedError):
+            print(f"Text search unavailable on {JOB_LISTING_COLLECTION}, using the in-process index")
+            _text_search_supported = False
+    return _text_search_supported
+
+def _get_text_index():
+    global _text_index
+    with _text_index_lock:
+        if _text_index is None:
+            index = InvertedIndex(TEXT_SEARCH_WEIGHTS)
+            fields = {field: 1 for field in TEXT_SEARCH_WEIGHTS}
+            for listing in _get_job_listing_collection().find({}, fields):
+                index.add(str(listing["_id"]), listing)
+            _text_index = index
+        return _text_index
+
+def invalidate_text_index():
+    """
+    Drop the in-process fallback index, it is rebuilt from the collection on the next search.
+    """
+    global _text_index
+    with _text_index_lock:
+        _text_index = None
+
+def _update_text_index(id, listing=None):
+    # Keeps the fallback index in step with writes once it has been built
+    if _text_index is None:
+        return
+    if listing is None:
+        _text_index.remove(str(id))
+    else:
+        _text_index.add(str(id), listing)
+
+def add_listing_listener(callback):
+    """
+    Register callback(id, listing) to be run after a job listing is created or updated
+    in this process, with listing None once it is deleted. Lets in-process indexes
+    follow the writes instead of being rebuilt.
+    """
+    _listing_listeners.append(callback)
+
+def _listing_changed(id, listing=None):
+    _update_text_index(id, listing)
+    for callback in _listing_listeners:
+        try:
+            callback(str(id), listing)
+        except Exception as e:
+            print(f"Listing listener failed for {id}: {e}")
+
+def _search_job_text_fallback(query, limit, projection):
+    ranked = _get_text_index().search(query, limit)
+    if not ranked:
+        return []
+
+    scores = dict(ranked)
+    listings = _get_job_listing_collection().find({"_id": {"$in": [ObjectId(id) for id in scores]}}, projection)
+    results = serialize_items(listings)
+    for listing in results:
+        listing["score"] = scores[listing["_id"]]
+    results.sort(key=lambda listing: listing["score"], reverse=True)
+    return results
 
 
 def search_job_with_id(id: str): #intend to be used internally
     record = _get_job_listing_collection().find_one({"_id": ObjectId(id)}) #store id version
     return record
 
+def find_job_details(ids):
+    """
+    Batch fetch the displayed fields of several job listings in one query.
+
+    Returns a dict of listing id -> (title, company, location, industry, seniority).
+    Ids that are malformed or whose listing no longer exists are left out.
+    """
+    object_ids = [ObjectId(id) for id in ids if ObjectId.is_valid(id)]
+    if not object_ids:
+        return {}
+
+    projection = {field: 1 for field in JOB_DETAIL_FIELDS}
+    listings = _get_job_listing_collection().find({"_id": {"$in": object_ids}}, projection)
+    return {str(job["_id"]): tuple(job.get(field) for field in JOB_DETAIL_FIELDS) for job in listings}
+
+def attach_applications(listings):
+    """
+    Fill in the applicants, selected and rejected email lists of serialized job listings,
+    one query for all of them.
+    """
+    applicants = applications.get_applicants_by_listing([listing["_id"] for listing in listings])
+    for listing in listings:
+        by_status = applicants.get(listing["_id"], {})
+        for field, status in APPLICATION_FIELDS.items():
+            listing[field] = by_status.get(status, [])
+    return listings
+
 def get_job_listing_by_id(job_id: str):
     record = search_job_with_id(job_id)
     if record:
-        return serialize_item(record)
+        return attach_applications([serialize_item(record)])[0]
     return None
 
 
@@ -45,18 +258,16 @@ def create_job_listing(title: str, company: str, location: str, industry: str, s
         COMPANY: generate_slug(company), #company name
         LOCATION: generate_slug(location),
         INDUSTRY: generate_slug(industry),
-        SENIORITY: generate_slug(seniority),
-        APPLICANTS: [] , # applicants list
-        SELECTED: [], # selected list
-        REJECTED: []
+        SENIORITY: generate_slug(seniority)
     }
 
     result = _get_job_listing_collection().insert_one(new_job_listing)
+    _listing_changed(result.inserted_id, new_job_listing)
     return result.inserted_id #use this id in frontend
 
 
 def update_job_listing(id: str, title: str, company: str, location: str, industry: str, seniority: str): # one specific job listing
-    job_list_record = search_job_with_id(id) # assume this will give out a specific role only
+    job_list_record = _get_job_listing_collection().find_one({"_id": ObjectId(id)}, {COMPANY: 1})
 
     if job_list_record is None:
         return None
@@ -69,10 +280,7 @@ def update_job_listing(id: str, title: str, company: str, location: str, industr
         COMPANY: generate_slug(company), #company name
         LOCATION: generate_slug(location),
         INDUSTRY: generate_slug(industry),
-        SENIORITY: generate_slug(seniority),
-        APPLICANTS: job_list_record[APPLICANTS], # empty applicants list
-        SELECTED: job_list_record[SELECTED], # selected list,
-        REJECTED: job_list_record[REJECTED],
+        SENIORITY: generate_slug(seniority)
     }
 
     print("update_job_listing", new_job_listing)
@@ -81,34 +289,64 @@ def update_job_listing(id: str, title: str, company: str, location: str, industr
         {"_id": ObjectId(id)},  
         {"$set": new_job_listing}
     )
+    _listing_changed(id, new_job_listing)
+    suggestions.invalidate_listing([id])
 
     return result
 
 
 def delete_job_listing(id: str, company: str): # one specific job listing
-    job_list_record = search_job_with_id(id) 
+    job_list_record = _get_job_listing_collection().find_one({"_id": ObjectId(id)}, {COMPANY: 1})
 
     if job_list_record is None:
         return None
     
     if job_list_record[COMPANY] != generate_slug(company): # only that company can modify its own job board
         return "Not allowed"
-    
-    # Delete job listing from the job seeker's applied / selected / rejected list
-    for applicant in job_list_record[APPLICANTS]:
-        job_seekers.remove_job_listing_from_job_seeker(id, applicant)
 
-    for applicant in job_list_record[SELECTED]:
-        job_seekers.remove_job_listing_from_job_seeker(id, applicant)
+    def cascade(session):
+        # Delete the applications to the job listing and their scores along with it
+        applications.delete_listing_applications([id], session)
+        ai_scores.delete_listing_scores([id], session)
+        return _get_job_listing_collection().delete_one({"_id": ObjectId(id)}, session=session)
 
-    for applicant in job_list_record[REJECTED]:
-        job_seekers.remove_job_listing_from_job_seeker(id, applicant)
-    
-    result = _get_job_listing_collection().delete_one({"_id": ObjectId(id)})
+    result = run_in_transaction(cascade)
+    listings_deleted([id])
     return result
 
+def delete_company_job_listings(company: str, session=None, deleted_ids=None):
+    """
+    Deletes every job listing of a company and the applications to them,
+    a constant number of round trips however many listings and applicants there are.
+
+    Inside a transaction callback pass a deleted_ids list: it only writes and collects the
+    ids, the caller passes them to listings_deleted once the transaction committed.
+    Otherwise the in-process indexes and caches are updated straight away.
+    """
+    listings = list(_get_job_listing_collection().find({COMPANY: generate_slug(company)}, {"_id": 1}, session=session))
+    if not listings:
+        return None
+
+    ids = [listing["_id"] for listing in listings]
+    applications.delete_listing_applications([str(id) for id in ids], session)
+    ai_scores.delete_listing_scores([str(id) for id in ids], session)
+    result = _get_job_listing_collection().delete_many({"_id": {"$in": ids}}, session=session)
+
+    if deleted_ids is None:
+        listings_deleted(ids)
+    else:
+        deleted_ids.extend(ids)
+    return result
+
+def listings_deleted(ids):
+    # Drop deleted listings from the in-process indexes and the suggestion cache
+    for id in ids:
+        _listing_changed(id)
+    suggestions.invalidate_listing(ids)
+
+
 def view_applicants(id: str, company: str):
-    job_list_record = search_job_with_id(id) 
+    job_list_record = _get_job_listing_collection().find_one({"_id": ObjectId(id)}, {COMPANY: 1})
 
     if job_list_record is None:
         return None
@@ -116,82 +354,50 @@ def view_applicants(id: str, company: str):
     if job_list_record[COMPANY] != generate_slug(company): # only that company can modify its own job board
         return "Not allowed"
 
-    return job_list_record[APPLICANTS]
+    return applications.get_listing_applicants(id)
 
 
 def update_applicant(id: str, email: str):
-    job_list_record = search_job_with_id(id)
+    email = normalize_email(email)
 
-    if job_list_record is None:
+    if _get_job_listing_collection().find_one({"_id": ObjectId(id)}, {"_id": 1}) is None:
         return None
-    
-    if email in job_list_record[APPLICANTS] or email in job_list_record[SELECTED] or email in job_list_record[REJECTED]: #already applied
-        return "applied"
-    
-    applicant = job_seekers.apply(id, email)
-    result = _get_job_listing_collection().update_one(
-        {"_id": ObjectId(id)},  # Find the document by _id
-        {"$push": {APPLICANTS: email}}  # Append to list
-    )
+
+    # the unique (listing, seeker) index rejects a second application, even a concurrent one
+    result = applications.create_application(id, email)
+    if result is None:
+        return "applied" #already applied
 
     return result
 
 def select_applicant(id: str, company: str, email: str, action: str): #either accept or reject
-    job_list_record = search_job_with_id(id)
+    email = normalize_email(email)
+    job_list_record = _get_job_listing_collection().find_one({"_id": ObjectId(id)}, {COMPANY: 1})
 
     if job_list_record is None:
         return None
     
     if job_list_record[COMPANY] != generate_slug(company): # only that company can modify its own job board
         return "Not allowed"
-    
-    if email not in job_list_record[APPLICANTS]: 
-        return "Not applied" # not found applicants on the list
-    
-    if email in job_list_record[SELECTED]:
-        return "selected"
 
-    applicant = job_seekers.changeStatus(id, email, action)
+    status = STATUS_ACCEPTED if action == "accept" else STATUS_REJECTED
+    result = applications.change_status(id, email, status)
+    if result.modified_count:
+        return result
 
-    result = _get_job_listing_collection().update_one(
-        {"_id": ObjectId(id)}, 
-        {"$pull": {APPLICANTS: email}}  # Remove from list
-    )
+    # Nothing was written, find out why
+    application = applications.find_application(id, email)
+    if application is not None and application[STATUS] == STATUS_ACCEPTED:
+        return "selected"
 
-    if action == "accept":
-        result = _get_job_listing_collection().update_one(
-            {"_id": ObjectId(id)},  # Find the document by _id
-            {"$push": {SELECTED: email}}  # Append to list
-        )
-    elif action == "reject":
-        result = _get_job_listing_collection().update_one(
-            {"_id": ObjectId(id)},  # Find the document by _id
-            {"$push": {REJECTED: email}}  # Append to list
-        )
-
-    return result
+    return "Not applied" # not found applicants on the list
 
 # Get all job listings that a job seeker has applied to
 def get_all_jobs_for_a_job_seeker(jobSeekerEmail: str):
-    query = {}
-    query[APPLICANTS] = jobSeekerEmail
+    applied = applications.get_seeker_applications(normalize_email(jobSeekerEmail), STATUS_APPLIED)
+    object_ids = [ObjectId(id) for id in applied]
+    if not object_ids:
+        return []
 
-    listing = _get_job_listing_collection().find(query)
+    listing = _get_job_listing_collection().find({"_id": {"$in": object_ids}})
     return serialize_items(listing)
-
-# Remove job seeker from the job listing
-def remove_job_seeker_from_job_listing(jobListingId: str, jobSeekerEmail: str):
-
-    print(jobListingId, jobSeekerEmail)
-
-    result = _get_job_listing_collection().update_one(
-        {"_id": ObjectId(jobListingId)},
-        {
-            "$pull": {
-                APPLICANTS: jobSeekerEmail,
-                SELECTED: jobSeekerEmail,
-                REJECTED: jobSeekerEmail
-            }
-        }
-    )
-    return result
@@ -1,15 +1,29 @@
-from app.db.constants import JOB_SEEKER_COLLECTION, FIRST, LAST, EMAIL, EXPERTISE, YEARS, PASSWORD, APPLIED, ACCEPTED, REJECTED
-from app.db.utils import serialize_item, serialize_items
-from .db import get_db
+from app.db.constants import JOB_SEEKER_COLLECTION, FIRST, LAST, EMAIL, EXPERTISE, YEARS, PASSWORD
+from app.db.constants import STATUS_APPLIED
+from app.db.utils import serialize_item, serialize_items, normalize_email
+from .db import get_db, run_in_transaction
+from .cache import current_user_cache
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError, DuplicateKeyError
 import app.db.job_listings as job_listings
+import app.db.applications as applications
+import app.db.suggestions as suggestions
+import app.db.ai_scores as ai_scores
 
-# HASHING PASSWORDS
-import bcrypt  
+# HASHING PASSWORDS, on the process pool of app.db.passwords
+from .passwords import hash_password, authenticate
 
 def _get_job_seekers_collection():
     db = get_db()
     return db[JOB_SEEKER_COLLECTION]
 
+def ensure_indexes():
+    try:
+        _get_job_seekers_collection().create_index([(EMAIL, ASCENDING)], unique=True)
+    except PyMongoError as e:
+        print(f"Could not create unique email index on {JOB_SEEKER_COLLECTION}, run the normalize-emails command: {e}")
+
 # Returns the entire list of job seekers
 def get_job_seekers():
     job_seekers = _get_job_seekers_collection().find()
@@ -19,11 +33,27 @@ def get_job_seekers():
 def find_job_seeker(email: str = None):
     query = {}
     if email is not None:
-        query[EMAIL] = {'$regex': email}
+        query[EMAIL] = normalize_email(email)  # emails are stored normalized, equality uses the unique index
 
     job_seeker = _get_job_seekers_collection().find_one(query)
     return serialize_item(job_seeker)
 
+# Public profile fields of several job seekers in one query
+def find_job_seeker_profiles(emails):
+    emails = [normalize_email(email) for email in emails]
+    if not emails:
+        return []
+
+    job_seekers = _get_job_seekers_collection().find(
+        {EMAIL: {"$in": emails}},
+        {FIRST: 1, LAST: 1, EMAIL: 1, EXPERTISE: 1, YEARS: 1}
+    )
+    return serialize_items(list(job_seekers))
+
+def find_job_seeker_by_id(id: str):
+    job_seeker = _get_job_seekers_collection().find_one({"_id": ObjectId(id)})
+    return serialize_item(job_seeker)
+
 def create_job_seeker(first_name: str,
                       last_name: str,
                       email: str,
@@ -32,21 +62,21 @@ def create_job_seeker(first_name: str,
                       password: str):
 
     #Deliverable 4 - hash before storing
-    hashed_pw = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_pw = hash_password(password)
 
     job_seeker = {
         FIRST: first_name,
         LAST: last_name,
-        EMAIL: email,
+        EMAIL: normalize_email(email),
         EXPERTISE: expertise,
         YEARS: years,
-        PASSWORD: hashed_pw.decode('utf-8'),   # store as string
-        APPLIED: [],
-        ACCEPTED: [],
-        REJECTED: []
+        PASSWORD: hashed_pw   # stored as string
     }
 
-    result = _get_job_seekers_collection().insert_one(job_seeker)
+    try:
+        result = _get_job_seekers_collection().insert_one(job_seeker)
+    except DuplicateKeyError:
+        return None  # email already registered
     return result.inserted_id
 
 
@@ -59,20 +89,23 @@ def update_job_seeker(lookupemail: str, first_name: str, last_name: str, email:
     new_data = {
         FIRST: first_name, 
         LAST: last_name, 
-        EMAIL: email, 
+        EMAIL: normalize_email(email), 
         EXPERTISE: expertise, 
         YEARS: years
     }
-    
-    # Preserve the existing applied, accepted, and rejected fields if they exist
-    if APPLIED in job_seeker_record:
-        new_data[APPLIED] = job_seeker_record[APPLIED]
-    if ACCEPTED in job_seeker_record:
-        new_data[ACCEPTED] = job_seeker_record[ACCEPTED]
-    if REJECTED in job_seeker_record:
-        new_data[REJECTED] = job_seeker_record[REJECTED]
-        
-    result = _get_job_seekers_collection().update_one({EMAIL: lookupemail}, {"$set": new_data})
+
+    def rename(session):
+        result = _get_job_seekers_collection().update_one({EMAIL: job_seeker_record[EMAIL]}, {"$set": new_data}, session=session)
+        if new_data[EMAIL] != job_seeker_record[EMAIL]:
+            applications.rename_seeker(job_seeker_record[EMAIL], new_data[EMAIL], session)
+        return result
+
+    try:
+        result = run_in_transaction(rename)
+    except DuplicateKeyError:
+        return "Email exists"
+    current_user_cache.invalidate_tag(job_seeker_record[EMAIL])
+    suggestions.invalidate_seeker(job_seeker_record[EMAIL])
 
     return result
 
@@ -85,109 +118,36 @@ def delete_job_seeker(lookupemail: str):
     if record is None:
         return None
 
-    # Delete job seeker from all job listings that the job seeker has applied to
-    for job_listing_id in record[APPLIED]:
-        job_listings.remove_job_seeker_from_job_listing(job_listing_id, lookupemail)
+    def cascade(session):
+        # Delete the job seeker's applications and their scores along with it
+        applications.delete_seeker_applications(record[EMAIL], session)
+        ai_scores.delete_seeker_scores(record[EMAIL], session)
+        return _get_job_seekers_collection().delete_one({EMAIL: record[EMAIL]}, session=session)
 
-    for job_listing_id in record[ACCEPTED]:
-        job_listings.remove_job_seeker_from_job_listing(job_listing_id, lookupemail)
-
-    for job_listing_id in record[REJECTED]:
-        job_listings.remove_job_seeker_from_job_listing(job_listing_id, lookupemail)
-
-    result = _get_job_seekers_collection().delete_one({EMAIL: lookupemail})
+    result = run_in_transaction(cascade)
+    current_user_cache.invalidate_tag(record[EMAIL])
+    suggestions.invalidate_seeker(record[EMAIL])
     return result
 
 
 def check_login_credentials(email: str, password: str):
-    # Return the job‑seeker document if the (email, password) pair is valid,
-    # otherwise return None.
-    
-    # look up the user by email only
-    seeker = _get_job_seekers_collection().find_one({EMAIL: email})
-    if not seeker:
-        return None                    # email not found
-
-    stored_hash = seeker.get(PASSWORD)  # hash saved in DB
-    if stored_hash and bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
-        return seeker                  # password matches
-
-    return None                        # bad password
-
-
-def apply(id, email): #applicants apply for a job
-    record = find_job_seeker(email)
-
-    # if record is None: # never gonna happen if we only use it internaly (not as endpoints)
-    #     return "not found"
-    
-    result = _get_job_seekers_collection().update_one(
-        {"email": email},  # Find the document by _id
-        {"$push": {APPLIED: id}}  # Append to list
-    )
+    # Return the job seeker (_id and email only) if the (email, password) pair is valid,
+    # otherwise return None. One query on the unique email index.
+    seeker = authenticate(_get_job_seekers_collection(), {EMAIL: normalize_email(email)}, password, (EMAIL,))
+    return serialize_item(seeker)
 
-    return result
-
-def changeStatus(id: str, email: str, action: str): #appicants get accepted for a job
-    record = find_job_seeker(email)
-    
-    result = _get_job_seekers_collection().update_one(
-        {"email": email},  # Find the document by _id
-        {"$pull": {APPLIED: id}}  # remove from list
-    )
-
-    if action == "accept":
-        result = _get_job_seekers_collection().update_one(
-            {"email": email},  # Find the document by _id
-            {"$push": {ACCEPTED: id}}  # Append to list
-        )
-    elif action == "reject":
-        result = _get_job_seekers_collection().update_one(
-            {"email": email},  # Find the document by _id
-            {"$push": {REJECTED: id}}  # Append to list
-        )
-
-    return result
 
-    
 def translate_slug(slug: str):
     normal_text = slug.replace("-", " ")
     normal_text = normal_text.title()
     return normal_text
 
-def findJobDetails(id):
-    job = job_listings.search_job_with_id(id)
-    return (job["title"], job["company"], job["location"], job["industry"], job["seniority"])
-
-
 def inquire_status(email):
-    record = find_job_seeker(email)
-    apply_data = {}
-
-    for entry in record[ACCEPTED]:
-        information = findJobDetails(entry)
-        apply_data[entry] = ("accepted", information)
-
-    for entry in record[REJECTED]:
-        information = findJobDetails(entry)
-        apply_data[entry] =  ("rejected", information)
-
-    for entry in record[APPLIED]:
-        if entry not in record[ACCEPTED] and entry not in record[REJECTED]:
-            information = findJobDetails(entry)
-            apply_data[entry] = ("waiting", information)   
-    
-    return apply_data
-
-def remove_job_listing_from_job_seeker(jobListingId: str, jobSeekerEmail: str):
-    result = _get_job_seekers_collection().update_one(
-        {"email": jobSeekerEmail},
-        {"$pull": {
-                APPLIED: jobListingId,
-                ACCEPTED: jobListingId,
-                REJECTED: jobListingId
-            }
-        }
-    )
-    return result
-
+    # Maps job listing id -> (status, (title, company, location, industry, seniority))
+    statuses = {}
+    for entry, status in applications.get_seeker_applications(normalize_email(email)).items():
+        statuses[entry] = "waiting" if status == STATUS_APPLIED else status  # still waiting unless already decided
+
+    # one query for every listing, ids of deleted listings are left out
+    details = job_listings.find_job_details(statuses)
+    return {entry: (status, details[entry]) for entry, status in statuses.items() if entry in details}
@@ -0,0 +1,87 @@
+from app.db.utils import normalize_email
+from .db import get_db
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+LOGIN_ATTEMPT_COLLECTION = "login_attempts"
+
+WINDOW = 15 * 60            # seconds, failures older than this are not counted
+MAX_EMAIL_FAILURES = 5      # failed logins to one account within WINDOW before it is locked
+MAX_IP_FAILURES = 20        # failed logins from one address within WINDOW before it is locked
+BASE_LOCKOUT = 30           # seconds of the first lockout, doubled for every further one
+MAX_LOCKOUT = 60 * 60
+MEMORY = 24 * 60 * 60       # seconds after the last failure until the lockouts are forgotten
+
+
+def _get_login_attempt_collection():
+    db = get_db()
+    return db[LOGIN_ATTEMPT_COLLECTION]
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def ensure_indexes():
+    try:
+        # MongoDB drops a counter once its expires_at has passed
+        _get_login_attempt_collection().create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    except PyMongoError as e:
+        print(f"Could not create indexes on {LOGIN_ATTEMPT_COLLECTION}: {e}")
+
+
+def _keys(scope, email, ip):
+    # one counter per account of the scope (seeker or company login) and one per client address
+    keys = [(f"{scope}:{normalize_email(email)}", MAX_EMAIL_FAILURES)]
+    if ip:
+        keys.append((f"ip:{ip}", MAX_IP_FAILURES))
+    return keys
+
+def _aware(value):
+    # mongomock and pymongo without tz_aware hand back naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def retry_after(scope: str, email: str, ip: str = None):
+    """
+    Seconds until a login to `email` from `ip` may be tried again, 0 when it may go ahead.
+    Costs one indexed read, so it runs before the password is checked.
+    """
+    now = _now()
+    counters = _get_login_attempt_collection().find(
+        {"_id": {"$in": [key for key, _ in _keys(scope, email, ip)]}, "locked_until": {"$gt": now}},
+        {"locked_until": 1}
+    )
+    waits = [(_aware(counter["locked_until"]) - now).total_seconds() for counter in counters]
+    return max(waits, default=0)
+
+def record_failure(scope: str, email: str, ip: str = None):
+    """
+    Count a failed login. A counter with too many failures within WINDOW is locked for
+    BASE_LOCKOUT seconds, doubled for each lockout of the last MEMORY seconds.
+    """
+    now = _now()
+    collection = _get_login_attempt_collection()
+    for key, max_failures in _keys(scope, email, ip):
+        counter = collection.find_one_and_update(
+            {"_id": key},
+            {
+                "$push": {"failures": {"$each": [now], "$slice": -max_failures}},
+                "$set": {"expires_at": now + timedelta(seconds=MEMORY)},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        recent = [failure for failure in counter["failures"]
+                  if (now - _aware(failure)).total_seconds() < WINDOW]
+        if len(recent) >= max_failures:
+            lockout = min(BASE_LOCKOUT * 2 ** counter.get("lockouts", 0), MAX_LOCKOUT)
+            collection.update_one(
+                {"_id": key},
+                {
+                    "$set": {"locked_until": now + timedelta(seconds=lockout), "failures": []},
+                    "$inc": {"lockouts": 1},
+                }
+            )
+
+def record_success(scope: str, email: str):
+    # the account's failures are forgiven, those of the address are not
+    _get_login_attempt_collection().delete_one({"_id": _keys(scope, email, None)[0][0]})
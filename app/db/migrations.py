@@ -0,0 +1,119 @@
+from app.db.constants import JOB_SEEKER_COLLECTION, COMPANY_COLLECTION, EMAIL, APPLIED, ACCEPTED
+from app.db.constants import JOB_LISTING_COLLECTION, APPLICANTS, SELECTED, REJECTED
+from app.db.constants import APPLICATION_COLLECTION, LISTING_ID, SEEKER_EMAIL, STATUS, CREATED_AT, UPDATED_AT
+from app.db.constants import STATUS_APPLIED, STATUS_ACCEPTED, STATUS_REJECTED
+from app.db.utils import normalize_email
+from .db import get_db, ensure_indexes
+from datetime import datetime, timezone
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+BATCH_SIZE = 500
+
+
+def normalize_emails():
+    """
+    Backfill normalized (trimmed, lowercased) emails on existing job seekers and companies,
+    then (re)create the indexes, including the unique email indexes.
+
+    Documents whose normalized email is already taken by another document are left
+    untouched and reported, they have to be merged by hand.
+
+    Returns:
+        dict: Per collection, the number of updated documents and the list of conflicting emails.
+    """
+    report = {}
+    for collection_name in (JOB_SEEKER_COLLECTION, COMPANY_COLLECTION):
+        report[collection_name] = _normalize_collection_emails(get_db()[collection_name])
+
+    ensure_indexes()
+    return report
+
+
+def _normalize_collection_emails(collection):
+    documents = list(collection.find({}, {EMAIL: 1}))
+    owners = {}  # normalized email -> id of the document that keeps it
+    for document in documents:
+        email = document.get(EMAIL)
+        if isinstance(email, str) and email == normalize_email(email):
+            owners[email] = document["_id"]
+
+    updated = 0
+    conflicts = []
+    batch = []
+    for document in documents:
+        email = document.get(EMAIL)
+        if not isinstance(email, str) or email == normalize_email(email):
+            continue
+
+        normalized = normalize_email(email)
+        if normalized in owners:
+            conflicts.append(email)
+            continue
+
+        owners[normalized] = document["_id"]
+        batch.append(UpdateOne({"_id": document["_id"]}, {"$set": {EMAIL: normalized}}))
+        if len(batch) == BATCH_SIZE:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+
+    return {"updated": updated, "conflicts": conflicts}
+
+
+def migrate_applications():
+    """
+    Move the applicant arrays of job listings (applicants / selected / rejected) and job seekers
+    (applied / accepted / rejected) into the applications collection, then drop the arrays.
+
+    The listing arrays win when both sides disagree, entries that only exist on the job seeker
+    are kept as long as the listing still exists. Running it again is a no-op.
+
+    Returns:
+        dict: The number of applications written and of dangling job seeker entries skipped.
+    """
+    db = get_db()
+    ensure_indexes()  # the unique (listing, seeker) index makes the upserts idempotent
+
+    statuses = {}  # (listing ObjectId, email) -> status
+    listing_ids = set()
+    for listing in db[JOB_LISTING_COLLECTION].find({}, {APPLICANTS: 1, SELECTED: 1, REJECTED: 1}):
+        listing_ids.add(listing["_id"])
+        for field, status in ((APPLICANTS, STATUS_APPLIED), (REJECTED, STATUS_REJECTED), (SELECTED, STATUS_ACCEPTED)):
+            for email in listing.get(field) or []:
+                statuses[(listing["_id"], normalize_email(email))] = status
+
+    skipped = 0
+    seeker_statuses = {}
+    for seeker in db[JOB_SEEKER_COLLECTION].find({}, {EMAIL: 1, APPLIED: 1, ACCEPTED: 1, REJECTED: 1}):
+        for field, status in ((APPLIED, STATUS_APPLIED), (REJECTED, STATUS_REJECTED), (ACCEPTED, STATUS_ACCEPTED)):
+            for id in seeker.get(field) or []:
+                if not ObjectId.is_valid(id) or ObjectId(id) not in listing_ids:
+                    skipped += 1
+                    continue
+                seeker_statuses[(ObjectId(id), normalize_email(seeker[EMAIL]))] = status
+
+    for key, status in seeker_statuses.items():
+        statuses.setdefault(key, status)
+
+    now = datetime.now(timezone.utc)
+    written = 0
+    batch = []
+    for (listing_id, email), status in statuses.items():
+        batch.append(UpdateOne(
+            {LISTING_ID: listing_id, SEEKER_EMAIL: email},
+            {"$setOnInsert": {STATUS: status, CREATED_AT: now, UPDATED_AT: now}},
+            upsert=True
+        ))
+        if len(batch) == BATCH_SIZE:
+            written += db[APPLICATION_COLLECTION].bulk_write(batch, ordered=False).upserted_count
+            batch = []
+
+    if batch:
+        written += db[APPLICATION_COLLECTION].bulk_write(batch, ordered=False).upserted_count
+
+    db[JOB_LISTING_COLLECTION].update_many({}, {"$unset": {APPLICANTS: "", SELECTED: "", REJECTED: ""}})
+    db[JOB_SEEKER_COLLECTION].update_many({}, {"$unset": {APPLIED: "", ACCEPTED: "", REJECTED: ""}})
+    return {"applications": written, "skipped": skipped}
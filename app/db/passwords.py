@@ -0,0 +1,181 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+import time
+import bcrypt
+from app.db.constants import PASSWORD
+
+DEFAULT_ROUNDS = 12       # bcrypt cost factor of new hashes, every step doubles the work
+DEFAULT_WORKERS = 2       # hashing processes per worker process, 0 hashes in the request thread
+DEFAULT_MAX_PENDING = 16  # hashes queued or running in one worker process, more are refused
+DEFAULT_TIMEOUT = 10      # seconds a request waits for its hash
+
+
+class PasswordHasherBusy(Exception):
+    """Too many passwords are being hashed, the request should be retried later."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small process pool, so a burst of logins does not hold the request
+    threads (and the GIL) for a quarter of a second each. At most max_pending hashes wait
+    for the pool; past that, and when a hash takes longer than timeout, PasswordHasherBusy
+    is raised so the request can be answered with a 503 instead of stalling the worker.
+    """
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, max_workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_TIMEOUT):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._stats = {"hash": [0, 0.0, 0.0], "verify": [0, 0.0, 0.0]}  # count, total and max seconds
+        self._rejected = 0
+        self._pending = 0
+        self.configure(rounds, max_workers, max_pending, timeout)
+
+    def configure(self, rounds=None, max_workers=None, max_pending=None, timeout=None):
+        with self._lock:
+            if rounds is not None:
+                self.rounds = rounds
+            if max_workers is not None and max_workers != getattr(self, "max_workers", None):
+                self.max_workers = max_workers
+                self._shutdown_executor()  # the next hash starts a pool of the new size
+            if max_pending is not None:
+                self.max_pending = max_pending
+            if timeout is not None:
+                self.timeout = timeout
+
+    def hash(self, password: str):
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run("hash", bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password: str, hashed: str):
+        try:
+            return self._run("verify", bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:  # not a bcrypt hash
+            return False
+
+    def needs_rehash(self, hashed: str):
+        # "$2b$12$..." holds the cost factor the hash was made with
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                operation: {"count": count, "avg_ms": round(1000 * total / count, 1) if count else 0,
+                            "max_ms": round(1000 * longest, 1)}
+                for operation, (count, total, longest) in self._stats.items()
+            }
+            stats["pending"] = self._pending
+            stats["rejected"] = self._rejected
+        return stats
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown_executor(wait)
+
+    def _run(self, operation, function, *args):
+        start = time.perf_counter()
+        if self.max_workers <= 0:
+            result = function(*args)
+        else:
+            result = self._run_in_pool(function, *args)
+        self._record(operation, time.perf_counter() - start)
+        return result
+
+    def _run_in_pool(self, function, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy("Too many password hashes in progress")
+            self._pending += 1
+
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self._done()
+            raise
+        # counted as pending until the hash is done, even when the request gave up waiting
+        future.add_done_callback(lambda _: self._done())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._reject()
+            raise PasswordHasherBusy("Password hashing timed out")
+        except BrokenProcessPool:
+            with self._lock:
+                self._executor = None  # a hashing process died, start a new pool next time
+            raise PasswordHasherBusy("Password hashing pool is restarting")
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # started lazily in each worker process, a pool does not survive a fork;
+                # spawned so the hashing processes do not inherit the worker's threads
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _shutdown_executor(self, wait=False):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+        self._executor = None
+
+    def _record(self, operation, seconds):
+        with self._lock:
+            stats = self._stats[operation]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _reject(self):
+        with self._lock:
+            self._rejected += 1
+
+
+hasher = PasswordHasher()
+
+def hash_password(password: str):
+    return hasher.hash(password)
+
+def check_password(password: str, hashed: str):
+    return hasher.verify(password, hashed)
+
+
+def authenticate(collection, query: dict, password: str, fields=("email",)):
+    """
+    Log in with a single query: fetch the user matching `query` with only `fields` and
+    the password hash, check the password, and rehash it when the cost factor has
+    changed since it was stored.
+
+    Returns the user (_id and fields, without the hash) or None for bad credentials.
+    """
+    if password is None:
+        return None
+
+    projection = {field: 1 for field in fields}
+    projection[PASSWORD] = 1
+    user = collection.find_one(query, projection)
+    if user is None or not user.get(PASSWORD) or not check_password(password, user[PASSWORD]):
+        return None
+
+    stored_hash = user.pop(PASSWORD)
+    if hasher.needs_rehash(stored_hash):
+        try:
+            # only replaces the hash it was checked against, a password changed meanwhile wins
+            collection.update_one({"_id": user["_id"], PASSWORD: stored_hash},
+                                  {"$set": {PASSWORD: hash_password(password)}})
+        except PasswordHasherBusy:
+            pass  # rehashed on a later login
+    return user
+
@@ -0,0 +1,92 @@
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+
+TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """
+    Split text (or a slug such as 'software-engineer') into lowercase terms.
+    """
+    if not text:
+        return []
+    return TOKEN_REGEX.findall(str(text).lower())
+
+
+class InvertedIndex:
+    """
+    In-process inverted index ranking documents with BM25.
+
+    This is the fallback for deployments without a MongoDB text index (mongomock
+    in the tests, for instance). Fields can be weighted so that e.g. a match in
+    the title counts more than a match in the location. It is thread safe.
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        self._postings = defaultdict(dict)  # term -> {doc_id: weighted term frequency}
+        self._doc_terms = {}                # doc_id -> set of terms, to remove a document
+        self._doc_lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_id, doc):
+        """
+        Index (or re-index) a document, given as a dict holding the weighted fields.
+        """
+        frequencies = defaultdict(float)
+        for field, weight in self.weights.items():
+            for term in tokenize(doc.get(field)):
+                frequencies[term] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            for term, frequency in frequencies.items():
+                self._postings[term][doc_id] = frequency
+            self._doc_terms[doc_id] = set(frequencies)
+            self._doc_lengths[doc_id] = sum(frequencies.values())
+            self._total_length += self._doc_lengths[doc_id]
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    def search(self, query, k=20):
+        """
+        Return the k best (doc_id, score) pairs for the query, best first.
+        """
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if doc_count == 0:
+                return []
+            average_length = self._total_length / doc_count or 1
+
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,83 @@
+from app.db.utils import normalize_email
+from .db import get_db
+from .cache import TTLCache, DEFAULT_MAX_SIZE
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+import copy
+import hashlib
+import json
+
+SUGGESTION_CACHE_COLLECTION = "ai_suggestions_cache"
+SUGGESTION_TTL = 24 * 60 * 60  # seconds a generated suggestion is reused
+LOCAL_TTL = 60                 # seconds, bounds how long another worker may serve an invalidated entry
+
+# The inputs of the prompt, a change to any of them is a different cache entry
+PROMPT_JOB_FIELDS = ("title", "company", "location", "industry", "seniority")
+PROMPT_APPLICANT_FIELDS = ("first", "last", "expertise", "years")
+
+# Fronts the collection in each worker, tagged with the listing id and the job seeker email
+local_cache = TTLCache(DEFAULT_MAX_SIZE, LOCAL_TTL)
+
+
+def _get_suggestion_collection():
+    db = get_db()
+    return db[SUGGESTION_CACHE_COLLECTION]
+
+def ensure_indexes():
+    try:
+        # MongoDB drops the documents once they are SUGGESTION_TTL seconds old
+        _get_suggestion_collection().create_index([("created_at", ASCENDING)], expireAfterSeconds=SUGGESTION_TTL)
+        _get_suggestion_collection().create_index([("listing", ASCENDING)])
+        _get_suggestion_collection().create_index([("seeker", ASCENDING)])
+    except PyMongoError as e:
+        print(f"Could not create indexes on {SUGGESTION_CACHE_COLLECTION}: {e}")
+
+
+def suggestion_key(job, applicant):
+    inputs = {
+        "job": {field: job.get(field) for field in PROMPT_JOB_FIELDS},
+        "applicant": {field: applicant.get(field) for field in PROMPT_APPLICANT_FIELDS},
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _tags(listing_id, email):
+    return tuple(tag for tag in (f"listing:{listing_id}" if listing_id else None,
+                                 f"seeker:{email}" if email else None) if tag)
+
+
+def get_cached_suggestions(key):
+    suggestions = local_cache.get(key)
+    if suggestions is None:
+        record = _get_suggestion_collection().find_one({
+            "_id": key,
+            # the TTL monitor only runs once a minute, skip what it has not removed yet
+            "created_at": {"$gt": datetime.now(timezone.utc) - timedelta(seconds=SUGGESTION_TTL)},
+        })
+        if record is None:
+            return None
+        suggestions = record["suggestions"]
+        local_cache.set(key, suggestions, tags=_tags(record.get("listing"), record.get("seeker")))
+    return copy.deepcopy(suggestions)  # callers get their own copy
+
+def cache_suggestions(key, suggestions, listing_id=None, email=None):
+    listing_id = str(listing_id) if listing_id else None
+    email = normalize_email(email)
+    _get_suggestion_collection().replace_one(
+        {"_id": key},
+        {"suggestions": suggestions, "listing": listing_id, "seeker": email, "created_at": datetime.now(timezone.utc)},
+        upsert=True
+    )
+    local_cache.set(key, copy.deepcopy(suggestions), tags=_tags(listing_id, email))
+
+
+def invalidate_listing(listing_ids):
+    listing_ids = [str(id) for id in listing_ids]
+    _get_suggestion_collection().delete_many({"listing": {"$in": listing_ids}})
+    for listing_id in listing_ids:
+        local_cache.invalidate_tag(f"listing:{listing_id}")
+
+def invalidate_seeker(email):
+    email = normalize_email(email)
+    _get_suggestion_collection().delete_many({"seeker": email})
+    local_cache.invalidate_tag(f"seeker:{email}")
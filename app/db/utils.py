@@ -1,4 +1,8 @@
 from app.db.constants import ID
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+import base64
+import binascii
 import re
 
 EMAIL_REGEX = r"^(?!.*\.\.)[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z]{2,}$"
@@ -7,6 +11,14 @@ def generate_slug(text):
     slug = re.sub(r'\W+', '-', text.lower()).strip('-')  # Normalize the text --> standardizing for testing
     return slug
 
+def normalize_email(email: str = None):
+    """
+    Normalize an email address for storage and lookups: trimmed and lowercased.
+    """
+    if email is None:
+        return None
+    return email.strip().lower()
+
 def is_valid_email(email: str = None) -> bool:
     if email:
         return re.match(EMAIL_REGEX, email) is not None
@@ -38,6 +50,37 @@ def serialize_item(item):
         item[ID] = serialize_oid(item[ID])
     return item
 
+def encode_cursor(oid):
+    """
+    Encode an ObjectId as an opaque, url-safe pagination cursor.
+
+    Args:
+        oid (ObjectId | str): The id of the last item on the current page.
+
+    Returns:
+        str: The cursor to pass back as 'after' for the next page.
+    """
+    return base64.urlsafe_b64encode(ObjectId(oid).binary).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): The opaque cursor.
+
+    Returns:
+        ObjectId: The id the next page starts after.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return ObjectId(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, InvalidId, TypeError, UnicodeEncodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 def serialize_items(items):
     """
     Serializes a list of items.
@@ -0,0 +1,10 @@
+# Loaded by gunicorn from the working directory, next to the command line flags in gunicornstarter.sh
+
+def worker_exit(server, worker):
+    # Write the A/B test events still queued in this worker before it goes away
+    from app.db import batching, eventlog
+    batching.drain_all()
+    eventlog.flush_all()
+    # and fail the AI jobs it will not finish, rather than leave them pending forever
+    from app.apis.job_seekers import ai_job_runner
+    ai_job_runner.abandon()
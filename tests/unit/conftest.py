@@ -11,12 +11,15 @@ import yaml
 from app import create_app
 from app.config import UnitTestConfig
 from app.db.db import get_collection
+from app.db import abtest
 
 
 @pytest.fixture(scope='session')
-def app():
+def app(tmp_path_factory):
     from app.config import IntegrationTestConfig
     app = create_app(IntegrationTestConfig)  # this already calls init_db inside create_app
+    # keep the A/B test logs written by the endpoint tests out of the repository
+    abtest.configure(str(tmp_path_factory.mktemp("logs")))
     yield app
 
 
@@ -46,7 +49,7 @@ def job_seekers():
 
 
 @pytest.fixture(scope='function', autouse=True)
-def seeded_job_seekers_db(job_seekers):
+def seeded_job_seekers_db(app, job_seekers):
     """
     Preload the mock 'job_seekers' collection with data from the YAML fixture.
     """
@@ -76,7 +79,7 @@ def companies():
 
 
 @pytest.fixture(scope='function', autouse=True)
-def seeded_companies_db(companies):
+def seeded_companies_db(app, companies):
     """
     Preload the mock 'companies' collection with data from the YAML fixture.
     """
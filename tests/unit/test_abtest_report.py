@@ -0,0 +1,76 @@
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from app.db import abtest, abtest_report
+from app.db.db import get_collection
+from app.db.eventlog import JsonLinesLog
+
+
+def test_experiment_report(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(abtest, "event_log", JsonLinesLog(str(tmp_path), "event"))
+    monkeypatch.setattr(abtest, "survey_log", JsonLinesLog(str(tmp_path), "survey"))
+    for name in ("ab_test_logs", "ab_test_survey", abtest_report.ROLLUP_COLLECTION):
+        get_collection(name).delete_many({})
+
+    abtest.log_ab_test_event("s1", "A", "view AI suggestions for software-engineer")
+    abtest.log_ab_test_event("s1", "A", "applied to software-engineer")
+    abtest.log_ab_test_event("s2", "A", "view AI suggestions for data-analyst")
+    abtest.log_ab_test_event("s3", "B", "applied to data-analyst")
+    abtest.event_writer.drain()
+    abtest.log_ab_test_survey("s1", True, 5, "yes", "A")
+    abtest.log_ab_test_survey("s2", False, 5, "no", "A")
+
+    assert abtest_report.refresh_rollup() == 4 # nosec B101
+    assert abtest_report.refresh_rollup() == 0 # nosec B101
+
+    # only the events logged after the last refresh are folded in
+    abtest.log_ab_test_event("s2", "A", "applied to data-analyst")
+    abtest.event_writer.drain()
+
+    client.post("/api/job_seekers/signup", json={
+        "first": "Report", "last": "Reader", "email": "report@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "report@test.com", "password": "Abcdefgh0"})
+    response = client.get("/api/abtest/report", headers={"Authorization": f"Bearer {response.json['access_token']}"})
+    assert response.status_code == 200 # nosec B101
+
+    variants = response.json["variants"]
+    assert variants["A"] == { # nosec B101
+        "sessions": 2,
+        "converted_sessions": 2,
+        "conversion_rate": 1.0,
+        "events": {"applied": 2, "viewed_suggestions": 2},
+    }
+    assert variants["B"]["conversion_rate"] == 1.0 # nosec B101
+    assert response.json["surveys"]["A"] == { # nosec B101
+        "responses": 2,
+        "clickedButton": {"True": 1, "False": 1},
+        "experience": {"5": 2},
+        "impactedDecision": {"yes": 1, "no": 1},
+    }
+
+
+def test_refresh_folds_late_batches():
+    for name in ("ab_test_logs", abtest_report.ROLLUP_COLLECTION):
+        get_collection(name).delete_many({})
+    # two workers generated their _ids in this order, the second one flushed first
+    early, late = ObjectId(), ObjectId()
+    get_collection("ab_test_logs").insert_one({"_id": late, "session_id": "s1", "variant": "A", "event_type": "applied to x"})
+    assert abtest_report.refresh_rollup() == 1 # nosec B101
+    get_collection("ab_test_logs").insert_one({"_id": early, "session_id": "s2", "variant": "A", "event_type": "applied to y"})
+    assert abtest_report.refresh_rollup() == 1 # nosec B101
+    assert abtest_report.get_experiment_report(refresh=False)["variants"]["A"]["converted_sessions"] == 2 # nosec B101
+
+
+def test_refresh_takes_over_stale_claims():
+    for name in ("ab_test_logs", abtest_report.ROLLUP_COLLECTION):
+        get_collection(name).delete_many({})
+    now = datetime.now(timezone.utc)
+    # a refresh that failed after claiming its events, and one still running
+    failed = ObjectId.from_datetime(now - timedelta(seconds=2 * abtest_report.CLAIM_TIMEOUT))
+    get_collection("ab_test_logs").insert_many([
+        {"session_id": "s1", "variant": "A", "event_type": "applied to x", "folded": failed},
+        {"session_id": "s2", "variant": "A", "event_type": "applied to y", "folded": ObjectId()},
+    ])
+    assert abtest_report.refresh_rollup() == 1 # nosec B101
+    assert abtest_report.refresh_rollup() == 0 # nosec B101
+    assert get_collection("ab_test_logs").count_documents({"folded": True}) == 1 # nosec B101
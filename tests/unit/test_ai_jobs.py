@@ -0,0 +1,106 @@
+import threading
+from app.apis.ai_jobs import AIJobRunner
+from app.apis.llm import AIService
+from app.db import ai_jobs
+from app.db.ai_jobs import FINISHED
+import app.apis.job_seekers as job_seekers_api
+
+
+class FlakyModel:
+    """Fails `failures` times, then answers."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("503 model overloaded")
+        return type("Response", (), {"text": '{"matchScore": 64, "analysis": "fair", "suggestions": [], "strengths": []}'})()
+
+
+JOB = {"title": "data-analyst", "company": "globex", "location": "boston", "industry": "finance", "seniority": 2}
+APPLICANT = {"first": "Alice", "last": "Bob", "email": "ab@gmail.com", "expertise": "Finance", "years": 9}
+
+
+def test_runner_retries_with_backoff(client):
+    delays = []
+    model = FlakyModel(failures=2)
+    runner = AIJobRunner(AIService(model=model, use_cache=False), max_attempts=3, backoff=1, sleep=delays.append)
+
+    job_id = runner.submit("ab@gmail.com", JOB, APPLICANT)
+    runner.shutdown()
+
+    job = ai_jobs.find_job(job_id, "ab@gmail.com")
+    assert job["status"] == ai_jobs.JOB_DONE and job["attempts"] == 3 # nosec B101
+    assert job["result"]["matchScore"] == 64 # nosec B101
+    assert delays == [1, 2] # nosec B101
+    assert ai_jobs.find_job(job_id, "jd@gmail.com") is None # nosec B101
+
+
+def test_runner_caps_outstanding_jobs(client):
+    release = threading.Event()
+
+    class BlockingModel(FlakyModel):
+        def generate_content(self, prompt):
+            release.wait(5)
+            return super().generate_content(prompt)
+
+    runner = AIJobRunner(AIService(model=BlockingModel(), use_cache=False), max_workers=1, max_pending=2)
+    assert runner.submit("ab@gmail.com", JOB, APPLICANT) is not None # nosec B101
+    assert runner.submit("ab@gmail.com", JOB, APPLICANT) is not None # nosec B101
+    assert runner.submit("ab@gmail.com", JOB, APPLICANT) is None # nosec B101
+    release.set()
+    runner.shutdown()
+    assert runner.submit("ab@gmail.com", JOB, APPLICANT) is not None # nosec B101
+    runner.shutdown()
+
+
+def test_async_suggestions_endpoint(client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "RATE_LIMIT_DB", str(tmp_path / "buckets.sqlite3"))
+    monkeypatch.setitem(app.config, "AI_SUGGESTIONS_USER_BURST", 5)
+    monkeypatch.setattr(job_seekers_api.ai_job_runner, "service", AIService(model=FlakyModel(failures=1), use_cache=False))
+    monkeypatch.setattr(job_seekers_api.ai_job_runner, "backoff", 0)
+    client.post("/api/job_seekers/signup", json={
+        "first": "Async", "last": "Seeker", "email": "async@test.com", "expertise": "Finance", "years": 9, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "async@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    response = client.post("/api/job_seekers/ai/suggestions/jobs", json={"job": JOB, "applicant": APPLICANT}, headers=headers)
+    assert response.status_code == 202 # nosec B101
+    job_id = response.json["job_id"]
+    assert response.headers["Location"].endswith(f"/api/job_seekers/ai/suggestions/jobs/{job_id}") # nosec B101
+
+    response = client.get(f"/api/job_seekers/ai/suggestions/jobs/{job_id}?wait=5", headers=headers)
+    assert response.json["status"] == "done" # nosec B101
+    assert response.json["result"]["score"] == 64 # nosec B101
+
+    response = client.get("/api/job_seekers/ai/suggestions/jobs/not-a-job", headers=headers)
+    assert response.status_code == 404 # nosec B101
+    response = client.post("/api/job_seekers/ai/suggestions/jobs", json={"job": JOB}, headers=headers)
+    assert response.status_code == 400 # nosec B101
+
+
+def test_abandon_fails_outstanding_jobs(client):
+    release = threading.Event()
+
+    class BlockingModel(FlakyModel):
+        def generate_content(self, prompt):
+            release.wait(5)
+            return super().generate_content(prompt)
+
+    runner = AIJobRunner(AIService(model=FlakyModel(), use_cache=False), max_workers=1)
+    finished = runner.submit("ab@gmail.com", JOB, APPLICANT)
+    runner.shutdown()
+
+    runner.service = AIService(model=BlockingModel(), use_cache=False)
+    running = runner.submit("ab@gmail.com", JOB, APPLICANT)
+    queued = runner.submit("ab@gmail.com", JOB, APPLICANT)
+    assert runner.abandon() == 2 # nosec B101
+    release.set()
+
+    assert ai_jobs.find_job(finished, "ab@gmail.com")["status"] == ai_jobs.JOB_DONE # nosec B101
+    assert ai_jobs.find_job(queued, "ab@gmail.com")["status"] == ai_jobs.JOB_FAILED # nosec B101
+    assert ai_jobs.find_job(running, "ab@gmail.com")["status"] in FINISHED # nosec B101
@@ -0,0 +1,115 @@
+import json
+import re
+from app.apis.llm import AIService
+from app.apis.scoring import score_applicants
+import app.apis.job_listings as job_listings_api
+from app.db import ai_scores, job_listings, job_seekers, companies
+from app.db.db import get_collection
+from app.db.constants import JOB_LISTING_COLLECTION, APPLICATION_COLLECTION
+
+
+class BatchModel:
+    """Scores every applicant in the prompt by their years of experience."""
+
+    def __init__(self, fail_on=None):
+        self.prompts = []
+        self.fail_on = fail_on
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("503 model overloaded")
+        results = [{"email": email, "matchScore": int(years) * 10, "analysis": f"{years} years"}
+                   for email, years in re.findall(r"Email: (\S+);.*?Experience: (\d+) years", prompt)]
+        return type("Response", (), {"text": "```json" + json.dumps(results) + "```"})()
+
+
+def _seed_applicants(count):
+    get_collection(JOB_LISTING_COLLECTION).delete_many({})
+    get_collection(APPLICATION_COLLECTION).delete_many({})
+    get_collection(ai_scores.AI_SCORE_COLLECTION).delete_many({})
+    job_id = str(job_listings.create_job_listing("Data Analyst", "Globex", "Boston", "Finance", "2"))
+    emails = []
+    for i in range(count):
+        email = f"scored{i}@test.com"
+        job_seekers.delete_job_seeker(email)
+        job_seekers.create_job_seeker("Scored", str(i), email, "Finance", i, "Abcdefgh0")
+        job_listings.update_applicant(job_id, email)
+        emails.append(email)
+    return job_id, emails
+
+
+def test_score_applicants_in_batches(client):
+    job_id, emails = _seed_applicants(5)
+    model = BatchModel()
+    job = job_listings.get_job_listing_by_id(job_id)
+
+    result = score_applicants(AIService(model=model, use_cache=False), job, job_listings.view_applicants(job_id, "Globex"),
+                              batch_size=2)
+    assert result == {"scored": 5, "skipped": 0, "failed": 0} # nosec B101
+    assert len(model.prompts) == 3 # nosec B101
+
+    ranking = ai_scores.get_ranking(job_id)
+    assert [score["email"] for score in ranking] == list(reversed(emails)) # nosec B101
+    assert ranking[0]["score"] == 40 # nosec B101
+
+    # nothing changed: no model call, unless forced
+    assert score_applicants(AIService(model=model, use_cache=False), job, emails)["skipped"] == 5 # nosec B101
+    assert len(model.prompts) == 3 # nosec B101
+    assert score_applicants(AIService(model=model, use_cache=False), job, emails, force=True)["scored"] == 5 # nosec B101
+
+    # a changed profile is scored again
+    job_seekers.update_job_seeker(emails[0], "Scored", "0", emails[0], "Finance", 7)
+    assert score_applicants(AIService(model=model, use_cache=False), job, emails) == { # nosec B101
+        "scored": 1, "skipped": 4, "failed": 0
+    }
+    assert ai_scores.get_ranking(job_id)[0]["email"] == emails[0] # nosec B101
+
+    job_listings.delete_job_listing(job_id, "Globex")
+    assert ai_scores.get_ranking(job_id) == [] # nosec B101
+
+
+def test_score_applicants_failed_batch(client):
+    job_id, emails = _seed_applicants(4)
+    job = job_listings.get_job_listing_by_id(job_id)
+
+    model = BatchModel(fail_on=emails[0])
+    result = score_applicants(AIService(model=model, use_cache=False), job, emails, batch_size=2)
+    assert result == {"scored": 2, "skipped": 0, "failed": 2} # nosec B101
+    assert {score["email"] for score in ai_scores.get_ranking(job_id)} == set(emails[2:]) # nosec B101
+
+
+def test_score_endpoint_company_only(client):
+    job_id, _ = _seed_applicants(1)
+    client.post("/api/job_seekers/signup", json={
+        "first": "Not", "last": "Company", "email": "notcompany@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "notcompany@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    assert client.post(f"/api/job_listings/{job_id}/applicants/scores", headers=headers).status_code == 401 # nosec B101
+    assert client.get(f"/api/job_listings/{job_id}/applicants/scores", headers=headers).status_code == 401 # nosec B101
+
+
+def test_score_endpoint_queues_job(client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "RATE_LIMIT_DB", str(tmp_path / "buckets.sqlite3"))
+    monkeypatch.setattr(job_listings_api, "ai_service", AIService(model=BatchModel(), use_cache=False))
+    job_id, emails = _seed_applicants(3)
+    companies.delete_company("scoring@globex.com")
+    client.post("/api/companies/signup", json={
+        "name": "Globex", "email": "scoring@globex.com", "country": "US", "description": "", "password": "Abcdefgh0"
+    })
+    response = client.post("/api/companies/login", json={"email": "scoring@globex.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    response = client.post(f"/api/job_listings/{job_id}/applicants/scores", headers=headers)
+    assert response.status_code == 202 # nosec B101
+    job_listings_api.ai_job_runner.shutdown()
+
+    response = client.get(response.headers["Location"], headers=headers)
+    assert response.json["status"] == "done" # nosec B101
+    assert response.json["result"] == {"scored": 3, "skipped": 0, "failed": 0} # nosec B101
+    assert len(client.get(f"/api/job_listings/{job_id}/applicants/scores", headers=headers).json) == 3 # nosec B101
+
+    # the scoring run takes from the same AI quota as the suggestions
+    assert client.post(f"/api/job_listings/{job_id}/applicants/scores", headers=headers).status_code == 429 # nosec B101
@@ -0,0 +1,52 @@
+import threading
+from app.db import abtest
+from app.db.batching import BatchWriter
+from app.db.eventlog import JsonLinesLog
+from app.db.db import get_collection
+
+
+def test_items_are_written_in_batches():
+    batches = []
+    writer = BatchWriter(batches.append, batch_size=3, max_latency=5)
+    for i in range(7):
+        assert writer.put(i) # nosec B101
+    writer.drain()
+
+    assert [item for batch in batches for item in batch] == list(range(7)) # nosec B101
+    assert all(len(batch) <= 3 for batch in batches) # nosec B101
+    assert writer.stats()["written"] == 7 # nosec B101
+
+
+def test_full_queue_drops_and_counts():
+    release = threading.Event()
+    writer = BatchWriter(lambda batch: release.wait(5), batch_size=1, max_latency=0.01, max_queue=2)
+    results = [writer.put(i) for i in range(10)]
+    release.set()
+    writer.drain()
+
+    stats = writer.stats()
+    assert results.count(False) == stats["dropped"] > 0 # nosec B101
+    assert stats["enqueued"] + stats["dropped"] == 10 # nosec B101
+    assert stats["written"] == stats["enqueued"] # nosec B101
+
+
+def test_failed_batches_are_counted():
+    def sink(batch):
+        raise RuntimeError("database is down")
+
+    writer = BatchWriter(sink, batch_size=10, max_latency=0.01)
+    writer.put("event")
+    writer.drain()
+    assert writer.stats()["failed"] == 1 # nosec B101
+
+
+def test_ab_test_events_reach_the_database(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(abtest, "event_log", JsonLinesLog(str(tmp_path), "event"))
+    collection = get_collection("ab_test_logs")
+    collection.delete_many({})
+
+    abtest.log_ab_test_event("session-1", "A", "applied to software-engineer")
+    abtest.event_writer.drain()
+
+    assert collection.count_documents({"session_id": "session-1", "variant": "A"}) == 1 # nosec B101
+    assert [entry["session_id"] for entry in abtest.read_ab_test_events()] == ["session-1"] # nosec B101
@@ -0,0 +1,91 @@
+from app.db.cache import TTLCache, current_user_cache
+from app.db import applications, job_listings, job_seekers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    assert cache.get("a") == 1 # nosec B101
+
+    clock.now = 5
+    assert cache.get("a") is None # nosec B101
+    assert cache.stats()["hits"] == 1 # nosec B101
+    assert cache.stats()["misses"] == 1 # nosec B101
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None # nosec B101
+    assert cache.get("a") == 1 # nosec B101
+    assert cache.get("c") == 3 # nosec B101
+    assert cache.stats()["evictions"] == 1 # nosec B101
+
+
+def test_cache_invalidate_tag():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("token-1", "user", tags=("jd@gmail.com",))
+    cache.set("token-2", "user", tags=("jd@gmail.com",))
+    cache.set("token-3", "other", tags=("ab@gmail.com",))
+
+    cache.invalidate_tag("jd@gmail.com")
+    assert cache.get("token-1") is None # nosec B101
+    assert cache.get("token-2") is None # nosec B101
+    assert cache.get("token-3") == "other" # nosec B101
+
+
+def test_current_user_cached_until_update(client):
+    current_user_cache.clear()
+    client.post("/api/job_seekers/signup", json={
+        "first": "Cached",
+        "last": "Seeker",
+        "email": "cached@test.com",
+        "expertise": "CS",
+        "years": 2,
+        "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "cached@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    client.get("/api/job_seekers/find", headers=headers)
+    hits = current_user_cache.stats()["hits"]
+    response = client.get("/api/job_seekers/find", headers=headers)
+    assert response.json["message"] == "Hello Cached" # nosec B101
+    assert current_user_cache.stats()["hits"] == hits + 1 # nosec B101
+
+    client.put("/api/job_seekers/cached@test.com", json={
+        "first": "Renamed",
+        "last": "Seeker",
+        "email": "cached@test.com",
+        "expertise": "CS",
+        "years": 3
+    })
+    response = client.get("/api/job_seekers/find", headers=headers)
+    assert response.json["message"] == "Hello Renamed" # nosec B101
+
+
+def test_deleted_account_cannot_apply(client):
+    client.post("/api/job_seekers/signup", json={
+        "first": "Deleted", "last": "Seeker", "email": "deleted@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "deleted@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    job_id = str(job_listings.create_job_listing("Tester", "Initech", "Austin", "Software", "1"))
+
+    job_seekers.delete_job_seeker("deleted@test.com")
+    response = client.put(f"/api/job_listings/apply/{job_id}", headers=headers)
+    assert response.status_code == 401 # nosec B101
+    assert applications.find_application(job_id, "deleted@test.com") is None # nosec B101
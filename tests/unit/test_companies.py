@@ -169,3 +169,12 @@ def test_invalid_email(client):
 
 
 
+
+
+def test_get_company_email_is_exact(client):
+    response = client.get("/api/companies/App@Apple.com")
+    assert response.status_code == 200 # nosec B101
+    assert response.json["name"] == "Apple" # nosec B101
+
+    response = client.get("/api/companies/pp@apple.com")
+    assert response.status_code == 404 # nosec B101
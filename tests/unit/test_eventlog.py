@@ -0,0 +1,66 @@
+import json
+from app.db import eventlog
+from app.db.eventlog import JsonLinesLog
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_are_buffered_until_flush(tmp_path):
+    clock = FakeClock()
+    log = JsonLinesLog(str(tmp_path), "event", buffer_size=3, flush_interval=10, clock=clock)
+    log.append({"event_type": "a"})
+    log.append({"event_type": "b"})
+    assert log.segments() == [] # nosec B101
+
+    log.append({"event_type": "c"})
+    assert len(log.segments()) == 1 # nosec B101
+
+    log.append({"event_type": "d"})
+    clock.now = 10
+    log.append({"event_type": "e"})  # the buffer is older than flush_interval
+    with open(log.segments()[0]) as f:
+        assert [json.loads(line)["event_type"] for line in f] == ["a", "b", "c", "d", "e"] # nosec B101
+
+
+def test_segments_rotate_by_size(tmp_path):
+    log = JsonLinesLog(str(tmp_path), "event", max_bytes=50, buffer_size=1)
+    for i in range(5):
+        log.append({"event_type": f"applied to job {i}"})
+
+    assert len(log.segments()) == 5 # nosec B101
+    assert [entry["event_type"] for entry in log.read()] == [f"applied to job {i}" for i in range(5)] # nosec B101
+
+
+def test_read_merges_segments_and_legacy_file(tmp_path):
+    with open(tmp_path / "survey.json", "w") as f:
+        json.dump([{"session_id": "old"}], f, indent=2)
+    with open(tmp_path / "survey.111.0.jsonl", "w") as f:
+        f.write('{"session_id": "w1-a", "timestamp": "2025-01-01T00:00:01"}\n')
+        f.write('{"session_id": "w1-b", "timestamp": "2025-01-01T00:00:03"}\n')
+        f.write('{"session_id": "cut sh')  # interrupted write
+    with open(tmp_path / "survey.222.0.jsonl", "w") as f:
+        f.write('{"session_id": "w2-a", "timestamp": "2025-01-01T00:00:02"}\n')
+
+    log = JsonLinesLog(str(tmp_path), "survey")
+    log.append({"session_id": "new"})
+    assert [entry["session_id"] for entry in log.read()] == ["old", "w1-a", "w2-a", "w1-b", "new"] # nosec B101
+
+
+def test_idle_buffer_flushed_in_background(tmp_path):
+    clock = FakeClock()
+    log = JsonLinesLog(str(tmp_path), "event", buffer_size=10, flush_interval=5, clock=clock)
+    log.append({"event_type": "a"})
+    assert eventlog._flusher.is_alive() # nosec B101
+
+    # no further append, the flusher thread writes the buffer once it is old enough
+    eventlog.flush_due()
+    assert log.segments() == [] # nosec B101
+    clock.now = 5
+    eventlog.flush_due()
+    assert len(log.segments()) == 1 # nosec B101
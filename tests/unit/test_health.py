@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+from app.db import db
+from app.db.db import DatabaseClient, client_options
+from app.db.instrumentation import PoolStatsListener
+
+
+def test_client_options_from_config():
+    options = client_options({
+        "MONGO_MAX_POOL_SIZE": 50,
+        "MONGO_WAIT_QUEUE_TIMEOUT_MS": 2000,
+        "MONGO_READ_PREFERENCE": "secondaryPreferred",
+        "MONGO_WRITE_CONCERN": "1",
+        "MONGO_COMPRESSORS": None,
+        "MONGO_SOCKET_TIMEOUT_MS": "",
+    })
+    assert options == { # nosec B101
+        "maxPoolSize": 50, "waitQueueTimeoutMS": 2000, "readPreference": "secondaryPreferred", "w": 1
+    }
+    assert client_options({"MONGO_WRITE_CONCERN": "majority"}) == {"w": "majority"} # nosec B101
+
+
+def test_client_created_per_process(monkeypatch):
+    client = DatabaseClient("mongodb://localhost:27017", "job_board_test", None, None, None, {"maxPoolSize": 5})
+    first = client.client
+    assert client.client is first # nosec B101
+
+    # a forked worker gets its own client and statistics
+    monkeypatch.setattr(db.os, "getpid", lambda: -1)
+    assert client.client is not first # nosec B101
+
+
+def test_pool_stats_listener():
+    listener = PoolStatsListener()
+    listener.connection_created(SimpleNamespace())
+    listener.connection_checked_out(SimpleNamespace(duration=0.002))
+    listener.connection_checked_out(SimpleNamespace(duration=0.004))
+    listener.connection_checked_in(SimpleNamespace())
+    listener.connection_check_out_failed(SimpleNamespace(duration=0.006))
+
+    stats = listener.stats()
+    assert stats["open"] == 1 and stats["checked_out"] == 1 and stats["max_checked_out"] == 2 # nosec B101
+    assert stats["checkouts"] == 2 and stats["checkout_failures"] == 1 # nosec B101
+    assert stats["wait_avg_ms"] == 4 and stats["wait_max_ms"] == 6 # nosec B101
+
+
+def test_health_endpoints(client):
+    response = client.get("/api/health/")
+    assert response.status_code == 200 and response.json["status"] == "ok" # nosec B101
+
+    assert client.get("/api/health/stats").status_code == 401 # nosec B101
+    client.post("/api/job_seekers/signup", json={
+        "first": "Health", "last": "Check", "email": "health@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "health@test.com", "password": "Abcdefgh0"})
+    response = client.get("/api/health/stats", headers={"Authorization": f"Bearer {response.json['access_token']}"})
+    assert response.status_code == 200 # nosec B101
+    assert set(response.json) == {"pid", "db_pool", "password_hashing", "user_cache", "ab_test_events", "queries"} # nosec B101
+    assert {"hits", "misses", "size"} <= set(response.json["user_cache"]) # nosec B101
+    assert {"queued", "written", "dropped", "failed"} <= set(response.json["ab_test_events"]) # nosec B101
+    assert "checked_out" in response.json["db_pool"] # nosec B101
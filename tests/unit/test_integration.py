@@ -740,3 +740,34 @@ def test_authentication(client):
     # 10. Access job_seeker inquiry endpoint with authentication
     response = client.get("/api/job_seekers/inquire", headers={"Authorization": f"Bearer {job_seeker_token}"})
     assert response.status_code == 200 # nosec B101
+
+
+def test_token_role_claims(client, app):
+    """
+    Tokens carry the role and user id, and the user is loaded by that id.
+    """
+    from flask_jwt_extended import decode_token
+
+    company_token = register_new_company(client)
+    job_seeker_email, job_seeker_token = register_new_job_seeker(client)
+
+    with app.app_context():
+        company_claims = decode_token(company_token)
+        job_seeker_claims = decode_token(job_seeker_token)
+    assert company_claims["role"] == "company" # nosec B101
+    assert job_seeker_claims["role"] == "seeker" # nosec B101
+    assert job_seeker_claims["sub"] == job_seeker_email # nosec B101
+    assert ObjectId.is_valid(job_seeker_claims["uid"]) # nosec B101
+
+    response = client.get("/api/companies/find", headers={"Authorization": f"Bearer {company_token}"})
+    assert response.status_code == 200 # nosec B101
+    assert response.json["message"] == "Logged in as test company" # nosec B101
+
+    # the role claim alone decides which endpoints a token may use
+    response = client.get("/api/companies/find", headers={"Authorization": f"Bearer {job_seeker_token}"})
+    assert response.status_code == 401 # nosec B101
+
+    # a token whose user is gone is rejected once the user is needed
+    client.delete("/api/companies/first_company@nyu.edu")
+    response = client.get("/api/companies/find", headers={"Authorization": f"Bearer {company_token}"})
+    assert response.status_code == 401 # nosec B101
@@ -0,0 +1,212 @@
+import json
+import pytest
+import app.apis.job_listings as job_listings_api
+from app.db import job_listings, job_seekers, applications, companies
+from pymongo.errors import PyMongoError
+from app.db.db import get_collection
+from app.db.constants import JOB_LISTING_COLLECTION, APPLICATION_COLLECTION
+
+
+@pytest.fixture(scope='function')
+def seeded_job_listings_db():
+    collection = get_collection(JOB_LISTING_COLLECTION)
+    collection.delete_many({})  # Clear existing data
+    get_collection(APPLICATION_COLLECTION).delete_many({})
+    job_listings.invalidate_text_index()
+    job_listings.create_job_listing("Software Engineer", "Acme", "New York", "Tech", "Mid-Level")
+    job_listings.create_job_listing("Senior Software Engineer", "Acme Labs", "Boston", "Tech", "Senior-Level")
+    job_listings.create_job_listing("Data Analyst", "Globex", "New York", "Finance", "Entry-Level")
+    yield
+    collection.delete_many({})
+    job_listings.invalidate_text_index()
+
+
+def test_job_listing_indexes_created(client):
+    index_keys = [list(index["key"].items()) for index in get_collection(JOB_LISTING_COLLECTION).list_indexes()]
+    for keys in job_listings.JOB_LISTING_INDEXES:
+        assert [(field, direction) for field, direction in keys] in index_keys # nosec B101
+
+
+def test_search_prefix_is_default(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"title": "software"})
+    assert response.status_code == 200 # nosec B101
+    assert [job["title"] for job in response.json] == ["software-engineer"] # nosec B101
+
+    response = client.get("/api/job_listings/", query_string={"company": "Acme"})
+    assert response.status_code == 200 # nosec B101
+    assert len(response.json) == 2 # nosec B101
+
+
+def test_search_exact_match(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"company": "Acme", "match": "exact"})
+    assert response.status_code == 200 # nosec B101
+    assert [job["company"] for job in response.json] == ["acme"] # nosec B101
+
+
+def test_search_regex_match(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"title": "engineer", "match": "regex"})
+    assert response.status_code == 200 # nosec B101
+    assert len(response.json) == 2 # nosec B101
+
+    # the same filter is not a prefix of any title
+    response = client.get("/api/job_listings/", query_string={"title": "engineer"})
+    assert response.status_code == 404 # nosec B101
+
+
+def test_search_invalid_match(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"title": "engineer", "match": "fuzzy"})
+    assert response.status_code == 400 # nosec B101
+
+
+def test_search_paginated(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"limit": 2})
+    assert response.status_code == 200 # nosec B101
+    first_page = response.json
+    assert len(first_page) == 2 # nosec B101
+    assert "applicants" not in first_page[0] # nosec B101
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/job_listings/", query_string={"limit": 2, "after": cursor})
+    assert response.status_code == 200 # nosec B101
+    second_page = response.json
+    assert len(second_page) == 1 # nosec B101
+    assert "X-Next-Cursor" not in response.headers # nosec B101
+    assert second_page[0]["_id"] not in [job["_id"] for job in first_page] # nosec B101
+
+
+def test_search_default_page_size(client, seeded_job_listings_db, monkeypatch):
+    monkeypatch.setattr(job_listings_api, "DEFAULT_PAGE_SIZE", 2)
+    response = client.get("/api/job_listings/")
+    assert len(response.json) == 2 # nosec B101
+    response = client.get("/api/job_listings/", query_string={"after": response.headers["X-Next-Cursor"]})
+    assert len(response.json) == 1 # nosec B101
+
+
+def test_search_invalid_pagination(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"limit": 0})
+    assert response.status_code == 400 # nosec B101
+
+    response = client.get("/api/job_listings/", query_string={"after": "not-a-cursor"})
+    assert response.status_code == 400 # nosec B101
+
+
+def test_search_streamed(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"format": "ndjson", "limit": 2})
+    assert response.status_code == 200 # nosec B101
+    assert response.mimetype == "application/x-ndjson" # nosec B101
+
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert len(lines) == 3 # nosec B101
+    assert "title" in lines[0] # nosec B101
+    assert "next" in lines[-1] # nosec B101
+
+
+def test_text_search_ranked(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"q": "software engineer boston"})
+    assert response.status_code == 200 # nosec B101
+    results = response.json
+    assert [job["title"] for job in results] == ["senior-software-engineer", "software-engineer"] # nosec B101
+    assert results[0]["score"] > results[1]["score"] # nosec B101
+
+    response = client.get("/api/job_listings/", query_string={"q": "finance", "limit": 1})
+    assert [job["title"] for job in response.json] == ["data-analyst"] # nosec B101
+
+
+def test_text_search_follows_writes(client, seeded_job_listings_db):
+    response = client.get("/api/job_listings/", query_string={"q": "designer"})
+    assert response.status_code == 404 # nosec B101
+
+    job_listings.create_job_listing("Product Designer", "Acme", "Remote", "Design", "Mid-Level")
+    response = client.get("/api/job_listings/", query_string={"q": "designer"})
+    assert response.status_code == 200 # nosec B101
+    assert [job["title"] for job in response.json] == ["product-designer"] # nosec B101
+
+
+def test_delete_company_listings_cascades(client, seeded_job_listings_db):
+    acme = [job["_id"] for job in job_listings.search_job_with_filters(company="Acme", match=job_listings.MATCH_EXACT)]
+    globex = [job["_id"] for job in job_listings.search_job_with_filters(company="Globex")]
+    job_listings.update_applicant(acme[0], "jd@gmail.com")
+    job_listings.update_applicant(globex[0], "jd@gmail.com")
+    job_listings.update_applicant(acme[0], "ab@gmail.com")
+    job_listings.select_applicant(acme[0], "Acme", "ab@gmail.com", "accept")
+
+    result = job_listings.delete_company_job_listings("Acme")
+    assert result.deleted_count == 1 # nosec B101
+    assert job_listings.search_job_with_id(acme[0]) is None # nosec B101
+    assert job_listings.search_job_with_id(globex[0]) is not None # nosec B101
+
+    assert applications.get_seeker_applications("jd@gmail.com") == {globex[0]: "applied"} # nosec B101
+    assert applications.get_seeker_applications("ab@gmail.com") == {} # nosec B101
+
+    job_seekers.delete_job_seeker("jd@gmail.com")
+    assert job_listings.get_job_listing_by_id(globex[0])["applicants"] == [] # nosec B101
+
+
+def test_company_delete_notifies_after_commit(client, seeded_job_listings_db, monkeypatch):
+    changed = []
+    monkeypatch.setattr(job_listings, "_listing_listeners", [lambda id, listing: changed.append(id)])
+    companies.create_company("Acme", "deleted@acme.com", "US", "", "Abcdefgh0")
+
+    def aborted(callback):
+        callback(None)
+        raise PyMongoError("transaction aborted")
+
+    # the transaction did not commit, the in-process indexes must keep the listings
+    monkeypatch.setattr(companies, "run_in_transaction", aborted)
+    with pytest.raises(PyMongoError):
+        companies.delete_company("deleted@acme.com")
+    assert changed == [] # nosec B101
+
+    # mongomock does not roll back, put the company and its listing back
+    companies.create_company("Acme", "deleted@acme.com", "US", "", "Abcdefgh0")
+    job_listings.create_job_listing("Software Engineer", "Acme", "New York", "Tech", "Mid-Level")
+    changed.clear()
+    monkeypatch.setattr(companies, "run_in_transaction", lambda callback: callback(None))
+    companies.delete_company("deleted@acme.com")
+    assert len(changed) == 1 # nosec B101
+
+
+def test_applicant_transitions_are_conditional(client, seeded_job_listings_db):
+    job_id = job_listings.search_job_with_filters(company="Globex")[0]["_id"]
+    assert job_listings.update_applicant(job_id, "JD@gmail.com") # nosec B101
+    assert job_listings.update_applicant(job_id, "jd@gmail.com") == "applied" # nosec B101
+
+    assert job_listings.select_applicant(job_id, "Acme", "jd@gmail.com", "accept") == "Not allowed" # nosec B101
+    assert job_listings.select_applicant(job_id, "Globex", "ab@gmail.com", "accept") == "Not applied" # nosec B101
+    assert job_listings.select_applicant(job_id, "Globex", "jd@gmail.com", "accept") # nosec B101
+    assert job_listings.select_applicant(job_id, "Globex", "jd@gmail.com", "accept") == "selected" # nosec B101
+    assert job_listings.update_applicant(job_id, "jd@gmail.com") == "applied" # nosec B101
+
+    listing = job_listings.get_job_listing_by_id(job_id)
+    assert listing["applicants"] == [] and listing["selected"] == ["jd@gmail.com"] # nosec B101
+    assert applications.get_seeker_applications("jd@gmail.com") == {job_id: "accepted"} # nosec B101
+
+
+def test_applications_follow_seeker_email_change(client, seeded_job_listings_db):
+    job_id = job_listings.search_job_with_filters(company="Globex")[0]["_id"]
+    job_listings.update_applicant(job_id, "jd@gmail.com")
+
+    job_seekers.update_job_seeker("jd@gmail.com", "John", "Doe", "john.doe@gmail.com", "Programming", 12)
+    assert job_listings.view_applicants(job_id, "Globex") == ["john.doe@gmail.com"] # nosec B101
+    assert job_seekers.inquire_status("jd@gmail.com") == {} # nosec B101
+    assert job_seekers.inquire_status("john.doe@gmail.com")[job_id][0] == "waiting" # nosec B101
+
+
+def test_migrate_applications(client, seeded_job_listings_db):
+    from app.db import migrations
+    acme, globex = (job_listings.search_job_with_filters(company=name, match=job_listings.MATCH_EXACT)[0]["_id"]
+                    for name in ("Acme", "Globex"))
+    listings = get_collection(JOB_LISTING_COLLECTION)
+    listings.update_one({"company": "acme"}, {"$set": {"applicants": ["JD@gmail.com"], "selected": ["ab@gmail.com"], "rejected": []}})
+    get_collection("job_seekers").update_one({"email": "jap@gmail.com"}, {"$set": {
+        "applied": [globex, "650f78cda5b3b9cfa92d3b6e"],
+    }})
+
+    report = migrations.migrate_applications()
+    assert report == {"applications": 3, "skipped": 1} # nosec B101
+    assert job_listings.get_job_listing_by_id(acme)["selected"] == ["ab@gmail.com"] # nosec B101
+    assert applications.get_seeker_applications("jd@gmail.com") == {acme: "applied"} # nosec B101
+    assert applications.get_seeker_applications("jap@gmail.com") == {globex: "applied"} # nosec B101
+    assert "applicants" not in listings.find_one({"company": "acme"}) # nosec B101
+
+    assert migrations.migrate_applications() == {"applications": 0, "skipped": 0} # nosec B101
@@ -1,6 +1,7 @@
 from tests.unit.utils import assert_items_equal
 from app.db.utils import is_valid_email
 import unittest
+from app.db.db import get_collection
 
 def test_list_seekers_count(client, job_seekers):
     """
@@ -206,3 +207,41 @@ def test_invalid_email(client):
     assert response.status_code == 400 # nosec B101
     assert response.json ==  "Password must be at least 8 characters long, include an uppercase letter, a lowercase letter, and a number" # nosec B101
 
+
+def test_get_seeker_email_is_exact(client):
+    # mixed case and surrounding spaces still find the seeker
+    response = client.get("/api/job_seekers/JD@Gmail.com")
+    assert response.status_code == 200 # nosec B101
+    assert response.json["email"] == "jd@gmail.com" # nosec B101
+
+    # a suffix of an existing email is a different user
+    response = client.get("/api/job_seekers/d@gmail.com")
+    assert response.status_code == 404 # nosec B101
+
+def test_normalize_emails_command(runner):
+    collection = get_collection("job_seekers")
+    collection.insert_one({"first": "Mixed", "last": "Case", "email": "Mixed.Case@Gmail.com"})
+    collection.insert_one({"first": "John", "last": "Duplicate", "email": "JD@gmail.com"})
+
+    result = runner.invoke(args=["normalize-emails"])
+    assert "job_seekers: 1 updated, 1 conflicts" in result.output # nosec B101
+    assert collection.find_one({"email": "mixed.case@gmail.com"})["first"] == "Mixed" # nosec B101
+    assert collection.find_one({"email": "JD@gmail.com"}) is not None # nosec B101
+
+def test_inquire_status_skips_dangling_ids(client):
+    from app.db import job_seekers, job_listings, applications
+    get_collection("applications").delete_many({"seeker_email": "jd@gmail.com"})
+    accepted_id = str(job_listings.create_job_listing("Software Engineer", "Acme", "New York", "Tech", "Mid-Level"))
+    waiting_id = str(job_listings.create_job_listing("Data Analyst", "Globex", "Boston", "Finance", "Entry-Level"))
+    deleted_id = "650f78cda5b3b9cfa92d3b6e"
+
+    for id in (accepted_id, waiting_id, deleted_id):
+        applications.create_application(id, "jd@gmail.com")
+    applications.change_status(accepted_id, "jd@gmail.com", "accepted")
+
+    status = job_seekers.inquire_status("jd@gmail.com")
+    assert status == { # nosec B101
+        accepted_id: ("accepted", ("software-engineer", "acme", "new-york", "tech", "mid-level")),
+        waiting_id: ("waiting", ("data-analyst", "globex", "boston", "finance", "entry-level")),
+    }
+    assert job_seekers.inquire_status("nobody@gmail.com") == {} # nosec B101
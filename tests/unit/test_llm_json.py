@@ -0,0 +1,92 @@
+import json
+import pytest
+from app.apis.llm import AIService
+from app.apis.llm_json import (LLMResponseError, StreamingFieldReader, parse_json, parse_suggestions,
+                               parse_candidate_scores, repair_json)
+import app.apis.job_seekers as job_seekers_api
+
+ANSWER = {"matchScore": 80, "analysis": "A \"strong\" match\nfor the role", "suggestions": ["a"], "strengths": ["b"]}
+
+
+def test_parse_fenced_json():
+    text = "Here you go:\n```json\n" + json.dumps(ANSWER) + "\n```\nGood luck!"
+    assert parse_suggestions(text) == dict(ANSWER, matchScore=80.0) # nosec B101
+    assert parse_json('{"remote": true, "visa": null}') == {"remote": True, "visa": None} # nosec B101
+
+
+def test_strict_parsing_rejects_bad_json():
+    with pytest.raises(LLMResponseError):
+        parse_json("{'matchScore': 80}")
+    with pytest.raises(LLMResponseError):
+        parse_json("no json here", repair=True)
+    # the old eval() would have run this
+    with pytest.raises(LLMResponseError):
+        parse_json("__import__('os').getcwd()", repair=True)
+
+
+def test_repair_mode():
+    assert parse_json('{"ok": True, "items": ["a", "b",],}', repair=True) == {"ok": True, "items": ["a", "b"]} # nosec B101
+    # cut off in the middle of the answer
+    truncated = '```json\n{"matchScore": 70, "analysis": "Good fit", "suggestions": ["Learn SQL", "Add'
+    assert parse_json(truncated, repair=True) == { # nosec B101
+        "matchScore": 70, "analysis": "Good fit", "suggestions": ["Learn SQL", "Add"]
+    }
+    assert repair_json('{"a": "True story"') == '{"a": "True story"}' # nosec B101
+
+
+def test_schema_validation():
+    with pytest.raises(LLMResponseError, match="strengths"):
+        parse_suggestions('{"matchScore": 80, "analysis": "ok", "suggestions": []}')
+    with pytest.raises(LLMResponseError, match="matchScore"):
+        parse_suggestions('{"matchScore": "high", "analysis": "ok", "suggestions": [], "strengths": []}')
+
+    parsed = parse_suggestions('{"matchScore": "85%", "analysis": "ok", "suggestions": "one tip", "strengths": [], "extra": 1}')
+    assert parsed == {"matchScore": 85.0, "analysis": "ok", "suggestions": ["one tip"], "strengths": []} # nosec B101
+
+    scores = parse_candidate_scores('[{"email": "a@b.com", "matchScore": 120, "analysis": "x"}, {"email": "c@d.com"}]')
+    assert scores == [{"email": "a@b.com", "matchScore": 100.0, "analysis": "x"}] # nosec B101
+
+
+def test_streaming_field_reader():
+    text = json.dumps(ANSWER)
+    reader = StreamingFieldReader("analysis")
+    decoded = "".join(reader.feed(text[i:i + 3]) for i in range(0, len(text), 3))
+    assert decoded == ANSWER["analysis"] # nosec B101
+    assert reader.done and reader.buffer == text # nosec B101
+
+
+class StreamingModel:
+    def generate_content(self, prompt, stream=False):
+        text = "```json\n" + json.dumps(ANSWER) + "\n```"
+        if not stream:
+            return type("Response", (), {"text": text})()
+        return [type("Chunk", (), {"text": text[i:i + 5]})() for i in range(0, len(text), 5)]
+
+
+def test_stream_suggestions():
+    events = list(AIService(model=StreamingModel(), use_cache=False).stream_suggestions(
+        {"title": "t", "company": "c", "location": "l", "industry": "i", "seniority": 1},
+        {"first": "f", "last": "l", "email": "stream@test.com", "expertise": "e", "years": 1}))
+    assert len(events) > 2 # nosec B101
+    assert "".join(event.get("analysis", "") for event in events) == ANSWER["analysis"] # nosec B101
+    assert events[-1] == {"result": dict(ANSWER, matchScore=80.0)} # nosec B101
+
+
+def test_stream_endpoint(client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "RATE_LIMIT_DB", str(tmp_path / "buckets.sqlite3"))
+    monkeypatch.setattr(job_seekers_api, "ai_service", AIService(model=StreamingModel(), use_cache=False))
+    client.post("/api/job_seekers/signup", json={
+        "first": "Stream", "last": "Reader", "email": "streamed@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "streamed@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    body = {
+        "job": {"title": "software-engineer", "company": "acme", "location": "new-york", "industry": "tech", "seniority": 3},
+        "applicant": {"first": "Stream", "last": "Reader", "email": "streamed@test.com", "expertise": "CS", "years": 2},
+    }
+
+    response = client.post("/api/job_seekers/ai/suggestions/stream", json=body, headers=headers)
+    assert response.status_code == 200 # nosec B101
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert "".join(line.get("analysis", "") for line in lines) == ANSWER["analysis"] # nosec B101
+    assert lines[-1]["result"]["score"] == 80 and lines[-1]["result"]["tips"] == ["a"] # nosec B101
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+from app.db import login_throttle, passwords
+from app.db.db import get_collection
+
+
+def _login(client, email, password, ip="10.0.0.1"):
+    return client.post("/api/job_seekers/login", json={"email": email, "password": password},
+                       environ_base={"REMOTE_ADDR": ip})
+
+
+def test_lockout_skips_password_check(client, monkeypatch):
+    get_collection(login_throttle.LOGIN_ATTEMPT_COLLECTION).delete_many({})
+    now = [datetime.now(timezone.utc)]  # not in the past, the TTL index would drop the counters
+    monkeypatch.setattr(login_throttle, "_now", lambda: now[0])
+    client.post("/api/job_seekers/signup", json={
+        "first": "Locked", "last": "Out", "email": "lockedout@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+
+    for _ in range(login_throttle.MAX_EMAIL_FAILURES):
+        assert _login(client, "lockedout@test.com", "wrong").status_code == 401 # nosec B101
+
+    verifications = passwords.hasher.stats()["verify"]["count"]
+    response = _login(client, "LockedOut@test.com", "Abcdefgh0")
+    assert response.status_code == 429 # nosec B101
+    assert response.headers["Retry-After"] == str(login_throttle.BASE_LOCKOUT) # nosec B101
+    assert passwords.hasher.stats()["verify"]["count"] == verifications # nosec B101
+
+    # the lockout doubles the next time
+    now[0] += timedelta(seconds=login_throttle.BASE_LOCKOUT)
+    for _ in range(login_throttle.MAX_EMAIL_FAILURES):
+        _login(client, "lockedout@test.com", "wrong")
+    assert _login(client, "lockedout@test.com", "Abcdefgh0").headers["Retry-After"] == str(2 * login_throttle.BASE_LOCKOUT) # nosec B101
+
+    now[0] += timedelta(seconds=2 * login_throttle.BASE_LOCKOUT)
+    assert _login(client, "lockedout@test.com", "Abcdefgh0").status_code == 200 # nosec B101
+    assert login_throttle.retry_after("seeker", "lockedout@test.com") == 0 # nosec B101
+
+
+def test_failures_outside_window_and_per_ip(client, monkeypatch):
+    get_collection(login_throttle.LOGIN_ATTEMPT_COLLECTION).delete_many({})
+    now = [datetime.now(timezone.utc)]  # not in the past, the TTL index would drop the counters
+    monkeypatch.setattr(login_throttle, "_now", lambda: now[0])
+
+    # spread out failures never lock the account
+    for _ in range(2 * login_throttle.MAX_EMAIL_FAILURES):
+        login_throttle.record_failure("seeker", "slow@test.com")
+        now[0] += timedelta(seconds=login_throttle.WINDOW)
+    assert login_throttle.retry_after("seeker", "slow@test.com") == 0 # nosec B101
+
+    # one address trying many accounts
+    for i in range(login_throttle.MAX_IP_FAILURES):
+        login_throttle.record_failure("seeker", f"user{i}@test.com", "10.0.0.2")
+    assert login_throttle.retry_after("company", "other@test.com", "10.0.0.2") > 0 # nosec B101
+    assert login_throttle.retry_after("company", "other@test.com", "10.0.0.3") == 0 # nosec B101
+
+
+def test_client_address_behind_proxy(client, monkeypatch):
+    get_collection(login_throttle.LOGIN_ATTEMPT_COLLECTION).delete_many({})
+    now = [datetime.now(timezone.utc)]
+    monkeypatch.setattr(login_throttle, "_now", lambda: now[0])
+
+    # both clients reach the app through nginx, only X-Forwarded-For tells them apart
+    def login(email, client_ip):
+        return client.post("/api/job_seekers/login", json={"email": email, "password": "wrong"},
+                           environ_base={"REMOTE_ADDR": "172.18.0.5"},
+                           headers={"X-Forwarded-For": f"{client_ip}"})
+
+    for i in range(login_throttle.MAX_IP_FAILURES):
+        login(f"guess{i}@test.com", "203.0.113.7")
+    assert login("someone@test.com", "203.0.113.7").status_code == 429 # nosec B101
+    assert login("someone@test.com", "198.51.100.4").status_code == 401 # nosec B101
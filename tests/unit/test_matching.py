@@ -0,0 +1,146 @@
+from app.apis.llm import AIService
+from app.apis.matching import MatchEngine, RecommendationIndex, required_years
+from app.db import job_listings
+from app.db.db import get_collection
+from app.db.constants import JOB_LISTING_COLLECTION
+import app.apis.job_seekers as job_seekers_api
+
+LISTINGS = [
+    {"title": "software-engineer", "industry": "tech"},
+    {"title": "senior-software-engineer", "industry": "tech"},
+    {"title": "data-analyst", "industry": "finance"},
+]
+JOB = {"title": "data-analyst", "company": "globex", "location": "boston", "industry": "finance", "seniority": 4}
+
+
+def test_required_years():
+    assert required_years(3) == 3 # nosec B101
+    assert required_years("5-years") == 5 # nosec B101
+    assert required_years("mid-level") == 3 # nosec B101
+    assert required_years("anything") == 0 # nosec B101
+
+
+def test_match_score():
+    engine = MatchEngine(lambda: LISTINGS)
+    analyst = {"expertise": "Finance data", "years": 4}
+    engineer = {"expertise": "Software engineer", "years": 4}
+
+    assert engine.score(JOB, analyst)["matchScore"] > engine.score(JOB, engineer)["matchScore"] # nosec B101
+    assert engine.score(JOB, engineer)["skills"] == 0 # nosec B101
+    assert engine.score(JOB, dict(analyst, years=2))["experience"] == 0.5 # nosec B101
+    assert engine.score(JOB, analyst) == engine.score(JOB, analyst) # nosec B101
+
+    perfect = engine.score({"title": "data", "industry": "", "seniority": 0}, {"expertise": "data", "years": 0})
+    assert perfect["matchScore"] == 100 # nosec B101
+
+
+def test_idf_weights_refreshed(client):
+    listings = list(LISTINGS)
+    now = [0]
+    engine = MatchEngine(lambda: listings, max_age=10, clock=lambda: now[0])
+    before = engine.skills_similarity(JOB, {"expertise": "finance"})
+
+    # finance becomes common, it says less about a match once the weights are recomputed
+    listings.extend({"title": "accountant", "industry": "finance"} for _ in range(20))
+    assert engine.skills_similarity(JOB, {"expertise": "finance"}) == before # nosec B101
+    # recomputed in the background
+    now[0] = 10
+    engine.skills_similarity(JOB, {"expertise": "finance"})
+    engine._rebuild_thread.join()
+    assert engine.skills_similarity(JOB, {"expertise": "finance"}) < before # nosec B101
+
+
+def test_local_score_replaces_model_score():
+    class StubModel:
+        def generate_content(self, prompt):
+            return type("Response", (), {"text": '{"matchScore": 12, "analysis": "ok", "suggestions": [], "strengths": []}'})()
+
+    engine = MatchEngine(lambda: LISTINGS)
+    applicant = {"first": "Alice", "last": "Bob", "email": "ab@gmail.com", "expertise": "Finance", "years": 9}
+    suggestions = AIService(model=StubModel(), use_cache=False, scorer=engine).generate_suggestions(JOB, applicant)
+    assert suggestions["matchScore"] == engine.score(JOB, applicant)["matchScore"] # nosec B101
+    assert suggestions["analysis"] == "ok" # nosec B101
+
+
+def test_instant_score_skips_model(client, monkeypatch):
+    def fail(job, applicant):
+        raise AssertionError("the model must not be called")
+
+    monkeypatch.setattr(job_seekers_api.ai_service, "generate_suggestions", fail)
+    monkeypatch.setattr(job_seekers_api, "match_engine", MatchEngine(lambda: LISTINGS))
+    client.post("/api/job_seekers/signup", json={
+        "first": "Instant", "last": "Score", "email": "instant@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "instant@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    body = {"job": JOB, "applicant": {"first": "Instant", "last": "Score", "email": "instant@test.com", "expertise": "Finance", "years": 2}}
+
+    response = client.post("/api/job_seekers/ai/suggestions?narrative=false", json=body, headers=headers)
+    assert response.status_code == 200 # nosec B101
+    assert response.json["score"] == job_seekers_api.match_engine.score(JOB, body["applicant"])["matchScore"] # nosec B101
+    assert response.json["tips"] == [] # nosec B101
+
+
+def test_recommendations_follow_listing_writes():
+    listings = [dict(listing, _id=str(i), location="boston", seniority="mid-level") for i, listing in enumerate(LISTINGS)]
+    index = RecommendationIndex(lambda: listings)
+    profile = {"expertise": "Software engineer", "years": 3}
+
+    assert [id for id, _ in index.recommend(profile)] == ["0", "1"] # nosec B101
+    assert index.recommend({"expertise": "Cooking", "years": 3}) == [] # nosec B101
+
+    index.on_listing_change("3", {"title": "software-engineer", "industry": "tech", "location": "austin", "seniority": "mid-level"})
+    assert [id for id, _ in index.recommend(profile, k=1, location="austin")] == ["3"] # nosec B101
+    # not enough experience for the senior role
+    index.on_listing_change("3", {"title": "software-engineer", "industry": "tech", "location": "austin", "seniority": "senior"})
+    assert index.recommend(profile)[-1][0] == "3" # nosec B101
+
+    index.on_listing_change("0", {"title": "nurse", "industry": "health", "location": "boston", "seniority": "1"})
+    index.on_listing_change("1")
+    index.on_listing_change("3")
+    assert index.recommend(profile) == [] # nosec B101
+    assert len(index) == 2 # nosec B101
+    assert [id for id, _ in index.recommend({"expertise": "nursing health", "years": 1})] == ["0"] # nosec B101
+
+
+def test_recommendations_rebuilt_in_background():
+    listings = [dict(listing, _id=str(i), location="boston", seniority="0") for i, listing in enumerate(LISTINGS)]
+    now = [0]
+    def load_listings():
+        if now[0]:
+            # written while the rebuild reads the collection, without waiting for it
+            index.on_listing_change("9", {"title": "software-engineer", "industry": "tech", "location": "boston", "seniority": "0"})
+        return list(listings)
+
+    index = RecommendationIndex(load_listings, max_age=10, clock=lambda: now[0])
+    profile = {"expertise": "Software engineer", "years": 3}
+    assert len(index.recommend(profile)) == 2 # nosec B101
+
+    listings.pop(0)
+    now[0] = 10
+    index.recommend(profile)
+    index._rebuild_thread.join()
+    assert sorted(id for id, _ in index.recommend(profile)) == ["1", "9"] # nosec B101
+
+
+def test_recommendation_endpoint(client):
+    get_collection(JOB_LISTING_COLLECTION).delete_many({})
+    job_seekers_api.recommendation_index.invalidate()
+    job_id = str(job_listings.create_job_listing("Data Analyst", "Globex", "Boston", "Finance", "2"))
+    client.post("/api/job_seekers/signup", json={
+        "first": "Recommended", "last": "Jobs", "email": "recommended@test.com", "expertise": "Data", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "recommended@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    response = client.get("/api/job_seekers/recommendations", headers=headers)
+    assert response.status_code == 200 # nosec B101
+    assert [job["_id"] for job in response.json] == [job_id] # nosec B101
+    assert response.json[0]["title"] == "data-analyst" # nosec B101
+
+    # a listing created after the index was built is recommended straight away
+    new_id = str(job_listings.create_job_listing("Data Engineer", "Globex", "Boston", "Data", "2"))
+    response = client.get("/api/job_seekers/recommendations", headers=headers)
+    assert [job["_id"] for job in response.json] == [new_id, job_id] # nosec B101
+
+    assert client.get("/api/job_seekers/recommendations?limit=0", headers=headers).status_code == 400 # nosec B101
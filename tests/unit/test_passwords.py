@@ -0,0 +1,68 @@
+from app.db import passwords, job_seekers
+from app.db.db import get_collection
+from app.db.constants import JOB_SEEKER_COLLECTION
+from app.db.passwords import PasswordHasher, PasswordHasherBusy
+import pytest
+
+
+def test_hash_and_verify_on_pool():
+    hasher = PasswordHasher(rounds=4, max_workers=1)
+    try:
+        hashed = hasher.hash("Abcdefgh0")
+        assert hashed.startswith("$2b$04$") # nosec B101
+        assert hasher.verify("Abcdefgh0", hashed) # nosec B101
+        assert not hasher.verify("wrong", hashed) # nosec B101
+        assert not hasher.verify("Abcdefgh0", "not a hash") # nosec B101
+
+        stats = hasher.stats()
+        assert stats["hash"]["count"] == 1 and stats["verify"]["count"] == 2 # nosec B101
+        assert stats["pending"] == 0 and stats["rejected"] == 0 # nosec B101
+    finally:
+        hasher.shutdown()
+
+
+def test_queue_limit_sheds_load():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=0)
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("Abcdefgh0")
+    assert hasher.stats()["rejected"] == 1 # nosec B101
+
+    # hashing in the request thread has no queue
+    hasher.configure(max_workers=0)
+    assert hasher.verify("Abcdefgh0", hasher.hash("Abcdefgh0")) # nosec B101
+
+
+def test_login_returns_503_when_busy(client, monkeypatch):
+    client.post("/api/job_seekers/signup", json={
+        "first": "Busy", "last": "Login", "email": "busy@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+
+    def busy(password, hashed):
+        raise PasswordHasherBusy("Too many password hashes in progress")
+
+    monkeypatch.setattr(passwords.hasher, "verify", busy)
+    response = client.post("/api/job_seekers/login", json={"email": "busy@test.com", "password": "Abcdefgh0"})
+    assert response.status_code == 503 # nosec B101
+    assert response.headers["Retry-After"] == "1" # nosec B101
+
+
+def test_login_rehashes_when_cost_changes(client, monkeypatch):
+    job_seekers.delete_job_seeker("rehash@test.com")
+    job_seekers.create_job_seeker("Re", "Hash", "rehash@test.com", "CS", 2, "Abcdefgh0")
+    collection = get_collection(JOB_SEEKER_COLLECTION)
+    old_hash = collection.find_one({"email": "rehash@test.com"})["password"]
+
+    monkeypatch.setattr(passwords.hasher, "rounds", 5)
+    assert job_seekers.check_login_credentials("rehash@test.com", "wrong") is None # nosec B101
+    assert collection.find_one({"email": "rehash@test.com"})["password"] == old_hash # nosec B101
+
+    user = job_seekers.check_login_credentials("Rehash@test.com", "Abcdefgh0")
+    assert set(user) == {"_id", "email"} # nosec B101
+    new_hash = collection.find_one({"email": "rehash@test.com"})["password"]
+    assert new_hash.startswith("$2b$05$") # nosec B101
+
+    # logins go on with the new hash, without hashing again
+    hashes = passwords.hasher.stats()["hash"]["count"]
+    response = client.post("/api/job_seekers/login", json={"email": "rehash@test.com", "password": "Abcdefgh0"})
+    assert response.status_code == 200 # nosec B101
+    assert passwords.hasher.stats()["hash"]["count"] == hashes # nosec B101
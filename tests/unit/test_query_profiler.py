@@ -0,0 +1,87 @@
+from datetime import timedelta
+import os
+import re
+from pymongo.monitoring import CommandStartedEvent, CommandSucceededEvent
+from app.db import instrumentation
+from app.db.instrumentation import QueryProfiler, filter_shape, plan_summary
+
+ADDRESS = ("localhost", 27017)
+
+
+def _run(profiler, command, ms, request_id=1):
+    profiler.started(CommandStartedEvent(command, "job_board_test", request_id, ADDRESS, request_id))
+    profiler.succeeded(CommandSucceededEvent(timedelta(milliseconds=ms), {"ok": 1}, next(iter(command)),
+                                             request_id, ADDRESS, request_id))
+
+# issues the commands from a function of app/db, as the collection modules do
+_caller = {"_run": _run}
+exec(compile("def search_job_listings(profiler, command, ms, request_id=1):\n    _run(profiler, command, ms, request_id)\n",
+             os.path.join(os.path.dirname(instrumentation.__file__), "job_listings.py"), "exec"), _caller)
+
+
+def test_filter_shape_and_plan_summary():
+    assert filter_shape({"title": {"$regex": "dev", "$options": "i"}, "skills": {"$in": ["a", "b"]}}) == { # nosec B101
+        "title": {"$regex": "?", "$options": "?"}, "skills": {"$in": "?"}
+    }
+    assert filter_shape({"$or": [{"email": "a@b.c"}, {"name": re.compile("x")}]}) == {"$or": [{"email": "?"}, {"name": "/?/"}]} # nosec B101
+
+    assert plan_summary({"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}) == "COLLSCAN" # nosec B101
+    assert plan_summary({"stages": [{"$cursor": {"queryPlanner": {"winningPlan": { # nosec B101
+        "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "email_1"}
+    }}}}]}) == "FETCH > IXSCAN email_1"
+
+
+def test_histograms_by_caller_and_slow_query_plan():
+    explained = []
+    def explain(database, command):
+        explained.append(command)
+        return {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}
+
+    profiler = QueryProfiler(enabled=True, slow_ms=50, explain=explain)
+    find = {"find": "job_listings", "filter": {"title": {"$regex": "dev"}}, "lsid": {"id": 1}, "$db": "job_board_test"}
+    _caller["search_job_listings"](profiler, find, 3, 1)
+    _caller["search_job_listings"](profiler, find, 120, 2)
+    _caller["search_job_listings"](profiler, find, 130, 3)  # same shape, explained once
+    _run(profiler, {"ping": 1}, 1, 4)
+    profiler._get_executor().submit(lambda: None).result()
+
+    stats = profiler.stats()
+    assert len(stats["commands"]) == 1 # nosec B101
+    entry = stats["commands"][0]
+    assert (entry["command"], entry["collection"], entry["caller"]) == ("find", "job_listings", "job_listings.search_job_listings") # nosec B101
+    assert entry["count"] == 3 and entry["max_ms"] == 130 # nosec B101
+    assert entry["histogram"]["5"] == 1 and entry["histogram"]["250"] == 2 # nosec B101
+
+    assert [query["ms"] for query in stats["slow"]] == [120, 130] # nosec B101
+    assert stats["slow"][0]["filter"] == {"title": {"$regex": "?"}} and stats["slow"][0]["plan"] == "COLLSCAN" # nosec B101
+    assert explained == [{"find": "job_listings", "filter": {"title": {"$regex": "dev"}}}] # nosec B101
+
+
+def test_profiled_request_only():
+    profiler = QueryProfiler(enabled=False)
+    _run(profiler, {"find": "companies", "filter": {}}, 5, 1)
+    assert profiler.stats()["commands"] == [] # nosec B101
+
+    token = profiler.start_request()
+    _run(profiler, {"count": "companies", "query": {}}, 5, 2)
+    summary = profiler.request_summary()
+    profiler.finish_request(token)
+    assert summary["count"] == 1 and summary["total_ms"] == 5 # nosec B101
+    assert profiler.request_summary() is None # nosec B101
+
+
+def test_profile_header(client, app, monkeypatch):
+    # ignored unless allowed
+    assert "Server-Timing" not in client.get("/api/job_listings/", headers={"X-Query-Profile": "1"}).headers # nosec B101
+
+    monkeypatch.setitem(app.config, "QUERY_PROFILE_HEADER", True)
+    response = client.get("/api/job_listings/", headers={"X-Query-Profile": "1"})
+    assert response.headers["X-Query-Count"].isdigit() # nosec B101
+    assert response.headers["Server-Timing"].startswith("db;dur=") # nosec B101
+    assert "Server-Timing" not in client.get("/api/job_listings/").headers # nosec B101
+
+
+def test_slow_queries_logged_by_default():
+    profiler = QueryProfiler(slow_ms=50)
+    _run(profiler, {"find": "job_listings", "filter": {"title": "x"}}, 80)
+    assert [query["ms"] for query in profiler.stats()["slow"]] == [80] # nosec B101
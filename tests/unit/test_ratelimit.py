@@ -0,0 +1,66 @@
+from app.apis.ratelimit import TokenBucketLimiter
+import app.apis.job_seekers as job_seekers_api
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_time(tmp_path):
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(str(tmp_path / "buckets.sqlite3"), clock=clock)
+    bucket = [("user:jd", 0.5, 2)]  # one token every 2 seconds, bursts of 2
+
+    assert limiter.acquire(bucket) == 0 # nosec B101
+    assert limiter.acquire(bucket) == 0 # nosec B101
+    assert limiter.acquire(bucket) == 2 # nosec B101
+
+    clock.now += 1
+    assert limiter.acquire(bucket) == 1 # nosec B101
+    clock.now += 1
+    assert limiter.acquire(bucket) == 0 # nosec B101
+
+
+def test_all_buckets_or_none(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "buckets.sqlite3")
+    limiter = TokenBucketLimiter(path, clock=clock)
+    assert limiter.acquire([("user:jd", 1, 1), ("global", 1, 2)]) == 0 # nosec B101
+    assert limiter.acquire([("user:jd", 1, 1), ("global", 1, 2)]) == 1 # nosec B101
+
+    # the refused request did not take the global token, another worker still gets it
+    other_worker = TokenBucketLimiter(path, clock=clock)
+    assert other_worker.acquire([("user:ab", 1, 1), ("global", 1, 2)]) == 0 # nosec B101
+    assert other_worker.acquire([("user:ap", 1, 1), ("global", 1, 2)]) == 1 # nosec B101
+
+
+def test_ai_suggestions_return_429(client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "RATE_LIMIT_DB", str(tmp_path / "buckets.sqlite3"))
+    monkeypatch.setattr(job_seekers_api.ai_service, "generate_suggestions", lambda job, applicant: {
+        "matchScore": 80, "analysis": "Good match", "suggestions": [], "strengths": []
+    })
+    client.post("/api/job_seekers/signup", json={
+        "first": "Rate", "last": "Limited", "email": "ratelimited@test.com", "expertise": "CS", "years": 2, "password": "Abcdefgh0"
+    })
+    response = client.post("/api/job_seekers/login", json={"email": "ratelimited@test.com", "password": "Abcdefgh0"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    body = {
+        "job": {"title": "software-engineer", "company": "acme", "location": "new-york", "industry": "tech", "seniority": 3},
+        "applicant": {"first": "Rate", "last": "Limited", "email": "ratelimited@test.com", "expertise": "CS", "years": 2},
+    }
+
+    # an invalid request is refused before it takes the only token
+    response = client.post("/api/job_seekers/ai/suggestions", json={"job": body["job"]}, headers=headers)
+    assert response.status_code == 400 # nosec B101
+
+    response = client.post("/api/job_seekers/ai/suggestions", json=body, headers=headers)
+    assert response.status_code == 200 # nosec B101
+    assert response.json["score"] == 80 # nosec B101
+
+    response = client.post("/api/job_seekers/ai/suggestions", json=body, headers=headers)
+    assert response.status_code == 429 # nosec B101
+    assert 0 < int(response.headers["Retry-After"]) <= 30 # nosec B101
@@ -0,0 +1,53 @@
+from app.apis.llm import AIService
+from app.db import job_listings, job_seekers, suggestions
+from app.db.db import get_collection
+
+
+class StubModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return type("Response", (), {"text": '{"matchScore": 75, "analysis": "ok", "suggestions": ["a"], "strengths": ["b"]}'})()
+
+
+def test_suggestions_are_cached_until_inputs_change(client):
+    get_collection(suggestions.SUGGESTION_CACHE_COLLECTION).delete_many({})
+    suggestions.local_cache.clear()
+    job_id = str(job_listings.create_job_listing("Software Engineer", "Acme", "New York", "Tech", "Mid-Level"))
+    job = {"_id": job_id, "title": "software-engineer", "company": "acme", "location": "new-york", "industry": "tech", "seniority": 3}
+    applicant = {"first": "John", "last": "Doe", "email": "jd@gmail.com", "expertise": "Programming", "years": 12}
+
+    model = StubModel()
+    service = AIService(model=model)
+    first = service.generate_suggestions(job, applicant)
+    assert service.generate_suggestions(job, applicant) == first # nosec B101
+    assert model.calls == 1 # nosec B101
+
+    # another worker: empty in-process cache, the entry comes from MongoDB
+    suggestions.local_cache.clear()
+    assert service.generate_suggestions(job, applicant)["matchScore"] == 75 # nosec B101
+    assert model.calls == 1 # nosec B101
+
+    assert service.generate_suggestions(job, dict(applicant, years=13)) == first # nosec B101
+    assert model.calls == 2 # nosec B101
+
+    job_listings.update_job_listing(job_id, "Software Engineer", "Acme", "Boston", "Tech", "Mid-Level")
+    service.generate_suggestions(job, applicant)
+    assert model.calls == 3 # nosec B101
+
+    job_seekers.update_job_seeker("jd@gmail.com", "John", "Doe", "jd@gmail.com", "Programming", 12)
+    service.generate_suggestions(job, applicant)
+    assert model.calls == 4 # nosec B101
+
+
+def test_failed_calls_are_not_cached(client):
+    class FailingModel:
+        def generate_content(self, prompt):
+            raise RuntimeError("quota exceeded")
+
+    job = {"title": "data-analyst", "company": "globex", "location": "boston", "industry": "finance", "seniority": 1}
+    applicant = {"first": "Alice", "last": "Bob", "email": "ab@gmail.com", "expertise": "Finance", "years": 9}
+    assert AIService(model=FailingModel()).generate_suggestions(job, applicant)["matchScore"] == 0 # nosec B101
+    assert suggestions.get_cached_suggestions(suggestions.suggestion_key(job, applicant)) is None # nosec B101